@@ -0,0 +1,142 @@
+import os
+import shutil
+import sqlite3
+import threading
+
+# Carpeta del almacén dentro de la carpeta de descargas de cada plataforma
+CARPETA_ALMACEN = ".almacen"
+
+# Formas de mostrar en las carpetas de sección un archivo guardado una sola vez
+MODOS_ENLACE = {
+    "duro": "Enlaces duros (cada archivo repetido ocupa disco una sola vez)",
+    "simbolico": "Enlaces simbólicos",
+    "copia": "Copias independientes (sin deduplicar)",
+}
+
+# -----------------------------------------------------------------------------
+# ALMACÉN DE ARCHIVOS DIRECCIONADO POR CONTENIDO
+# -----------------------------------------------------------------------------
+class AlmacenContenido:
+    """
+    Guarda cada archivo descargado una sola vez, con su hash sha256 como nombre
+    (objetos/ab/abcd...), y lo muestra en las carpetas de sección como enlace
+    duro o simbólico. Un índice URL -> hash (indice.sqlite) permite reconocer
+    los archivos ya conocidos: se revalidan con ETag/Last-Modified y, si ya se
+    comprobaron en esta ejecución, se enlazan sin ninguna solicitud.
+    Se comparte entre los cursos de un lote y entre ejecuciones.
+    """
+    def __init__(self, carpeta, modo="duro"):
+        self.carpeta = carpeta
+        self.modo = modo
+        os.makedirs(os.path.join(carpeta, "objetos"), exist_ok=True)
+        self._candado = threading.Lock()
+        self._conexion = sqlite3.connect(os.path.join(carpeta, "indice.sqlite"), check_same_thread=False)
+        self._conexion.execute(
+            """
+            CREATE TABLE IF NOT EXISTS urls (
+                url TEXT PRIMARY KEY,
+                hash TEXT,
+                tamano INTEGER,
+                etag TEXT,
+                last_modified TEXT,
+                extension TEXT
+            )
+            """
+        )
+        # URLs cuyo contenido ya se comprobó en esta ejecución: no se vuelven a pedir
+        self._verificadas = set()
+        self.reutilizados = 0
+        self.bytes_ahorrados = 0
+        self.transferencias_evitadas = 0
+
+    def ruta_objeto(self, hash_archivo):
+        return os.path.join(self.carpeta, "objetos", hash_archivo[:2], hash_archivo)
+
+    def buscar(self, url):
+        """
+        Retorna lo que el índice sabe de la URL (hash, tamano, etag,
+        last_modified, extension), o None si no se conoce o el objeto ya no está.
+        """
+        with self._candado:
+            cursor = self._conexion.execute(
+                "SELECT hash, tamano, etag, last_modified, extension FROM urls WHERE url = ?", (url,)
+            )
+            fila = cursor.fetchone()
+        if fila is None or not os.path.exists(self.ruta_objeto(fila[0])):
+            return None
+        return dict(zip(("hash", "tamano", "etag", "last_modified", "extension"), fila))
+
+    def verificada(self, url):
+        with self._candado:
+            return url in self._verificadas
+
+    def registrar_url(self, url, hash_archivo, tamano, etag, last_modified, extension):
+        with self._candado:
+            self._verificadas.add(url)
+            self._conexion.execute(
+                "INSERT OR REPLACE INTO urls VALUES (?, ?, ?, ?, ?, ?)",
+                (url, hash_archivo, tamano, etag, last_modified, extension)
+            )
+            self._conexion.commit()
+
+    def contar_evitada(self, tamano):
+        with self._candado:
+            self.transferencias_evitadas += 1
+            self.bytes_ahorrados += tamano or 0
+
+    def guardar(self, ruta_temporal, hash_archivo):
+        """
+        Mueve un archivo recién descargado al almacén. Si el contenido ya estaba,
+        se descarta la copia nueva. Retorna la ruta del objeto.
+        """
+        objeto = self.ruta_objeto(hash_archivo)
+        os.makedirs(os.path.dirname(objeto), exist_ok=True)
+        if os.path.exists(objeto):
+            tamano = os.path.getsize(ruta_temporal)
+            os.remove(ruta_temporal)
+            with self._candado:
+                self.reutilizados += 1
+                self.bytes_ahorrados += tamano
+        else:
+            os.replace(ruta_temporal, objeto)
+        return objeto
+
+    def enlazar(self, hash_archivo, destino):
+        """
+        Crea destino apuntando al objeto del almacén según el modo; si el sistema
+        de archivos no admite el enlace (otra unidad, permisos en Windows), copia.
+        """
+        objeto = self.ruta_objeto(hash_archivo)
+        if os.path.lexists(destino):
+            os.remove(destino)
+        try:
+            if self.modo == "duro":
+                os.link(objeto, destino)
+                return destino
+            if self.modo == "simbolico":
+                os.symlink(os.path.relpath(objeto, os.path.dirname(destino)), destino)
+                return destino
+        except OSError:
+            pass
+        shutil.copyfile(objeto, destino)
+        return destino
+
+    def totales(self):
+        return {
+            "Reutilizados": self.reutilizados,
+            "Transferencias_Evitadas": self.transferencias_evitadas,
+            "MB_Ahorrados": round(self.bytes_ahorrados / (1024 * 1024), 2),
+        }
+
+    def cerrar(self):
+        with self._candado:
+            self._conexion.close()
+
+def resumen_almacen(totales):
+    """
+    Texto corto con lo que se evitó descargar o duplicar en disco.
+    """
+    return (
+        f"Archivos repetidos: {totales['Reutilizados']} guardados una sola vez, "
+        f"{totales['Transferencias_Evitadas']} sin volver a descargar ({totales['MB_Ahorrados']} MB ahorrados)."
+    )
@@ -0,0 +1,180 @@
+import hashlib
+import sqlite3
+import threading
+import time
+
+# Archivo donde se guardan las páginas entre ejecuciones
+RUTA_CACHE = "cache_http.sqlite"
+
+# Tiempo (segundos) durante el cual una página guardada se usa sin preguntar al servidor.
+# Solo para páginas que cambian poco (listado de categorías); con ttl=0 siempre se revalida
+TTL_SEGUNDOS = 12 * 3600
+
+# Tamaño máximo del caché; al superarlo se borran las páginas usadas hace más tiempo
+TAMANO_MAXIMO_BYTES = 200 * 1024 * 1024
+
+_cache_compartido = None
+_candado_cache_compartido = threading.Lock()
+
+# -----------------------------------------------------------------------------
+# CACHÉ PERSISTENTE DE RESPUESTAS HTTP
+# -----------------------------------------------------------------------------
+class CacheHTTP:
+    """
+    Caché en disco (SQLite) de páginas HTML, con clave por URL e identidad de
+    sesión, tiempo de vida, límite de tamaño con desalojo LRU y revalidación
+    condicional (ETag / Last-Modified) cuando la entrada ya venció.
+    """
+    def __init__(self, ruta=RUTA_CACHE, ttl=TTL_SEGUNDOS, tamano_maximo=TAMANO_MAXIMO_BYTES):
+        self.ruta = ruta
+        self.ttl = ttl
+        self.tamano_maximo = tamano_maximo
+        self.omitir = False  # True = no leer del caché en esta ejecución (sí se guardan las respuestas nuevas)
+        self.aciertos = 0
+        self.revalidados = 0
+        self.fallos = 0
+        self._candado = threading.Lock()
+        self._conexion = sqlite3.connect(ruta, check_same_thread=False)
+        self._conexion.execute(
+            """CREATE TABLE IF NOT EXISTS respuestas (
+                clave TEXT PRIMARY KEY,
+                url TEXT,
+                texto TEXT,
+                etag TEXT,
+                last_modified TEXT,
+                guardado REAL,
+                ultimo_uso REAL,
+                tamano INTEGER
+            )"""
+        )
+        self._conexion.commit()
+
+    def reiniciar_contadores(self):
+        self.aciertos = 0
+        self.revalidados = 0
+        self.fallos = 0
+
+    def resumen(self):
+        """
+        Texto corto con los contadores de la ejecución.
+        """
+        return f"Caché: {self.aciertos} aciertos, {self.revalidados} revalidadas, {self.fallos} descargas."
+
+    def _contar(self, contador):
+        with self._candado:
+            setattr(self, contador, getattr(self, contador) + 1)
+
+    def _clave(self, session, url):
+        identidad = getattr(session, "identidad_cache", "")
+        return hashlib.sha256(f"{identidad}\n{url}".encode("utf-8")).hexdigest()
+
+    def _leer(self, clave):
+        with self._candado:
+            return self._conexion.execute(
+                "SELECT texto, etag, last_modified, guardado FROM respuestas WHERE clave = ?", (clave,)
+            ).fetchone()
+
+    def _tocar(self, clave, revalidada=False):
+        ahora = time.time()
+        with self._candado:
+            if revalidada:
+                self._conexion.execute(
+                    "UPDATE respuestas SET ultimo_uso = ?, guardado = ? WHERE clave = ?", (ahora, ahora, clave)
+                )
+            else:
+                self._conexion.execute("UPDATE respuestas SET ultimo_uso = ? WHERE clave = ?", (ahora, clave))
+            self._conexion.commit()
+
+    def _guardar(self, clave, url, respuesta):
+        texto = respuesta.text
+        ahora = time.time()
+        with self._candado:
+            self._conexion.execute(
+                "INSERT OR REPLACE INTO respuestas VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    clave, url, texto,
+                    respuesta.headers.get("ETag"),
+                    respuesta.headers.get("Last-Modified"),
+                    ahora, ahora, len(texto.encode("utf-8")),
+                )
+            )
+            self._desalojar()
+            self._conexion.commit()
+
+    def _borrar(self, clave):
+        with self._candado:
+            self._conexion.execute("DELETE FROM respuestas WHERE clave = ?", (clave,))
+            self._conexion.commit()
+
+    def _desalojar(self):
+        total = self._conexion.execute("SELECT COALESCE(SUM(tamano), 0) FROM respuestas").fetchone()[0]
+        if total <= self.tamano_maximo:
+            return
+        filas = self._conexion.execute("SELECT clave, tamano FROM respuestas ORDER BY ultimo_uso").fetchall()
+        for clave, tamano in filas:
+            if total <= self.tamano_maximo:
+                break
+            self._conexion.execute("DELETE FROM respuestas WHERE clave = ?", (clave,))
+            total -= tamano
+
+    def obtener(self, session, url, solicitar=None, ttl=None, **kwargs):
+        """
+        Retorna (codigo_estado, texto) de la URL usando el caché cuando se puede.
+        'solicitar' es la función que hace la petición real (por defecto session.get)
+        y recibe la URL, los encabezados condicionales y los kwargs adicionales.
+        'ttl' reemplaza el tiempo de vida del caché; con 0 cada lectura pregunta
+        al servidor (If-None-Match / If-Modified-Since) y solo se ahorra el cuerpo,
+        así que las respuestas sin ETag ni Last-Modified no se guardan.
+        Nunca se guardan las respuestas con Cache-Control no-store o private.
+        """
+        solicitar = solicitar or session.get
+        ttl = self.ttl if ttl is None else ttl
+        clave = self._clave(session, url)
+        entrada = None if self.omitir else self._leer(clave)
+
+        if entrada and time.time() - entrada[3] < ttl:
+            self._contar("aciertos")
+            self._tocar(clave)
+            return 200, entrada[0]
+
+        encabezados = {}
+        if entrada and entrada[1]:
+            encabezados["If-None-Match"] = entrada[1]
+        if entrada and entrada[2]:
+            encabezados["If-Modified-Since"] = entrada[2]
+
+        respuesta = solicitar(url, headers=encabezados, **kwargs)
+        if respuesta.status_code == 304 and entrada:
+            self._contar("revalidados")
+            self._tocar(clave, revalidada=True)
+            return 200, entrada[0]
+
+        self._contar("fallos")
+        # No se guardan errores ni redirecciones a la página de login (sesión vencida)
+        if respuesta.status_code == 200 and "/login/index.php" not in respuesta.url:
+            if guardable(respuesta, ttl):
+                self._guardar(clave, url, respuesta)
+            elif entrada:
+                self._borrar(clave)
+        return respuesta.status_code, respuesta.text
+
+def guardable(respuesta, ttl):
+    """
+    True si vale la pena guardar la respuesta: el servidor no lo prohíbe
+    (Cache-Control no-store / private) y, si siempre se revalida (ttl 0),
+    trae ETag o Last-Modified para poder preguntar si cambió.
+    """
+    directivas = {d.strip().split("=")[0].lower() for d in respuesta.headers.get("Cache-Control", "").split(",")}
+    if directivas & {"no-store", "private"}:
+        return False
+    return ttl > 0 or bool(respuesta.headers.get("ETag") or respuesta.headers.get("Last-Modified"))
+
+def cache_compartido():
+    """
+    Retorna la instancia de caché que comparten todos los módulos del proceso.
+    """
+    global _cache_compartido
+    with _candado_cache_compartido:
+        if _cache_compartido is None:
+            _cache_compartido = CacheHTTP()
+        return _cache_compartido
@@ -0,0 +1,208 @@
+"""
+Genera informes y descarga cursos sin ventana, para correrlos programados en
+un servidor (cron, Programador de tareas). No importa flet.
+
+    python cli.py informes --plataforma Pregrado --categoria 29 --formato csv
+    python cli.py informes --plataforma Todas --combinado --trabajadores 8
+    python cli.py descargas --plataforma Posgrado --cursos 120,130-135 --fuente ws
+    python cli.py descargas --plataforma Pregrado --categoria 27 --cursos-simultaneos 4
+
+Los mensajes van a la salida estándar (los errores a la de error) y cada
+--intervalo-progreso segundos se imprime una línea con el avance.
+
+Códigos de salida: 0 terminó bien, 1 falló (o algún curso quedó con error),
+2 argumentos no válidos, 130 cancelado con Ctrl+C.
+"""
+import argparse
+import sys
+import threading
+import time
+
+import descargas
+import informes_pregrado
+from almacen import MODOS_ENLACE
+from cache_http import cache_compartido
+from concurrencia import configurar_limite_por_host, configurar_transferencias_por_host, limitador_host, LIMITE_POR_HOST, TRANSFERENCIAS_POR_HOST
+from metricas import metricas_compartidas
+from plataformas import PLATAFORMAS, buscar_plataforma
+from salida import formatos_disponibles
+from trabajos import TrabajoSegundoPlano, TrabajoCancelado, describir_progreso
+
+# Segundos entre líneas de avance
+INTERVALO_PROGRESO = 10
+
+SALIDA_CORRECTA = 0
+SALIDA_FALLO = 1
+SALIDA_CANCELADA = 130
+
+# -----------------------------------------------------------------------------
+# TRABAJO EN CONSOLA
+# -----------------------------------------------------------------------------
+class ConsolaTrabajo:
+    """
+    Hace de ventana para un TrabajoSegundoPlano: imprime cada mensaje nuevo del
+    registro y, cada 'intervalo' segundos, una línea con el avance.
+    """
+    def __init__(self, intervalo=INTERVALO_PROGRESO):
+        self.intervalo = intervalo
+        self.ultimo_mensaje = None
+        self.ultimo_avance = time.monotonic()
+        self.resultado = (None, None)
+        self.terminado = threading.Event()
+
+    def mostrar_progreso(self, progreso):
+        mensaje = progreso["mensaje"]
+        if mensaje and mensaje != self.ultimo_mensaje:
+            self.ultimo_mensaje = mensaje
+            print(mensaje, file=sys.stderr if progreso["color"] == "red" else sys.stdout, flush=True)
+        ahora = time.monotonic()
+        if ahora - self.ultimo_avance >= self.intervalo:
+            self.ultimo_avance = ahora
+            print(f"[AVANCE] {describir_progreso(progreso)}", flush=True)
+
+    def al_terminar(self, resultado, error):
+        self.resultado = (resultado, error)
+        self.terminado.set()
+
+def ejecutar(funcion, unidad, intervalo):
+    """
+    Corre funcion(trabajo) con un TrabajoSegundoPlano y espera a que termine.
+    Con Ctrl+C pide la cancelación y espera a que el trabajo la atienda
+    (así el estado para reanudar y los manifiestos quedan escritos).
+    Retorna (resultado, error) como los recibe al_terminar.
+    """
+    consola = ConsolaTrabajo(intervalo)
+    trabajo = TrabajoSegundoPlano(funcion, consola.mostrar_progreso, consola.al_terminar, unidad=unidad).iniciar()
+    try:
+        while not consola.terminado.wait(0.5):
+            pass
+    except KeyboardInterrupt:
+        print("Cancelando... (esperando a que terminen las solicitudes en curso)", file=sys.stderr, flush=True)
+        trabajo.cancelar()
+        consola.terminado.wait()
+    return consola.resultado
+
+def preparar_red(args):
+    """
+    Aplica las opciones comunes de caché y concurrencia, y reinicia los contadores de la ejecución.
+    """
+    cache = cache_compartido()
+    cache.omitir = args.sin_cache
+    cache.reiniciar_contadores()
+    metricas_compartidas().reiniciar()
+    configurar_limite_por_host(args.simultaneas)
+    if args.solicitudes_por_segundo:
+        limitador_host.configurar(tasa_inicial=args.solicitudes_por_segundo)
+
+def elegir_plataforma(parser, args):
+    plataforma = buscar_plataforma(args.plataforma)
+    if plataforma is None:
+        nombres = ", ".join(p["name"] for p in PLATAFORMAS)
+        parser.error(f"plataforma desconocida '{args.plataforma}' (opciones: {nombres})")
+    if args.url:
+        # Otro servidor con la misma configuración (por ejemplo, un Moodle de pruebas)
+        plataforma = dict(plataforma, url=args.url.rstrip("/"))
+    return plataforma
+
+def codigo_salida(error, exito):
+    if isinstance(error, TrabajoCancelado):
+        print("Cancelado. Con --reanudar (informes) o de nuevo en modo incremental (descargas) se continúa desde donde quedó.", file=sys.stderr)
+        return SALIDA_CANCELADA
+    if error is not None:
+        print(f"Se detuvo por un error: {error}", file=sys.stderr)
+        return SALIDA_FALLO
+    return SALIDA_CORRECTA if exito else SALIDA_FALLO
+
+# -----------------------------------------------------------------------------
+# SUBCOMANDOS
+# -----------------------------------------------------------------------------
+def comando_informes(parser, args):
+    formato = args.formato
+    if args.plataforma == informes_pregrado.TODAS_LAS_PLATAFORMAS:
+        if args.url or args.categoria is not None:
+            parser.error("--url y --categoria no se usan con --plataforma Todas")
+        funcion = lambda trabajo: informes_pregrado.informe_todas(
+            args.rango, formato, combinado=args.combinado, usar_ws=args.fuente == "ws",
+            reanudar=args.reanudar, trabajo=trabajo, trabajadores=args.trabajadores)
+    else:
+        plataforma = elegir_plataforma(parser, args)
+        categorias = plataforma["categorias"]
+        if args.categoria is None:
+            if len(categorias) != 1:
+                opciones = ", ".join(f"{k} ({v})" for k, v in categorias.items())
+                parser.error(f"indica --categoria (configuradas para {plataforma['name']}: {opciones})")
+            args.categoria = next(iter(categorias))
+        division_nombre = categorias.get(args.categoria) or f"Categoria {args.categoria}"
+        funcion = lambda trabajo: informes_pregrado.informe_categoria(
+            plataforma, args.categoria, division_nombre, args.rango, formato,
+            usar_ws=args.fuente == "ws", reanudar=args.reanudar, trabajo=trabajo, trabajadores=args.trabajadores)
+
+    preparar_red(args)
+    resultado, error = ejecutar(funcion, "cursos", args.intervalo_progreso)
+    mensaje, exito = resultado if resultado else (None, False)
+    if error is None and mensaje:
+        print(mensaje, file=sys.stdout if exito else sys.stderr)
+    return codigo_salida(error, exito)
+
+def comando_descargas(parser, args):
+    plataforma = elegir_plataforma(parser, args)
+    try:
+        ids_cursos = descargas.interpretar_ids_cursos(args.cursos or "")
+    except ValueError as e:
+        parser.error(str(e))
+    if not ids_cursos and args.categoria is None:
+        parser.error("indica --cursos o --categoria")
+
+    preparar_red(args)
+    configurar_transferencias_por_host(args.transferencias)
+    funcion = lambda trabajo: descargas.descargar_cursos(
+        plataforma, ids_cursos, "" if args.categoria is None else str(args.categoria), args.formato, usar_ws=args.fuente == "ws", trabajo=trabajo,
+        incremental=not args.completa, modo_enlace=args.enlaces, cursos_simultaneos=args.cursos_simultaneos)
+    resultado, error = ejecutar(funcion, "secciones", args.intervalo_progreso)
+    mensaje, color = resultado if resultado else (None, "red")
+    if error is None and mensaje:
+        print(mensaje, file=sys.stdout if color == "green" else sys.stderr)
+    return codigo_salida(error, color == "green")
+
+# -----------------------------------------------------------------------------
+# ARGUMENTOS
+# -----------------------------------------------------------------------------
+def crear_parser():
+    formatos = formatos_disponibles()
+    comunes = argparse.ArgumentParser(add_help=False)
+    comunes.add_argument("--plataforma", required=True, help="Nombre o sufijo de carpeta: " + ", ".join(p["name"] for p in PLATAFORMAS))
+    comunes.add_argument("--url", help="URL base de Moodle en lugar de la de la plataforma")
+    comunes.add_argument("--categoria", type=int, help="ID de la categoría")
+    comunes.add_argument("--formato", choices=formatos, default=formatos[0], help="Formato del informe o del manifiesto (por defecto %(default)s)")
+    comunes.add_argument("--fuente", choices=["html", "ws"], default="html", help="Páginas HTML o Web Services (por defecto %(default)s)")
+    comunes.add_argument("--simultaneas", type=int, default=LIMITE_POR_HOST, help="Solicitudes simultáneas por host (por defecto %(default)s)")
+    comunes.add_argument("--solicitudes-por-segundo", type=float, help="Ritmo inicial del limitador adaptativo por host")
+    comunes.add_argument("--sin-cache", action="store_true", help="No leer del caché HTTP (sí se guardan las respuestas nuevas)")
+    comunes.add_argument("--intervalo-progreso", type=float, default=INTERVALO_PROGRESO, help="Segundos entre líneas de avance (por defecto %(default)s)")
+
+    parser = argparse.ArgumentParser(description="Informes y descargas de Moodle sin ventana.")
+    subparsers = parser.add_subparsers(dest="comando", required=True)
+
+    informes = subparsers.add_parser("informes", parents=[comunes], help="Informe de cursos de una categoría o de todas las plataformas")
+    informes.add_argument("--rango", type=int, default=50, help="Máximo de páginas por curso, límite de seguridad (por defecto %(default)s)")
+    informes.add_argument("--trabajadores", type=int, default=informes_pregrado.TRABAJADORES_CURSOS, help="Hilos que recorren categorías y cursos (por defecto %(default)s)")
+    informes.add_argument("--reanudar", action="store_true", help="Continuar una extracción interrumpida")
+    informes.add_argument("--combinado", action="store_true", help="Con --plataforma Todas: un solo archivo para todas")
+    informes.set_defaults(comando_funcion=comando_informes)
+
+    lote = subparsers.add_parser("descargas", parents=[comunes], help="Descarga de uno o más cursos, o de los de una categoría")
+    lote.add_argument("--cursos", help="IDs de curso: lista y rangos, por ejemplo 120,130-135")
+    lote.add_argument("--cursos-simultaneos", type=int, default=descargas.CURSOS_SIMULTANEOS, help="Cursos que se descargan a la vez (por defecto %(default)s)")
+    lote.add_argument("--transferencias", type=int, default=TRANSFERENCIAS_POR_HOST, help="Descargas de archivos simultáneas por host (por defecto %(default)s)")
+    lote.add_argument("--completa", action="store_true", help="Descargar todo de nuevo en lugar de sincronizar solo los cambios")
+    lote.add_argument("--enlaces", choices=list(MODOS_ENLACE), default="duro", help="Cómo se enlazan los archivos repetidos (por defecto %(default)s)")
+    lote.set_defaults(comando_funcion=comando_descargas)
+    return parser
+
+def main(argv=None):
+    parser = crear_parser()
+    args = parser.parse_args(argv)
+    return args.comando_funcion(parser, args)
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,274 @@
+import threading
+import time
+from urllib.parse import urlparse
+
+import requests
+
+# Número máximo de solicitudes simultáneas hacia un mismo servidor Moodle
+LIMITE_POR_HOST = 4
+
+# Solicitudes por segundo con que se empieza hacia cada servidor; luego se ajustan (LimitadorAdaptativo)
+SOLICITUDES_POR_SEGUNDO = 4
+
+# Límites del ajuste adaptativo por servidor
+TASA_MINIMA = 0.5
+TASA_MAXIMA = 50
+CONCURRENCIA_MAXIMA = 16
+RAFAGA_MAXIMA = 2  # Fichas que se pueden acumular: solicitudes seguidas sin esperar
+
+# Respuestas que indican que el servidor está saturado
+ESTADOS_SATURACION = (429, 503)
+FACTOR_REDUCCION = 0.5
+# Latencia media por encima de FACTOR_LATENCIA veces la habitual (y de LATENCIA_SIGNIFICATIVA segundos) = servidor cargado
+FACTOR_LATENCIA = 2.0
+LATENCIA_SIGNIFICATIVA = 0.3
+FACTOR_REDUCCION_LATENCIA = 0.8
+INTERVALO_MINIMO_REDUCCION = 1.0
+PAUSA_MAXIMA = 60
+# Reintentos de un GET/HEAD que recibió 429/503, tras la pausa de Retry-After
+# (sin Retry-After se espera ESPERA_REINTENTO segundos, el doble en cada intento)
+REINTENTOS_SATURACION = 3
+ESPERA_REINTENTO = 1.0
+METODOS_REINTENTABLES = ("GET", "HEAD")
+
+# Número máximo de descargas de archivos simultáneas hacia un mismo servidor
+TRANSFERENCIAS_POR_HOST = 4
+
+_semaforos_host = {}
+_semaforos_transferencias = {}
+_candado_semaforos = threading.Lock()
+
+# -----------------------------------------------------------------------------
+# LÍMITE DE SOLICITUDES SIMULTÁNEAS POR HOST
+# -----------------------------------------------------------------------------
+def configurar_limite_por_host(limite):
+    """
+    Cambia el número de solicitudes simultáneas permitidas por host.
+    Solo afecta a los semáforos que se creen después del cambio.
+    """
+    global LIMITE_POR_HOST
+    with _candado_semaforos:
+        LIMITE_POR_HOST = max(1, int(limite))
+        _semaforos_host.clear()
+
+def semaforo_host(url):
+    """
+    Retorna el semáforo compartido que limita las solicitudes simultáneas
+    hacia el host de la URL dada.
+    """
+    host = urlparse(url).netloc
+    with _candado_semaforos:
+        semaforo = _semaforos_host.get(host)
+        if semaforo is None:
+            semaforo = threading.BoundedSemaphore(LIMITE_POR_HOST)
+            _semaforos_host[host] = semaforo
+        return semaforo
+
+def configurar_transferencias_por_host(limite):
+    """
+    Cambia el número de descargas de archivos simultáneas permitidas por host.
+    Solo afecta a los semáforos que se creen después del cambio.
+    """
+    global TRANSFERENCIAS_POR_HOST
+    with _candado_semaforos:
+        TRANSFERENCIAS_POR_HOST = max(1, int(limite))
+        _semaforos_transferencias.clear()
+
+def semaforo_transferencias(url):
+    """
+    Retorna el semáforo compartido que limita las descargas de archivos
+    simultáneas hacia el host de la URL dada (aparte de las páginas).
+    """
+    host = urlparse(url).netloc
+    with _candado_semaforos:
+        semaforo = _semaforos_transferencias.get(host)
+        if semaforo is None:
+            semaforo = threading.BoundedSemaphore(TRANSFERENCIAS_POR_HOST)
+            _semaforos_transferencias[host] = semaforo
+        return semaforo
+
+# -----------------------------------------------------------------------------
+# RITMO Y CONCURRENCIA ADAPTATIVOS POR HOST (AIMD)
+# -----------------------------------------------------------------------------
+class _EstadoHost:
+    def __init__(self, tasa, concurrencia):
+        self.tasa = tasa                  # Solicitudes por segundo permitidas
+        self.concurrencia = concurrencia  # Solicitudes en curso permitidas (se usa la parte entera)
+        self.fichas = 1.0
+        self.recarga = time.monotonic()
+        self.en_curso = 0
+        self.latencia_base = None         # Latencia de las respuestas rápidas (mínimo que sube despacio)
+        self.latencia_media = None
+        self.ultima_reduccion = 0.0
+        self.pausa_hasta = 0.0            # Retry-After de un 429/503
+        self.reducciones = 0
+
+class LimitadorAdaptativo:
+    """
+    Cubeta de fichas por host compartida por todas las sesiones del proceso.
+    Cada solicitud toma una ficha (la cubeta se llena a 'tasa' fichas por
+    segundo) y un lugar entre las 'concurrencia' solicitudes en curso. Ambos
+    límites se ajustan por AIMD con cada respuesta: suben mientras las
+    respuestas siguen rápidas (rápido hasta la primera reducción, de a poco
+    después) y se reducen a la mitad ante un 429/503, un
+    tiempo agotado o un error de conexión, y en menor medida si la latencia
+    media sube muy por encima de la habitual. Como máximo se reduce una vez
+    por intervalo de latencia, para no castigar varias veces el mismo pico.
+    Un GET/HEAD que recibe 429/503 se repite (hasta REINTENTOS_SATURACION
+    veces) después de la pausa, antes de entregar el error a quien lo pidió.
+    """
+    def __init__(self, tasa_inicial=SOLICITUDES_POR_SEGUNDO, tasa_maxima=TASA_MAXIMA, concurrencia_maxima=CONCURRENCIA_MAXIMA):
+        self._condicion = threading.Condition()
+        self._hosts = {}
+        self.configurar(tasa_inicial, tasa_maxima, concurrencia_maxima)
+
+    def configurar(self, tasa_inicial=None, tasa_maxima=None, concurrencia_maxima=None):
+        """
+        Cambia los valores de partida y los topes; los hosts vuelven a empezar desde tasa_inicial.
+        """
+        with self._condicion:
+            if tasa_inicial is not None:
+                self.tasa_inicial = float(tasa_inicial)
+            if tasa_maxima is not None:
+                self.tasa_maxima = float(tasa_maxima)
+            if concurrencia_maxima is not None:
+                self.concurrencia_maxima = max(1, int(concurrencia_maxima))
+            self._hosts.clear()
+            self._condicion.notify_all()
+
+    def _estado(self, host):
+        estado = self._hosts.get(host)
+        if estado is None:
+            estado = _EstadoHost(min(self.tasa_inicial, self.tasa_maxima), min(float(LIMITE_POR_HOST), self.concurrencia_maxima))
+            self._hosts[host] = estado
+        return estado
+
+    def adquirir(self, url):
+        """
+        Bloquea hasta que haya una ficha y un lugar libre para el host de la URL.
+        Cada adquirir() debe terminar con un liberar().
+        """
+        host = urlparse(url).netloc
+        with self._condicion:
+            while True:
+                estado = self._estado(host)
+                ahora = time.monotonic()
+                estado.fichas = min(RAFAGA_MAXIMA, estado.fichas + (ahora - estado.recarga) * estado.tasa)
+                estado.recarga = ahora
+                if ahora < estado.pausa_hasta:
+                    espera = estado.pausa_hasta - ahora
+                elif estado.en_curso >= int(estado.concurrencia):
+                    espera = None  # Hasta que termine otra solicitud
+                elif estado.fichas < 1:
+                    espera = (1 - estado.fichas) / estado.tasa
+                else:
+                    estado.fichas -= 1
+                    estado.en_curso += 1
+                    return
+                self._condicion.wait(espera)
+
+    def liberar(self, url, estado_http=None, segundos=None, error=False, reintentar_en=None):
+        """
+        Devuelve el lugar de la solicitud e informa cómo le fue: estado HTTP y
+        segundos hasta la respuesta, o error=True si no hubo respuesta (tiempo
+        agotado, conexión). reintentar_en son los segundos del Retry-After.
+        """
+        host = urlparse(url).netloc
+        with self._condicion:
+            estado = self._estado(host)
+            estado.en_curso = max(0, estado.en_curso - 1)
+            ahora = time.monotonic()
+            if error or estado_http in ESTADOS_SATURACION:
+                if reintentar_en:
+                    estado.pausa_hasta = max(estado.pausa_hasta, ahora + min(reintentar_en, PAUSA_MAXIMA))
+                self._reducir(estado, ahora, FACTOR_REDUCCION)
+            elif segundos is not None:
+                estado.latencia_media = segundos if estado.latencia_media is None else estado.latencia_media + 0.2 * (segundos - estado.latencia_media)
+                if estado.latencia_base is None or segundos < estado.latencia_base:
+                    estado.latencia_base = segundos
+                else:
+                    estado.latencia_base += 0.01 * (segundos - estado.latencia_base)
+                if estado.latencia_media > max(LATENCIA_SIGNIFICATIVA, FACTOR_LATENCIA * estado.latencia_base):
+                    self._reducir(estado, ahora, FACTOR_REDUCCION_LATENCIA)
+                else:
+                    # Hasta la primera reducción se sube rápido (+1 por respuesta, el ritmo se duplica
+                    # en cada vuelta); después, aumento aditivo: +1 por vuelta completa
+                    paso_tasa = 1.0 if not estado.reducciones else 1.0 / estado.tasa
+                    paso_concurrencia = 1.0 if not estado.reducciones else 1.0 / estado.concurrencia
+                    estado.tasa = min(self.tasa_maxima, estado.tasa + paso_tasa)
+                    estado.concurrencia = min(self.concurrencia_maxima, estado.concurrencia + paso_concurrencia)
+            self._condicion.notify_all()
+
+    def _reducir(self, estado, ahora, factor):
+        if ahora - estado.ultima_reduccion < max(estado.latencia_media or 0.0, INTERVALO_MINIMO_REDUCCION):
+            return
+        estado.ultima_reduccion = ahora
+        estado.tasa = max(TASA_MINIMA, estado.tasa * factor)
+        estado.concurrencia = max(1.0, estado.concurrencia * factor)
+        estado.reducciones += 1
+
+    def resumen(self):
+        """
+        Texto corto con la tasa y la concurrencia a las que llegó cada host.
+        """
+        with self._condicion:
+            return "; ".join(
+                f"{host}: {estado.tasa:.1f} sol/s, {int(estado.concurrencia)} en curso, {estado.reducciones} reducciones"
+                for host, estado in self._hosts.items()
+            )
+
+    def gobernar(self, session):
+        """
+        Hace pasar por el limitador cada intercambio HTTP de la sesión (también
+        cada salto de una redirección y las descargas de archivos). Se envuelve
+        el send de cada adaptador, así el lugar se libera al llegar los encabezados.
+        """
+        for adaptador in set(session.adapters.values()):
+            if getattr(adaptador, "_limitador", None) is not None:
+                continue
+            adaptador.send = self._envolver(adaptador.send, session)
+            adaptador._limitador = self
+        return session
+
+    def _envolver(self, send, session):
+        def send_limitado(solicitud, *args, **kwargs):
+            # Las métricas de la sesión (si está instrumentada) miden la espera y
+            # cada intento por separado, no como parte de la latencia
+            metricas = getattr(session, "_metricas", None)
+            intento = 0
+            inicio_espera = time.monotonic()
+            while True:
+                # adquirir() espera también la pausa del Retry-After de la respuesta anterior
+                self.adquirir(solicitud.url)
+                inicio = time.monotonic()
+                if metricas is not None:
+                    metricas.registrar_espera(solicitud.method, solicitud.url, inicio - inicio_espera)
+                try:
+                    respuesta = send(solicitud, *args, **kwargs)
+                except (requests.Timeout, requests.ConnectionError):
+                    self.liberar(solicitud.url, error=True)
+                    raise
+                except Exception:
+                    self.liberar(solicitud.url)
+                    raise
+                segundos = time.monotonic() - inicio
+                reintentar_en = _segundos_retry_after(respuesta)
+                self.liberar(solicitud.url, respuesta.status_code, segundos, reintentar_en=reintentar_en)
+                if (respuesta.status_code not in ESTADOS_SATURACION or solicitud.method not in METODOS_REINTENTABLES
+                        or intento >= REINTENTOS_SATURACION):
+                    return respuesta
+                respuesta.close()
+                if metricas is not None:
+                    metricas.registrar_reintento(solicitud.method, solicitud.url, respuesta.status_code, segundos)
+                inicio_espera = time.monotonic()
+                if not reintentar_en:
+                    time.sleep(min(PAUSA_MAXIMA, ESPERA_REINTENTO * 2 ** intento))
+                intento += 1
+        return send_limitado
+
+def _segundos_retry_after(respuesta):
+    valor = respuesta.headers.get("Retry-After", "")
+    return float(valor) if valor.strip().isdigit() else None
+
+# Limitador compartido por todos los trabajadores y sesiones del proceso
+limitador_host = LimitadorAdaptativo()
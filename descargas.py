@@ -1,47 +1,82 @@
+import hashlib
 import os
 import re
 import time
 import requests
-import pandas as pd
-from bs4 import BeautifulSoup
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from urllib.parse import unquote, urlparse, parse_qs
-
-import flet
-from flet import (
-    Page,
-    TextField,
-    Dropdown,
-    dropdown,
-    ElevatedButton,
-    Text,
-    Column,
-    alignment,
-    Image,
-    Icons,  # Asegúrate de usar 'Icons' en mayúsculas
-    Container
-)
-
-# Intentamos importar pypdf para leer metadatos de PDF (opcional).
-try:
-    import pypdf  # pip install pypdf
-    HAVE_PYPDF = True
-except ImportError:
-    HAVE_PYPDF = False
-
-# Lista global para almacenar recursos antes de generar Excel
-RECURSOS_ENCONTRADOS = []
-
-# Credenciales únicas (mismas para las 3 plataformas)
-MOODLE_USER = "extraccion_ustacv"
-MOODLE_PASS = "000"
-
-# Opciones de plataformas con nombre, URL, color y sufijo de carpeta
-PLATAFORMAS = [
-    {"name": "Pregrado", "url": "https://pregrado.ustabuca.edu.co", "color": "#00dba7", "folder_suffix": "Pregrado"},
-    {"name": "Posgrado", "url": "https://posgrado.ustabuca.edu.co", "color": "#7700ca", "folder_suffix": "Posgrado"},
-    {"name": "Educación Continua", "url": "https://educacioncontinua.ustabuca.edu.co", "color": "#06ff3b", "folder_suffix": "Educontinua"},
+from moodle_ws import FuenteWebServices, ErrorWebServices
+from cache_http import cache_compartido
+from metricas import metricas_compartidas
+from parseo import extraer_estructura_curso, extraer_recursos_intermedios, extraer_categoria
+from plataformas import PLATAFORMAS, MOODLE_USER, MOODLE_PASS
+from sesion_moodle import obtener_sesion, ErrorSesion
+import concurrencia
+from concurrencia import semaforo_host, semaforo_transferencias, configurar_transferencias_por_host
+from salida import abrir_salida, formatos_disponibles, FORMATOS_SALIDA
+from trabajos import TrabajoSegundoPlano, TrabajoParcial, TrabajoCancelado, describir_progreso
+from sincronizacion import SincronizacionCurso, resumen_sincronizacion
+from almacen import AlmacenContenido, CARPETA_ALMACEN, MODOS_ENLACE, resumen_almacen
+from postproceso_pdf import RenombradoPDF, crear_grupo_procesos, HAVE_PYPDF
+
+# Columnas del manifiesto de recursos, en este orden
+COLUMNAS_MANIFIESTO = ["ID_Curso", "Nombre_Curso", "Seccion", "Nombre", "Vinculo", "Estado"]
+
+# Columnas del resumen de una descarga por lotes (una fila por curso)
+COLUMNAS_RESUMEN = ["ID_Curso", "Nombre_Curso", "Carpeta", "Manifiesto", "Recursos", "Descargados", "Ausentes", "Enlaces", "Omitidos", "Actualizados", "Agregados", "Estado"]
+# Columnas del resumen que cuentan recursos o archivos (0 en un curso cancelado o con error)
+CONTEOS_RESUMEN = ["Recursos", "Descargados", "Ausentes", "Enlaces", "Omitidos", "Actualizados", "Agregados"]
+
+# Cursos que se descargan a la vez en una descarga por lotes (comparten sesión y conexiones)
+CURSOS_SIMULTANEOS = 3
+
+# Archivos que se descargan a la vez dentro de un curso (el límite por servidor está en concurrencia.py)
+DESCARGAS_SIMULTANEAS = 4
+
+# Bytes que se leen de la red y se escriben a disco por bloque al descargar un archivo
+TAMANO_BLOQUE_DESCARGA = 256 * 1024
+
+# Primeros bytes que se conservan para reconocer el tipo de archivo
+TAMANO_CABECERA = 8192
+
+# Velocidad por debajo de la cual una descarga se marca como lenta en el registro
+VELOCIDAD_LENTA_KB_S = 100
+
+# Firmas (primeros bytes) de los tipos de archivo habituales en los cursos
+FIRMAS_ARCHIVO = [
+    (b"%PDF-", '.pdf'),
+    (b"{\\rtf", '.rtf'),
+    (b"PK\x03\x04", '.zip'),
+    (b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1", '.doc'),
+    (b"\x89PNG\r\n\x1a\n", '.png'),
+    (b"\xff\xd8\xff", '.jpg'),
+    (b"GIF8", '.gif'),
+    (b"Rar!\x1a\x07", '.rar'),
+    (b"7z\xbc\xaf\x27\x1c", '.7z'),
+    (b"ID3", '.mp3'),
 ]
 
+# Formatos que por dentro son un zip (se respeta la extensión del servidor)
+EXTENSIONES_ZIP = ('.zip', '.docx', '.xlsx', '.pptx', '.odt', '.ods', '.odp', '.epub', '.h5p', '.mbz')
+
+# Consultas HEAD simultáneas para saber si un recurso es un archivo o una página intermedia
+CONSULTAS_TIPO_SIMULTANEAS = 4
+
+# Íconos de archivo de Moodle (pix/f/<tipo>) que no aseguran que el recurso sea un archivo descargable
+ICONOS_SIN_ARCHIVO = {"html", "markup", "moodle", "unknown"}
+
+# Content-Type de los recursos ya revisados con HEAD, compartido por secciones y cursos
+_tipos_recurso = {}
+_candado_tipos = threading.Lock()
+
+# Fuentes de datos disponibles: páginas HTML (scraping) o API REST de Web Services
+FUENTES_DATOS = {
+    "html": "Páginas HTML",
+    "ws": "Web Services (REST)",
+}
+
 # -----------------------------------------------------------------------------
 # FUNCIONES DE AYUDA
 # -----------------------------------------------------------------------------
@@ -66,6 +101,28 @@ def obtener_nombre_desde_url(url):
     """
     return unquote(url.split('/')[-1].split('?')[0])
 
+def interpretar_ids_cursos(texto):
+    """
+    Convierte un texto como "101, 105 110-120" en la lista de IDs de curso
+    ['101', '105', '110', ..., '120'], en orden y sin repetir.
+    Lanza ValueError si alguna parte no es un número ni un rango.
+    """
+    ids = []
+    for parte in re.split(r"[\s,;]+", texto.strip()):
+        if not parte:
+            continue
+        rango = re.fullmatch(r"(\d+)-(\d+)", parte)
+        if rango:
+            inicio, fin = int(rango.group(1)), int(rango.group(2))
+            if inicio > fin:
+                raise ValueError(f"Rango inválido: {parte}")
+            ids.extend(str(i) for i in range(inicio, fin + 1))
+        elif parte.isdigit():
+            ids.append(parte)
+        else:
+            raise ValueError(f"ID de curso inválido: {parte}")
+    return list(dict.fromkeys(ids))
+
 def extraer_url_onclick(onclick_value):
     """
     Extrae la URL de un atributo onclick que contiene window.open.
@@ -83,82 +140,49 @@ def extraer_url_onclick(onclick_value):
 # -----------------------------------------------------------------------------
 def iniciar_sesion(url_base, log_area):
     """
-    Inicia sesión en la plataforma Moodle dada (url_base)
-    con las credenciales MOODLE_USER / MOODLE_PASS.
+    Retorna la sesión de la plataforma Moodle dada (url_base) con las
+    credenciales MOODLE_USER / MOODLE_PASS. La sesión se comparte en el proceso,
+    reutiliza las cookies guardadas en disco y vuelve a iniciar sesión sola si
+    vence durante la descarga (sesion_moodle.py).
     """
-    login_url = f"{url_base}/login/index.php"
-    session = requests.Session()
-    try:
-        r = session.get(login_url, timeout=10)
-        r.raise_for_status()
-    except requests.RequestException as e:
-        log_area.value = "[ERROR] Al acceder a la página de login."
-        log_area.color = "red"
-        log_area.update()
-        return None
-
-    soup = BeautifulSoup(r.text, 'html.parser')
-    token_input = soup.find("input", {"name": "logintoken"})
-    if not token_input:
-        log_area.value = "[ERROR] No se encontró logintoken en la página de login."
-        log_area.color = "red"
-        log_area.update()
-        return None
-
-    token_value = token_input["value"]
-    login_data = {
-        "username": MOODLE_USER,
-        "password": MOODLE_PASS,
-        "logintoken": token_value
-    }
-
     try:
-        lr = session.post(login_url, data=login_data, timeout=10)
-        lr.raise_for_status()
-    except requests.RequestException as e:
-        log_area.value = "[ERROR] Al enviar credenciales."
+        session = obtener_sesion(url_base, MOODLE_USER, MOODLE_PASS)
+    except ErrorSesion as e:
+        log_area.value = f"[ERROR] {e}"
         log_area.color = "red"
         log_area.update()
         return None
 
-    if "loginerrormessage" not in lr.text.lower():
-        log_area.value = "[INFO] Sesión iniciada correctamente."
-        log_area.color = "green"
-        log_area.update()
-        return session
-    else:
-        log_area.value = "[ERROR] No se pudo iniciar sesión. Revisa credenciales."
-        log_area.color = "red"
-        log_area.update()
-        return None
+    log_area.value = "[INFO] Sesión iniciada correctamente."
+    log_area.color = "green"
+    log_area.update()
+    return session
 
-def obtener_soup(session, url, log_area):
+def obtener_html(session, url, log_area):
     """
-    Obtiene y parsea el contenido HTML de una URL utilizando la sesión dada.
+    Obtiene el contenido HTML de una URL utilizando la sesión dada.
+    Se analiza después con las funciones de parseo.py.
     """
     try:
-        resp = session.get(url, timeout=10)
-        resp.raise_for_status()
-        return BeautifulSoup(resp.text, 'html.parser')
+        # Las páginas de curso, sección e intermedias se revalidan siempre con el servidor
+        # (ttl=0): un recurso agregado hace poco no debe quedar oculto por el caché
+        estado, texto = cache_compartido().obtener(session, url, ttl=0, timeout=10)
+        if estado >= 400:
+            raise requests.HTTPError(f"{estado} al acceder a {url}")
+        return texto
     except requests.RequestException as e:
         log_area.value = f"[ERROR] Al acceder a {url}."
         log_area.color = "red"
         log_area.update()
         return None
 
-def obtener_num_secciones(session, url_base, id_curso, log_area):
+def numero_maximo_seccion(enlaces, numeros=()):
     """
-    Obtiene el número máximo de secciones en un curso dado.
+    Número de la última sección según los enlaces course/view.php?...&section=N
+    y los números de sección que la página ya muestra.
     """
-    url_curso = f"{url_base}/course/view.php?id={id_curso}"
-    soup = obtener_soup(session, url_curso, log_area)
-    if not soup:
-        return 0
-
-    max_seccion = 0
-    anchors = soup.find_all('a', href=True)
-    for a in anchors:
-        href = a["href"]
+    max_seccion = max(numeros, default=0)
+    for (href, *_) in enlaces:
         if "course/view.php" in href and "section=" in href:
             parsed = urlparse(href)
             q = parse_qs(parsed.query)
@@ -171,53 +195,41 @@ def obtener_num_secciones(session, url_base, id_curso, log_area):
                     pass
     return max_seccion
 
-def obtener_nombre_curso(session, url_base, id_curso, log_area):
+def obtener_estructura_curso(session, url_base, id_curso, log_area):
     """
-    Obtiene el nombre del curso a partir de su ID.
+    Lee la página del curso una sola vez y retorna un diccionario con:
+      nombre: nombre limpio del curso
+      max_seccion: número de la última sección
+      secciones: {número: enlaces} de las secciones que la página muestra
+        completas (cuando el tema muestra todas las secciones en la página del
+        curso); las demás se piden aparte con obtener_links_recursos
     """
     url_curso = f"{url_base}/course/view.php?id={id_curso}"
-    soup = obtener_soup(session, url_curso, log_area)
-    if not soup:
-        return f"Curso_{id_curso}"
-
-    titulo = soup.find('h1') or soup.find('title') or soup.find('h2')
-    if titulo:
-        return limpiar_nombre(titulo.get_text(strip=True))
-    return f"Curso_{id_curso}"
+    html = obtener_html(session, url_curso, log_area)
+    if not html:
+        return {"nombre": f"Curso_{id_curso}", "max_seccion": 0, "secciones": {}}
+
+    datos = extraer_estructura_curso(html)
+    return {
+        "nombre": limpiar_nombre(datos["titulo"]) if datos["titulo"] else f"Curso_{id_curso}",
+        "max_seccion": numero_maximo_seccion(datos["enlaces"], [n for n, _, _ in datos["secciones"]]),
+        "secciones": {n: enlaces for n, completa, enlaces in datos["secciones"] if completa},
+    }
 
 def obtener_tuplas_intermedias(session, url, log_area):
     """
     Obtiene recursos intermedios desde una URL específica.
     """
-    soup = obtener_soup(session, url, log_area)
-    if not soup:
+    html = obtener_html(session, url, log_area)
+    if not html:
         return []
     resultados = []
 
-    div_res = soup.find('div', class_='resourceworkaround')
-    if div_res:
-        enlace = div_res.find('a', href=True)
-        if enlace:
-            url_final = enlace['href']
-            texto = enlace.get_text(strip=True)
-            texto = remover_trailing_archivo(texto)
-            resultados.append((url_final, texto))
-
-    a_plug = soup.find_all('a', href=lambda h: h and 'pluginfile.php' in h)
-    for anc in a_plug:
-        link_href = anc['href']
-        text_anch = anc.get_text(strip=True) or ""
-        text_anch = remover_trailing_archivo(text_anch)
-        if not text_anch:
-            text_anch = None
-        resultados.append((link_href, text_anch))
-
-    iframes = soup.find_all('iframe', src=lambda x: x and 'pluginfile.php' in x)
-    embeds = soup.find_all('embed', src=lambda x: x and 'pluginfile.php' in x)
-    objs = soup.find_all('object', data=lambda x: x and 'pluginfile.php' in x)
-    for tag in iframes + embeds + objs:
-        su = tag.get('src') or tag.get('data')
-        resultados.append((su, None))
+    # Enlace de resourceworkaround, enlaces a pluginfile.php e iframe/embed/object, en ese orden
+    for (link_href, texto) in extraer_recursos_intermedios(html):
+        if texto is not None:
+            texto = remover_trailing_archivo(texto) or None
+        resultados.append((link_href, texto))
 
     # Quitar duplicados
     unique = []
@@ -229,31 +241,87 @@ def obtener_tuplas_intermedias(session, url, log_area):
 
     return unique
 
-def obtener_links_recursos(session, url_base, id_curso, seccion_num, log_area):
+def es_icono_de_archivo(icono):
     """
-    Retorna una lista de recursos con su URL, nombre y tipo.
+    True si el ícono de la actividad es el de un tipo de archivo de Moodle
+    (pix/f/pdf, f/document, f/spreadsheet...), es decir, un recurso que se descarga.
     """
-    url_seccion = f"{url_base}/course/view.php?id={id_curso}&section={seccion_num}"
-    soup = obtener_soup(session, url_seccion, log_area)
-    if not soup:
-        return []
+    coincidencia = re.search(r"/f/([a-z0-9]+?)(?:-\d+)?(?:[/?.]|$)", icono or "")
+    return bool(coincidencia) and coincidencia.group(1) not in ICONOS_SIN_ARCHIVO
 
-    recursos = []
-    enlaces = soup.find_all('a', href=True)
-    for enlace in enlaces:
-        instancename = enlace.find('span', class_='instancename')
-        if instancename:
-            sub_ac = instancename.find('span', class_='accesshide')
-            if sub_ac:
-                sub_ac.decompose()
-            nombre_visible = instancename.get_text(strip=True)
-        else:
-            nombre_visible = enlace.get_text(strip=True)
+def url_con_redirect(url):
+    """
+    Agrega redirect=1 a la URL de un recurso: Moodle responde entonces con el
+    archivo del recurso en lugar de la página intermedia.
+    """
+    if 'redirect=1' in url:
+        return url
+    return url + ('&' if '?' in url else '?') + 'redirect=1'
 
+def nombre_recurso(nombre_visible, url):
+    """
+    Nombre de archivo para un recurso a partir de su nombre visible.
+    """
+    final_name = limpiar_nombre(nombre_visible)
+    final_name = remover_trailing_archivo(final_name)
+    if len(final_name) > 70:
+        fallback = limpiar_nombre(obtener_nombre_desde_url(url))
+        final_name = fallback or final_name
+    return final_name
+
+def consultar_tipos_contenido(session, urls, log_area):
+    """
+    Content-Type de cada URL con una solicitud HEAD (siguiendo redirecciones).
+    Las consultas corren a la vez (CONSULTAS_TIPO_SIMULTANEAS, dentro del límite
+    por servidor) y se recuerdan por URL para las demás secciones y cursos.
+    Retorna {url: content-type}; las URL que fallan no quedan en el resultado.
+    """
+    with _candado_tipos:
+        tipos = {u: _tipos_recurso[u] for u in urls if u in _tipos_recurso}
+    faltan = list(dict.fromkeys(u for u in urls if u not in tipos))
+    if not faltan:
+        return tipos
+
+    def consultar(url):
+        with semaforo_host(url):
+            return session.head(url, allow_redirects=True, timeout=10).headers.get('Content-Type', '')
+
+    with ThreadPoolExecutor(max_workers=min(len(faltan), CONSULTAS_TIPO_SIMULTANEAS)) as executor:
+        futuros = {u: executor.submit(consultar, u) for u in faltan}
+    for url, futuro in futuros.items():
+        try:
+            tipos[url] = futuro.result()
+        except requests.RequestException as e:
+            log_area.value = "[ERROR] HEAD en " + url
+            log_area.color = "red"
+            log_area.update()
+    with _candado_tipos:
+        _tipos_recurso.update({u: tipos[u] for u in faltan if u in tipos})
+    return tipos
+
+def obtener_links_recursos(session, url_base, id_curso, seccion_num, log_area, enlaces=None):
+    """
+    Retorna una lista de recursos con su URL, nombre y tipo.
+    Si no se dan los enlaces de la sección (ya leídos de la página del curso),
+    se pide la página de la sección.
+    El tipo de cada recurso (archivo o página intermedia) se decide con lo que ya
+    trae el HTML (redirect=1, ícono del tipo de archivo); solo los recursos sin
+    esas pistas se revisan con HEAD (consultar_tipos_contenido).
+    """
+    if enlaces is None:
+        url_seccion = f"{url_base}/course/view.php?id={id_curso}&section={seccion_num}"
+        html = obtener_html(session, url_seccion, log_area)
+        if not html:
+            return []
+        # Solo los enlaces de la sección, si el tema la marca; si no, los de toda la página
+        datos = extraer_estructura_curso(html)
+        enlaces = next((e for n, _, e in datos["secciones"] if n == seccion_num), datos["enlaces"])
+
+    # Primera pasada: cada enlace se clasifica con lo que dice el HTML
+    candidatos = []
+    for (url_h, onclick_val, nombre_visible, icono) in enlaces:
         nombre_visible = remover_trailing_archivo(nombre_visible)
-        url_h = enlace['href']
 
-        onclick_val = enlace.get('onclick', '')
         match_ = extraer_url_onclick(onclick_val)
         if match_ and 'redirect=1' in match_:
             url_h = match_
@@ -262,177 +330,736 @@ def obtener_links_recursos(session, url_base, id_curso, seccion_num, log_area):
             real_name = limpiar_nombre(obtener_nombre_desde_url(url_h))
             if len(real_name) > 70:
                 real_name = real_name[:70]
-            recursos.append((url_h, real_name, "file"))
+            candidatos.append((url_h, real_name, "file"))
 
         elif "mod/resource/view.php" in url_h:
-            try:
-                rh = session.head(url_h, allow_redirects=True, timeout=10)
-                ctype = rh.headers.get('Content-Type', '')
-                if ctype.startswith('application/'):
-                    final_name = limpiar_nombre(nombre_visible)
-                    final_name = remover_trailing_archivo(final_name)
-                    if len(final_name) > 70:
-                        fallback = limpiar_nombre(obtener_nombre_desde_url(url_h))
-                        final_name = fallback or final_name
-                    recursos.append((url_h, final_name, "file"))
-                else:
-                    tuplas = obtener_tuplas_intermedias(session, url_h, log_area)
-                    for (fu, ft) in tuplas:
-                        if ft:
-                            nm = ft
-                        else:
-                            nm = nombre_visible
-                        nm = limpiar_nombre(remover_trailing_archivo(nm))
-                        if len(nm) > 70:
-                            fb = limpiar_nombre(obtener_nombre_desde_url(fu))
-                            nm = fb or nm
-                        recursos.append((fu, nm, "file"))
-            except requests.RequestException as e:
-                log_area.value = "[ERROR] HEAD en " + url_h
-                log_area.color = "red"
-                log_area.update()
+            if 'redirect=1' in url_h or es_icono_de_archivo(icono):
+                candidatos.append((url_con_redirect(url_h), nombre_recurso(nombre_visible, url_h), "file"))
+            else:
+                candidatos.append((url_h, nombre_visible, "revisar"))
 
         elif "mod/url/view.php" in url_h:
             # Recurso URL
-            recursos.append((url_h, nombre_visible, "url"))
+            candidatos.append((url_h, nombre_visible, "url"))
         else:
             pass
 
+    # Segunda pasada: los recursos sin pistas se revisan con HEAD, todos a la vez
+    tipos = consultar_tipos_contenido(session, [u for u, _, t in candidatos if t == "revisar"], log_area)
+    recursos = []
+    for (url_h, nombre_visible, tipo) in candidatos:
+        if tipo != "revisar":
+            recursos.append((url_h, nombre_visible, tipo))
+        elif url_h not in tipos:
+            continue
+        elif tipos[url_h].startswith('application/'):
+            recursos.append((url_h, nombre_recurso(nombre_visible, url_h), "file"))
+        else:
+            tuplas = obtener_tuplas_intermedias(session, url_h, log_area)
+            for (fu, ft) in tuplas:
+                if ft:
+                    nm = ft
+                else:
+                    nm = nombre_visible
+                nm = limpiar_nombre(remover_trailing_archivo(nm))
+                if len(nm) > 70:
+                    fb = limpiar_nombre(obtener_nombre_desde_url(fu))
+                    nm = fb or nm
+                recursos.append((fu, nm, "file"))
+
     return recursos
 
-def descargar_archivo(session, url, carpeta_destino, nombre_archivo, log_area):
+def nombre_en_respuesta(respuesta):
+    """
+    Nombre real del archivo de una descarga: el de Content-Disposition si lo trae
+    o el de la URL final (tras seguir las redirecciones de view.php?...&redirect=1).
+    """
+    disposicion = respuesta.headers.get('Content-Disposition', '')
+    coincidencia = re.search(r"filename\*\s*=\s*[^']*'[^']*'([^;]+)", disposicion) or re.search(r'filename\s*=\s*"?([^";]+)"?', disposicion)
+    if coincidencia:
+        return unquote(coincidencia.group(1).strip())
+    return respuesta.url
+
+def extension_por_tipo(url, ctype):
+    """
+    Extensión según el Content-Type de la respuesta o, si no se reconoce, según la URL
+    (o nombre de archivo). La de un script de Moodle (.php) nunca es la del archivo.
+    """
+    ctype = ctype.lower()
+    if '.rtf' in url.lower():
+        return '.rtf'
+    if 'application/pdf' in ctype:
+        return '.pdf'
+    elif 'application/msword' in ctype:
+        return '.doc'
+    elif 'application/vnd.openxmlformats-officedocument.wordprocessingml.document' in ctype:
+        return '.docx'
+    elif 'application/vnd.ms-excel' in ctype:
+        return '.xls'
+    elif 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet' in ctype:
+        return '.xlsx'
+    elif 'application/rtf' in ctype or 'text/rtf' in ctype:
+        return '.rtf'
+    extension = os.path.splitext(url.split('?')[0])[-1]
+    return '' if extension.lower() == '.php' else extension
+
+def extension_por_contenido(cabecera, url, ctype):
+    """
+    Extensión del tipo real del archivo según sus primeros bytes. Content-Type y
+    URL solo deciden entre formatos del mismo contenedor (zip de Office,
+    OLE de Office 97-2003) o cuando la firma no se reconoce; 'url' debe ser
+    la del archivo (nombre_en_respuesta), no la de view.php.
+    """
+    sugerida = extension_por_tipo(url, ctype)
+    if cabecera[4:8] == b"ftyp":
+        return sugerida if sugerida.lower() in ('.mp4', '.m4a', '.mov') else '.mp4'
+    extension = next((ext for firma, ext in FIRMAS_ARCHIVO if cabecera.startswith(firma)), None)
+    if extension is None:
+        return sugerida
+    if extension == '.zip':
+        if sugerida.lower() in EXTENSIONES_ZIP:
+            return sugerida
+        # El primer bloque suele traer las rutas internas del documento de Office
+        for marca, ext_office in ((b"word/", '.docx'), (b"xl/", '.xlsx'), (b"ppt/", '.pptx')):
+            if marca in cabecera:
+                return ext_office
+    if extension == '.doc' and sugerida.lower() in ('.xls', '.ppt'):
+        return sugerida
+    return extension
+
+def encolar_renombrado(renombrador, ruta_final, url, sincronizacion=None):
+    """
+    Deja el PDF en la cola de renombrado por título (postproceso_pdf.py); si
+    cambia de nombre, el manifiesto de sincronización se actualiza.
+    """
+    al_renombrar = None
+    if sincronizacion is not None:
+        al_renombrar = lambda ruta_nueva: sincronizacion.mover(url, ruta_nueva)
+    renombrador.encolar(ruta_final, al_renombrar)
+
+def descargar_archivo(session, url, carpeta_destino, nombre_archivo, log_area, trabajo=None, sincronizacion=None, almacen=None, renombrador=None):
     """
     Descarga un archivo desde una URL y lo guarda en la carpeta destino con el nombre especificado.
+    La extensión se decide por los primeros bytes del archivo (extension_por_contenido).
+    Si se indica un trabajo (trabajos.py), se le suman los bytes descargados.
+    Los bytes, segundos y KB/s de cada transferencia van a las métricas de la ejecución (metricas.py).
+    Si se indica un renombrador (postproceso_pdf.py), los PDF se renombran por su
+    título después, fuera de la descarga.
+    Si se indica una sincronización (sincronizacion.py), la descarga es incremental:
+    un archivo sin cambios en el servidor (ETag/Last-Modified o mismo hash) no se
+    vuelve a escribir, y una descarga interrumpida continúa con una solicitud Range.
+    Si se indica un almacén (almacen.py), el contenido se guarda una sola vez por
+    hash y en la carpeta queda un enlace; una URL ya conocida no se vuelve a transferir.
     """
+    ruta_parcial = None
     try:
         ruta_inicial = os.path.join(carpeta_destino, nombre_archivo)
-        if os.path.exists(ruta_inicial):
-            os.remove(ruta_inicial)
-
-        r = session.get(url, stream=True, allow_redirects=True, timeout=10)
-        if r.status_code != 200:
+        ruta_parcial = ruta_inicial + ".part"
+        encabezados = {}
+        conocido = previo = almacenado = None
+        if sincronizacion is None:
+            if os.path.exists(ruta_inicial):
+                os.remove(ruta_inicial)
+        else:
+            # Solo se confía en el manifiesto si el archivo sigue en disco con el mismo tamaño
+            conocido = previo = sincronizacion.obtener(url)
+            if previo and not (os.path.exists(previo["ruta"]) and os.path.getsize(previo["ruta"]) == previo["tamano"]):
+                previo = None
+            if previo and previo["etag"]:
+                encabezados["If-None-Match"] = previo["etag"]
+            if previo and previo["last_modified"]:
+                encabezados["If-Modified-Since"] = previo["last_modified"]
+
+        if almacen is not None and previo is None:
+            # URL ya vista (en otra sección, otro curso u otra ejecución) con su contenido en el almacén
+            almacenado = almacen.buscar(url)
+            if almacenado and almacen.verificada(url):
+                return enlazar_desde_almacen(url, almacenado, carpeta_destino, nombre_archivo, log_area, almacen, sincronizacion, conocido, renombrador)
+            if almacenado and almacenado["etag"]:
+                encabezados["If-None-Match"] = almacenado["etag"]
+            if almacenado and almacenado["last_modified"]:
+                encabezados["If-Modified-Since"] = almacenado["last_modified"]
+
+        if sincronizacion is not None:
+            # Descarga interrumpida con validadores: se piden solo los bytes que faltan
+            parcial = sincronizacion.obtener_parcial(url)
+            if parcial and parcial["ruta_parcial"] == ruta_parcial and os.path.exists(ruta_parcial):
+                encabezados["Range"] = f"bytes={os.path.getsize(ruta_parcial)}-"
+                encabezados["If-Range"] = parcial["etag"] or parcial["last_modified"]
+                # Los bytes guardados son los del archivo sin comprimir
+                encabezados["Accept-Encoding"] = "identity"
+
+        inicio_descarga = time.monotonic()
+        r = session.get(url, stream=True, allow_redirects=True, timeout=10, headers=encabezados)
+        if r.status_code == 304 and (previo or almacenado):
+            if "Range" in encabezados:
+                os.remove(ruta_parcial)
+                sincronizacion.borrar_parcial(url)
+            if almacenado:
+                almacen.registrar_url(url, almacenado["hash"], almacenado["tamano"], almacenado["etag"], almacenado["last_modified"], almacenado["extension"])
+                return enlazar_desde_almacen(url, almacenado, carpeta_destino, nombre_archivo, log_area, almacen, sincronizacion, conocido, renombrador)
+            sincronizacion.contar("omitidos", previo["tamano"])
+            log_area.value = "[INFO] Sin cambios: " + previo["ruta"]
+            log_area.color = "green"
+            log_area.update()
+            return True
+        if r.status_code not in (200, 206):
             log_area.value = "[ERROR] al descargar " + url
             log_area.color = "red"
             log_area.update()
             return False
 
-        ctype = r.headers.get('Content-Type', '').lower()
-        extension = None
-
-        if '.rtf' in url.lower():
-            extension = '.rtf'
-        else:
-            if 'application/pdf' in ctype:
-                extension = '.pdf'
-            elif 'application/msword' in ctype:
-                extension = '.doc'
-            elif 'application/vnd.openxmlformats-officedocument.wordprocessingml.document' in ctype:
-                extension = '.docx'
-            elif 'application/vnd.ms-excel' in ctype:
-                extension = '.xls'
-            elif 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet' in ctype:
-                extension = '.xlsx'
-            elif 'application/rtf' in ctype or 'text/rtf' in ctype:
-                extension = '.rtf'
-            else:
-                ext_fallback = os.path.splitext(url.split('?')[0])[-1]
-                extension = ext_fallback
+        etag = r.headers.get('ETag')
+        last_modified = r.headers.get('Last-Modified')
 
+        # 206: el servidor continúa desde donde quedó el archivo parcial; 200: se empieza de cero
+        hash_archivo = hashlib.sha256()
+        cabecera = b''
+        inicio = encabezados.get("Range", "bytes=0-")[6:-1]
+        reanudar = r.status_code == 206 and r.headers.get('Content-Range', '').startswith(f"bytes {inicio}-")
+        if r.status_code == 206 and not reanudar:
+            log_area.value = "[ERROR] Respuesta parcial inesperada al descargar " + url
+            log_area.color = "red"
+            log_area.update()
+            return False
+        if reanudar:
+            with open(ruta_parcial, 'rb') as f:
+                for bloque in iter(lambda: f.read(TAMANO_BLOQUE_DESCARGA), b''):
+                    if len(cabecera) < TAMANO_CABECERA:
+                        cabecera += bloque[:TAMANO_CABECERA - len(cabecera)]
+                    hash_archivo.update(bloque)
+            sincronizacion.contar_reanudado()
+            log_area.value = f"[INFO] Reanudando desde {inicio} bytes: {ruta_inicial}"
+            log_area.color = "blue"
+            log_area.update()
+        elif sincronizacion is not None and (etag or last_modified):
+            sincronizacion.registrar_parcial(url, ruta_parcial, etag, last_modified)
+
+        # Se escribe en un archivo .part y se reemplaza al terminar: nunca queda un archivo a medias
+        # con el nombre final. El hash y los primeros bytes (para el tipo) se toman mientras llega.
+        descargados = 0
+        with open(ruta_parcial, 'ab' if reanudar else 'wb') as f:
+            for chunk in r.iter_content(chunk_size=TAMANO_BLOQUE_DESCARGA):
+                if chunk:
+                    if len(cabecera) < TAMANO_CABECERA:
+                        cabecera += chunk[:TAMANO_CABECERA - len(cabecera)]
+                    f.write(chunk)
+                    hash_archivo.update(chunk)
+                    descargados += len(chunk)
+                    if trabajo:
+                        trabajo.avanzar(cantidad_bytes=len(chunk))
+        segundos = time.monotonic() - inicio_descarga
+        hash_archivo = hash_archivo.hexdigest()
+        tamano = os.path.getsize(ruta_parcial)
+
+        # El tipo real sale de los primeros bytes; Content-Type y el nombre real del archivo
+        # (Content-Disposition o URL final, no la de view.php) solo desempatan
+        extension = extension_por_contenido(cabecera, nombre_en_respuesta(r), r.headers.get('Content-Type', ''))
         if extension and not nombre_archivo.lower().endswith(extension.lower()):
             nombre_archivo += extension
-
         ruta_final = os.path.join(carpeta_destino, nombre_archivo)
 
-        with open(ruta_final, 'wb') as f:
-            for chunk in r.iter_content(chunk_size=1024):
-                if chunk:
-                    f.write(chunk)
-
-        log_area.value = "[INFO] Archivo descargado: " + ruta_final
-        log_area.color = "green"
+        if sincronizacion is not None:
+            sincronizacion.borrar_parcial(url)
+            if previo and previo["hash"] == hash_archivo:
+                # El servidor no envió validadores (o cambiaron) pero el contenido es el mismo
+                os.remove(ruta_parcial)
+                sincronizacion.guardar(url, previo["ruta"], tamano, etag, last_modified, hash_archivo)
+                sincronizacion.contar("omitidos", tamano)
+                if almacen is not None:
+                    almacen.registrar_url(url, hash_archivo, tamano, etag, last_modified, extension)
+                log_area.value = "[INFO] Sin cambios: " + previo["ruta"]
+                log_area.color = "green"
+                log_area.update()
+                return True
+            if previo and previo["ruta"] != ruta_final and os.path.exists(previo["ruta"]):
+                # La versión anterior (quizá renombrada por el título del PDF) se reemplaza
+                os.remove(previo["ruta"])
+        if almacen is not None:
+            almacen.guardar(ruta_parcial, hash_archivo)
+            almacen.enlazar(hash_archivo, ruta_final)
+            almacen.registrar_url(url, hash_archivo, tamano, etag, last_modified, extension)
+        else:
+            os.replace(ruta_parcial, ruta_final)
+
+        # Velocidad de cada archivo, para ver qué transferencias van lentas
+        kb_s = descargados / 1024 / segundos if segundos > 0 else 0.0
+        lento = descargados >= TAMANO_BLOQUE_DESCARGA and kb_s < VELOCIDAD_LENTA_KB_S
+        metricas_compartidas().registrar_transferencia(descargados, segundos, lenta=lento)
+        log_area.value = f"[INFO] Archivo descargado: {ruta_final} ({descargados / (1024 * 1024):.2f} MB en {segundos:.1f} s, {kb_s:.0f} KB/s{', lento' if lento else ''})"
+        log_area.color = "orange" if lento else "green"
         log_area.update()
 
-        if extension == '.pdf' and HAVE_PYPDF:
-            try:
-                from pypdf import PdfReader
-                with open(ruta_final, 'rb') as pdf_f:
-                    reader = PdfReader(pdf_f)
-                    info = reader.metadata
-                    titulo_pdf = info.get('/Title', '') if info else ''
-                time.sleep(0.2)
-                if titulo_pdf:
-                    titulo_pdf_limpio = limpiar_nombre(titulo_pdf.strip())[:70]
-                    if titulo_pdf_limpio:
-                        ruta_renombrada = os.path.join(carpeta_destino, titulo_pdf_limpio + '.pdf')
-                        if not os.path.exists(ruta_renombrada):
-                            os.rename(ruta_final, ruta_renombrada)
-                            log_area.value = "[INFO] Renombrado PDF: " + ruta_renombrada
-                            log_area.color = "green"
-                            log_area.update()
-            except Exception as e:
-                log_area.value = "[WARN] No se pudo leer metadatos PDF."
-                log_area.color = "orange"
-                log_area.update()
+        if sincronizacion is not None:
+            sincronizacion.guardar(url, ruta_final, tamano, etag, last_modified, hash_archivo)
+            sincronizacion.contar("actualizados" if conocido else "agregados", descargados)
+
+        if extension == '.pdf' and renombrador is not None:
+            encolar_renombrado(renombrador, ruta_final, url, sincronizacion)
 
         return True
     except Exception as e:
+        # Sin sincronización el archivo parcial no se puede reanudar: no se deja en la carpeta
+        if sincronizacion is None and ruta_parcial and os.path.exists(ruta_parcial):
+            os.remove(ruta_parcial)
         log_area.value = "[ERROR] Al procesar " + url
         log_area.color = "red"
         log_area.update()
         return False
 
-def recorrer_secciones_curso(session, url_base, id_curso, carpeta_curso, log_area, nombre_curso):
+def enlazar_desde_almacen(url, almacenado, carpeta_destino, nombre_archivo, log_area, almacen, sincronizacion=None, conocido=None, renombrador=None):
     """
-    Recorre todas las secciones de un curso y descarga los recursos.
+    Deja en la carpeta un enlace al contenido que el almacén ya tiene para la URL,
+    sin transferirlo de nuevo.
+    """
+    extension = almacenado["extension"]
+    if extension and not nombre_archivo.lower().endswith(extension.lower()):
+        nombre_archivo += extension
+    ruta_final = os.path.join(carpeta_destino, nombre_archivo)
+    if conocido and conocido["ruta"] != ruta_final and os.path.exists(conocido["ruta"]):
+        os.remove(conocido["ruta"])
+    almacen.enlazar(almacenado["hash"], ruta_final)
+    almacen.contar_evitada(almacenado["tamano"])
+    log_area.value = "[INFO] Enlazado desde el almacén: " + ruta_final
+    log_area.color = "green"
+    log_area.update()
+
+    if sincronizacion is not None:
+        sincronizacion.guardar(url, ruta_final, almacenado["tamano"], almacenado["etag"], almacenado["last_modified"], almacenado["hash"])
+        sincronizacion.contar("actualizados" if conocido else "agregados")
+
+    if extension == '.pdf' and renombrador is not None:
+        encolar_renombrado(renombrador, ruta_final, url, sincronizacion)
+    return True
+
+def secciones_html(session, url_base, id_curso, log_area, nombre_curso, trabajo=None, estructura=None):
+    """
+    Recorre las secciones leyendo las páginas HTML y entrega (sección, recursos) una a una.
+    Las secciones que ya vienen en la página del curso (estructura, de
+    obtener_estructura_curso) no se vuelven a pedir.
     """
-    RECURSOS_ENCONTRADOS.clear()
-    max_sec = obtener_num_secciones(session, url_base, id_curso, log_area)
-    log_area.value = f"[INFO] El curso {id_curso} ({nombre_curso}) tiene secciones de 0 a {max_sec}."
+    estructura = estructura or obtener_estructura_curso(session, url_base, id_curso, log_area)
+    max_sec = estructura["max_seccion"]
+    leidas = estructura["secciones"]
+    faltan = sum(1 for sec in range(max_sec + 1) if sec not in leidas)
+    log_area.value = (
+        f"[INFO] El curso {id_curso} ({nombre_curso}) tiene secciones de 0 a {max_sec} "
+        f"({max_sec + 1 - faltan} leídas de la página del curso, {faltan} por pedir)."
+    )
     log_area.color = "blue"
     log_area.update()
+    if trabajo:
+        trabajo.avanzar(total=max_sec + 1)
 
     for sec in range(max_sec + 1):
-        recs = obtener_links_recursos(session, url_base, id_curso, sec, log_area)
-        log_area.value += f"\n[INFO] Sección {sec}: {len(recs)} recursos."
-        log_area.update()
-        if not recs:
-            continue
+        yield sec, obtener_links_recursos(session, url_base, id_curso, sec, log_area, leidas.get(sec))
 
-        carpeta_secc = os.path.join(carpeta_curso, f"Seccion_{sec}")
-        os.makedirs(carpeta_secc, exist_ok=True)
+def secciones_web_services(fuente, id_curso, log_area, nombre_curso, trabajo=None):
+    """
+    Obtiene todas las secciones con una sola llamada a Web Services y normaliza
+    los nombres igual que el scraping HTML.
+    """
+    try:
+        secciones = fuente.obtener_secciones_recursos(id_curso)
+    except (requests.RequestException, ValueError, ErrorWebServices) as e:
+        log_area.value = f"[ERROR] Web Services core_course_get_contents: {e}"
+        log_area.color = "red"
+        log_area.update()
+        return
+    log_area.value = f"[INFO] El curso {id_curso} ({nombre_curso}) tiene {len(secciones)} secciones (Web Services)."
+    log_area.color = "blue"
+    log_area.update()
+    if trabajo:
+        trabajo.avanzar(total=len(secciones))
+
+    for sec, recursos in secciones:
+        normalizados = []
+        for (ur, nm, tipo) in recursos:
+            if tipo == "file":
+                nm = limpiar_nombre(remover_trailing_archivo(nm or obtener_nombre_desde_url(ur)))
+                if len(nm) > 70:
+                    nm = limpiar_nombre(obtener_nombre_desde_url(ur))[:70] or nm[:70]
+            normalizados.append((ur, nm, tipo))
+        yield sec, normalizados
+
+def recorrer_secciones_curso(session, url_base, id_curso, carpeta_curso, log_area, nombre_curso, fuente=None, salida=None, trabajo=None, descargas_simultaneas=DESCARGAS_SIMULTANEAS, sincronizacion=None, almacen=None, renombrador=None, estructura=None):
+    """
+    Recorre todas las secciones de un curso y descarga los recursos.
+    Si se indica una fuente de Web Services, las secciones se leen de la API REST;
+    si no, de la página del curso ya leída (estructura) o pidiéndola.
+    Los archivos se descargan en un grupo de hilos (descargas_simultaneas, y a lo
+    sumo concurrencia.TRANSFERENCIAS_POR_HOST a la vez por servidor) mientras se
+    siguen leyendo las secciones siguientes; el manifiesto conserva el orden de
+    los recursos.
+    Si se indica una salida (salida.py), cada recurso se escribe en el manifiesto
+    apenas se conoce su estado; si no, los registros se retornan en resumen["registros"].
+    Si se indica un trabajo (trabajos.py), se informa cada sección terminada y
+    se lanza TrabajoCancelado entre recursos cuando se pide cancelar.
+    Si se indica una sincronización (sincronizacion.py), solo se descargan los
+    archivos nuevos o cambiados desde la ejecución anterior.
+    Si se indica un almacén (almacen.py), los archivos repetidos se guardan una
+    sola vez y en las carpetas de sección quedan enlaces.
+    Si se indica un renombrador (postproceso_pdf.py), los PDF quedan en su cola
+    para renombrarlos por título al final (RenombradoPDF.aplicar).
+    Retorna un resumen con la cantidad de recursos, descargados, ausentes y enlaces.
+    """
+    resumen = {"Recursos": 0, "Descargados": 0, "Ausentes": 0, "Enlaces": 0}
+    registros = []
+    # Recursos en el orden del curso: (registro, futuro de la descarga o None)
+    pendientes = deque()
+    # Última descarga hacia cada ruta: dos recursos con el mismo nombre no se escriben a la vez
+    ultima_descarga = {}
+    # Descargas sin terminar por sección, para informar la sección cuando termina de verdad
+    faltan_por_seccion = {}
+    candado = threading.Lock()
+
+    def registrar(registro):
+        resumen["Recursos"] += 1
+        resumen[{"presente": "Enlaces", "descargada": "Descargados"}.get(registro["Estado"], "Ausentes")] += 1
+        if salida is not None:
+            salida.escribir(registro)
+        else:
+            registros.append(registro)
+
+    def escribir_terminados(esperar=False):
+        # Escribe en orden los recursos cuyo estado ya se conoce
+        while pendientes:
+            registro, futuro = pendientes[0]
+            if futuro is not None:
+                if (not esperar and not futuro.done()) or futuro.cancelled():
+                    break
+                registro["Estado"] = "descargada" if futuro.result() else "ausente"
+            pendientes.popleft()
+            registrar(registro)
+
+    def seccion_avanzada(sec):
+        with candado:
+            faltan_por_seccion[sec] -= 1
+            terminada = faltan_por_seccion[sec] == 0
+        if terminada and trabajo:
+            trabajo.avanzar(hechos=1)
+
+    def descargar(ur, carpeta_secc, nm, anterior, registro):
+        if anterior is not None:
+            anterior.result()
+        with semaforo_transferencias(ur):
+            if trabajo and trabajo.cancelado():
+                return False
+            return descargar_archivo(session, ur, carpeta_secc, nm, log_area, trabajo, sincronizacion, almacen, renombrador=renombrador)
+
+    if fuente is not None:
+        secciones = secciones_web_services(fuente, id_curso, log_area, nombre_curso, trabajo)
+    else:
+        secciones = secciones_html(session, url_base, id_curso, log_area, nombre_curso, trabajo, estructura)
 
-        for (ur, nm, tipo) in recs:
-            if tipo == "url":
-                # No se descarga => "presente"
-                RECURSOS_ENCONTRADOS.append({
+    executor = ThreadPoolExecutor(max_workers=max(1, descargas_simultaneas))
+    try:
+        for sec, recs in secciones:
+            log_area.value += f"\n[INFO] Sección {sec}: {len(recs)} recursos."
+            log_area.update()
+            if trabajo:
+                trabajo.verificar_cancelacion()
+            # La sección cuenta como terminada cuando terminan todas sus descargas (+1 por la lectura)
+            faltan_por_seccion[sec] = 1
+
+            if recs:
+                carpeta_secc = os.path.join(carpeta_curso, f"Seccion_{sec}")
+                os.makedirs(carpeta_secc, exist_ok=True)
+
+            for (ur, nm, tipo) in recs:
+                if trabajo:
+                    trabajo.verificar_cancelacion()
+                registro = {
                     "ID_Curso": id_curso,
                     "Nombre_Curso": nombre_curso,
                     "Seccion": sec,
                     "Nombre": nm,
                     "Vinculo": ur,
                     "Estado": "presente"
-                })
-            else:
-                # Archivos => se intenta descargar
-                ok = descargar_archivo(session, ur, carpeta_secc, nm, log_area)
-                estado = "descargada" if ok else "ausente"
-                RECURSOS_ENCONTRADOS.append({
-                    "ID_Curso": id_curso,
-                    "Nombre_Curso": nombre_curso,
-                    "Seccion": sec,
-                    "Nombre": nm,
-                    "Vinculo": ur,
-                    "Estado": estado
-                })
+                }
+                if tipo == "url":
+                    # No se descarga => "presente"
+                    pendientes.append((registro, None))
+                else:
+                    # Archivos => se intenta descargar en el grupo de hilos
+                    clave = (carpeta_secc, nm)
+                    with candado:
+                        faltan_por_seccion[sec] += 1
+                    futuro = executor.submit(descargar, ur, carpeta_secc, nm, ultima_descarga.get(clave), registro)
+                    futuro.add_done_callback(lambda _, sec=sec: seccion_avanzada(sec))
+                    ultima_descarga[clave] = futuro
+                    pendientes.append((registro, futuro))
+
+            seccion_avanzada(sec)
+            escribir_terminados()
+
+        escribir_terminados(esperar=True)
+    finally:
+        # Si se canceló o falló la lectura, no se empiezan las descargas en cola,
+        # pero sí quedan en el manifiesto los recursos que alcanzaron a terminar
+        executor.shutdown(wait=True, cancel_futures=True)
+        escribir_terminados()
+
+    if trabajo:
+        trabajo.verificar_cancelacion()
+    if salida is None:
+        resumen["registros"] = registros
+    return resumen
+
+# -----------------------------------------------------------------------------
+# DESCARGA POR LOTES
+# -----------------------------------------------------------------------------
+def listar_cursos_categoria(session, url_base, id_categoria, log_area, fuente=None):
+    """
+    Retorna los IDs de todos los cursos de una categoría y de sus subcategorías,
+    en el orden en que aparecen (recorrido en profundidad, sin repetir).
+    """
+    ids = []
+    pendientes = [str(id_categoria)]
+    vistas = set()
+    while pendientes:
+        id_cat = pendientes.pop()
+        if id_cat in vistas:
+            continue
+        vistas.add(id_cat)
+        if fuente is not None:
+            try:
+                cursos, subcategorias = fuente.listar_categoria(id_cat)
+            except (requests.RequestException, ValueError, ErrorWebServices) as e:
+                log_area.value = f"[ERROR] Web Services categoría {id_cat}: {e}"
+                log_area.color = "red"
+                log_area.update()
+                continue
+            ids.extend(str(id_curso) for id_curso, _, _ in cursos)
+            subcategorias = [str(sub_id) for sub_id, _ in subcategorias]
+        else:
+            html = obtener_html(session, f"{url_base}/course/index.php?categoryid={id_cat}", log_area)
+            if not html:
+                continue
+            tarjetas, bloques = extraer_categoria(html)
+            ids.extend(parse_qs(urlparse(href).query)["id"][0] for _, href in tarjetas if href and "id=" in href)
+            subcategorias = [
+                parse_qs(urlparse(href).query)["categoryid"][0]
+                for _, href in bloques if href and "categoryid=" in href
+            ]
+        # Se apilan al revés para visitar las subcategorías en el orden de la página
+        pendientes.extend(reversed(subcategorias))
+    return list(dict.fromkeys(ids))
+
+def nombre_del_curso(session, url_base, id_curso, log_area, fuente=None):
+    """
+    Nombre limpio del curso, leído de la página del curso o de Web Services.
+    """
+    if fuente is None:
+        return obtener_estructura_curso(session, url_base, id_curso, log_area)["nombre"]
+    try:
+        nombre_ws = fuente.obtener_nombre_curso(id_curso)
+    except (requests.RequestException, ValueError, ErrorWebServices):
+        nombre_ws = None
+    return limpiar_nombre(nombre_ws) if nombre_ws else f"Curso_{id_curso}"
+
+def abrir_almacen(plataforma, modo="duro"):
+    """
+    Almacén de archivos compartido por todas las descargas de la plataforma,
+    o None si el modo es "copia" (cada carpeta con su propia copia).
+    """
+    if modo == "copia":
+        return None
+    return AlmacenContenido(os.path.join(f"Descargas_{plataforma['folder_suffix']}", CARPETA_ALMACEN), modo)
+
+def carpeta_para_curso(plataforma, id_curso, nombre_curso):
+    """
+    Nombre de la carpeta del curso: el ID en Posgrado y Educación Continua,
+    los primeros 10 caracteres del nombre en Pregrado.
+    """
+    if plataforma["name"].lower() in ["posgrado", "educación continua"]:
+        return id_curso
+    return nombre_curso[:10]
+
+def fila_resumen(id_curso, **valores):
+    """
+    Fila del resumen por lotes con todas las columnas de COLUMNAS_RESUMEN: los
+    conteos empiezan en 0 y el resto vacío, así los cursos cancelados o con
+    error tienen las mismas columnas y tipos que los completos.
+    """
+    fila = dict.fromkeys(COLUMNAS_RESUMEN)
+    fila.update(dict.fromkeys(CONTEOS_RESUMEN, 0))
+    fila["ID_Curso"] = id_curso
+    fila.update(valores)
+    return fila
+
+def descargar_lote(session, plataforma, ids_cursos, log_area, formato, fuente=None, trabajo=None, cursos_simultaneos=CURSOS_SIMULTANEOS, incremental=True, almacen=None):
+    """
+    Descarga varios cursos a la vez con la misma sesión (un solo login y un
+    solo pool de conexiones). Cada curso queda en su carpeta con su propio
+    manifiesto. Si incremental es True, cada carpeta guarda su manifiesto de
+    sincronización y solo se descarga lo nuevo o cambiado (la fila del curso
+    cuenta los archivos omitidos, actualizados y agregados). Con un almacén
+    (abrir_almacen), el mismo archivo en varias secciones o cursos se guarda
+    una sola vez. Los títulos de los PDF se leen en un grupo de procesos
+    mientras siguen las descargas y se renombran al terminar cada curso.
+    Retorna (ruta, filas): la ruta del resumen combinado (o la del
+    manifiesto si es un solo curso) y la fila de resumen de cada curso.
+    """
+    base_dir = f"Descargas_{plataforma['folder_suffix']}"
+    os.makedirs(base_dir, exist_ok=True)
+    candado = threading.Lock()
+    carpetas_usadas = set()
+    grupo_pdf = crear_grupo_procesos() if HAVE_PYPDF else None
+
+    def descargar_curso(id_curso):
+        if trabajo and trabajo.cancelado():
+            return fila_resumen(id_curso, Estado="cancelado")
+        # Con HTML, la página del curso se lee una vez: nombre, secciones y enlaces
+        estructura = None
+        if fuente is None:
+            estructura = obtener_estructura_curso(session, plataforma["url"], id_curso, log_area)
+            nombre_curso = estructura["nombre"]
+        else:
+            nombre_curso = nombre_del_curso(session, plataforma["url"], id_curso, log_area, fuente)
+
+        # Dos cursos del mismo lote nunca comparten carpeta
+        carpeta = carpeta_para_curso(plataforma, id_curso, nombre_curso)
+        with candado:
+            if carpeta in carpetas_usadas:
+                carpeta = f"{carpeta}_{id_curso}"
+            carpetas_usadas.add(carpeta)
+        carpeta_curso = os.path.join(base_dir, carpeta)
+        os.makedirs(carpeta_curso, exist_ok=True)
+
+        # Manifiesto del curso escrito a medida que se procesan los recursos
+        manifiesto_path = os.path.join(carpeta_curso, f"recursos.{formato}")
+        fila = fila_resumen(id_curso, Nombre_Curso=nombre_curso, Carpeta=carpeta_curso, Manifiesto=manifiesto_path)
+        sincronizacion = SincronizacionCurso(carpeta_curso) if incremental else None
+        renombrador = RenombradoPDF(grupo_pdf, limpiar_nombre) if grupo_pdf else None
+        try:
+            with abrir_salida(manifiesto_path, COLUMNAS_MANIFIESTO) as salida:
+                fila.update(recorrer_secciones_curso(
+                    session, plataforma["url"], id_curso, carpeta_curso, log_area, nombre_curso,
+                    fuente=fuente, salida=salida, trabajo=TrabajoParcial(trabajo) if trabajo else None,
+                    sincronizacion=sincronizacion, almacen=almacen, renombrador=renombrador,
+                    estructura=estructura
+                ))
+            fila["Estado"] = "completo"
+        except TrabajoCancelado:
+            fila["Estado"] = "cancelado"
+        except Exception as e:
+            log_area.value = f"[ERROR] Curso {id_curso}: {e}"
+            log_area.color = "red"
+            log_area.update()
+            fila["Estado"] = f"error: {e}"
+        finally:
+            # También si se canceló: los PDF ya descargados quedan con su título
+            if renombrador is not None:
+                renombrador.aplicar(log_area)
+            if sincronizacion is not None:
+                fila["Sincronizacion"] = sincronizacion.totales()
+                fila.update({k: v for k, v in fila["Sincronizacion"].items() if k in COLUMNAS_RESUMEN})
+                sincronizacion.cerrar()
+        return fila
+
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, cursos_simultaneos)) as executor:
+            filas = list(executor.map(descargar_curso, ids_cursos))
+    finally:
+        if grupo_pdf is not None:
+            grupo_pdf.shutdown()
+
+    if len(filas) == 1:
+        return filas[0].get("Manifiesto"), filas
+
+    # Resumen combinado con una fila por curso, en el orden pedido
+    resumen_path = os.path.join(base_dir, f"resumen_descargas.{formato}")
+    with abrir_salida(resumen_path, COLUMNAS_RESUMEN) as resumen:
+        for fila in filas:
+            resumen.escribir(fila)
+    return resumen_path, filas
 
 # -----------------------------------------------------------------------------
 # INTERFAZ FLET
 # -----------------------------------------------------------------------------
-def main(page: Page):
+def descargar_cursos(plataforma, ids_cursos, id_categoria, formato, trabajo, usar_ws=False, incremental=True, modo_enlace="duro", cursos_simultaneos=CURSOS_SIMULTANEOS):
+    """
+    Descarga un lote de cursos (o todos los de la categoría si ids_cursos está
+    vacío) con un solo login. La usan la ventana y cli.py; trabajo (trabajos.py)
+    es obligatorio: los mensajes van por trabajo.registro. Retorna (mensaje, color).
+    """
+    log_area = trabajo.registro
+    cache = cache_compartido()
+    metricas = metricas_compartidas()
+
+    # Un solo login (o un solo token) para todos los cursos del lote
+    fuente = None
+    if usar_ws:
+        # Web Services: el token sirve tanto para la API como para descargar los archivos
+        try:
+            fuente = FuenteWebServices.conectar(plataforma["url"], MOODLE_USER, MOODLE_PASS)
+        except (requests.RequestException, ValueError, ErrorWebServices) as e:
+            return f"Fallo al obtener token de Web Services: {e}", "red"
+        ses = fuente.session
+    else:
+        # Iniciar sesión
+        ses = iniciar_sesion(plataforma["url"], log_area)
+        if not ses:
+            return "Fallo al iniciar sesión.", "red"
+    trabajo.contar_respuestas(ses)
+
+    cursos = ids_cursos
+    if not cursos:
+        cursos = listar_cursos_categoria(ses, plataforma["url"], id_categoria, log_area, fuente)
+        if not cursos:
+            return f"No se encontraron cursos en la categoría {id_categoria}.", "red"
+
+    almacen = abrir_almacen(plataforma, modo_enlace)
+    try:
+        ruta, filas = descargar_lote(
+            ses, plataforma, cursos, log_area, formato,
+            fuente=fuente, trabajo=trabajo, cursos_simultaneos=cursos_simultaneos, incremental=incremental, almacen=almacen
+        )
+    finally:
+        if almacen is not None:
+            almacen.cerrar()
+        # Métricas de red de la ejecución: metricas_descargas.metricas.json y metricas_descargas.prom
+        carpeta_descargas = f"Descargas_{plataforma['folder_suffix']}"
+        os.makedirs(carpeta_descargas, exist_ok=True)
+        metricas.exportar(os.path.join(carpeta_descargas, "metricas_descargas"))
+    fallidos = [f["ID_Curso"] for f in filas if f["Estado"].startswith("error")]
+    sincronizados = [f["Sincronizacion"] for f in filas if "Sincronizacion" in f]
+    sincronizacion = ""
+    if sincronizados:
+        sincronizacion = "\n" + resumen_sincronizacion({k: sum(s[k] for s in sincronizados) for k in sincronizados[0]})
+    sincronizacion += "\n" + metricas.resumen()
+    if almacen is not None:
+        sincronizacion += "\n" + resumen_almacen(almacen.totales())
+    if len(filas) == 1:
+        if fallidos:
+            return f"Fallo al generar el manifiesto: {filas[0]['Estado']}", "red"
+        return f"Proceso completado.\nManifiesto generado en: {ruta}\n{cache.resumen()}{sincronizacion}", "green"
+    detalle = f"\nCursos con error: {', '.join(fallidos)}" if fallidos else ""
+    return f"Proceso completado: {len(filas)} cursos.\nResumen generado en: {ruta}{detalle}\n{cache.resumen()}{sincronizacion}", "orange" if fallidos else "green"
+
+def main(page):
+    # Flet solo se importa al abrir la ventana: cli.py usa este módulo en servidores sin interfaz
+    from flet import (
+        TextField,
+        Dropdown,
+        dropdown,
+        ElevatedButton,
+        Text,
+        Column,
+        alignment,
+        Image,
+        Icons,  # Asegúrate de usar 'Icons' en mayúsculas
+        Container,
+        Checkbox,
+        ProgressBar,
+        Row
+    )
+
     page.title = "Recursos Campus Virtual"
     # Configurar dimensiones de la ventana (actualizado a versiones recientes de Flet)
     page.window.width = 600  # Ventana más pequeña
-    page.window.height = 500  # Ventana más pequeña
+    page.window.height = 850
 
     # Mensaje de advertencia para el icono
     advertencia_icono = Text(
@@ -481,8 +1108,49 @@ def main(page: Page):
         width=400  # Ancho reducido
     )
 
+    # Dropdown de fuente de datos
+    fuente_dropdown = Dropdown(
+        label="Fuente de datos",
+        options=[dropdown.Option(k, text=v) for k, v in FUENTES_DATOS.items()],
+        value="html",
+        width=400
+    )
+
+    # Dropdown de formato del manifiesto de recursos
+    formato_dropdown = Dropdown(
+        label="Formato del manifiesto",
+        options=[dropdown.Option(k, text=FORMATOS_SALIDA[k]) for k in formatos_disponibles()],
+        value=formatos_disponibles()[0],
+        width=400
+    )
+
+    # Dropdown de descargas simultáneas por servidor
+    transferencias_dropdown = Dropdown(
+        label="Descargas simultáneas por servidor",
+        options=[dropdown.Option(str(n)) for n in (1, 2, 4, 8)],
+        value=str(concurrencia.TRANSFERENCIAS_POR_HOST),
+        width=400
+    )
+
     # Campo para ID curso (input_rango)
-    curso_id_field = TextField(label="ID del curso", width=400)  # Ancho reducido
+    curso_id_field = TextField(label="ID(s) del curso (ej: 101 o 101, 105, 110-120)", width=400)  # Ancho reducido
+
+    # Campo para descargar todos los cursos de una categoría (y sus subcategorías)
+    categoria_field = TextField(label="O ID de categoría (todos sus cursos)", width=400)
+
+    # Casilla para ignorar el caché de páginas en esta ejecución
+    cache_checkbox = Checkbox(label="Ignorar caché (volver a descargar todas las páginas)", value=False, width=400)
+
+    # Dropdown de cómo guardar los archivos repetidos entre secciones y cursos
+    enlaces_dropdown = Dropdown(
+        label="Archivos repetidos",
+        options=[dropdown.Option(k, text=v) for k, v in MODOS_ENLACE.items()],
+        value="duro",
+        width=400
+    )
+
+    # Casilla para descargar solo los archivos nuevos o cambiados desde la última vez
+    incremental_checkbox = Checkbox(label="Descarga incremental (solo archivos nuevos o cambiados)", value=True, width=400)
 
     # Línea horizontal superior (Container)
     linea_superior = Container(
@@ -526,12 +1194,54 @@ def main(page: Page):
     # Asignar la función al evento on_change del dropdown
     plataforma_dropdown.on_change = on_plataforma_change
 
+    # Botón para cancelar la descarga en curso
+    cancelar_btn = ElevatedButton(
+        text="Cancelar",
+        icon=Icons.CANCEL,
+        bgcolor="#d9534f",
+        color="white",
+        disabled=True
+    )
+
+    # Barra y texto de progreso (cursos, páginas, bytes y tiempo restante)
+    barra_progreso = ProgressBar(width=400, value=0, visible=False)
+    progreso_text = Text(value="", size=12, text_align="center")
+    trabajo_actual = [None]
+
+    def mostrar_progreso(progreso):
+        # Se llama desde el hilo del trabajo a un ritmo fijo (trabajos.REFRESCOS_POR_SEGUNDO)
+        barra_progreso.value = progreso["fraccion"]
+        progreso_text.value = describir_progreso(progreso)
+        if progreso["mensaje"]:
+            estado_text.value = progreso["mensaje"]
+            estado_text.color = progreso["color"] or "blue"
+        page.update()
+
+    def descarga_terminada(resultado, error):
+        if isinstance(error, TrabajoCancelado):
+            estado_text.value = "Descarga cancelada. El manifiesto contiene los recursos procesados hasta ese momento."
+            estado_text.color = "orange"
+        elif error is not None:
+            estado_text.value = f"Fallo al generar el manifiesto: {error}"
+            estado_text.color = "red"
+        else:
+            estado_text.value, estado_text.color = resultado
+        barra_progreso.visible = False
+        descargar_btn.disabled = False
+        cancelar_btn.disabled = True
+        trabajo_actual[0] = None
+        page.update()
+
+    def on_cancelar_click(e):
+        if trabajo_actual[0]:
+            trabajo_actual[0].cancelar()
+            cancelar_btn.disabled = True
+            cancelar_btn.update()
+
     # Función al hacer clic en el botón
     def on_descargar_click(e):
-        # Limpiar estado
-        estado_text.value = "Iniciando proceso de descarga..."
-        estado_text.color = "blue"
-        estado_text.update()
+        if trabajo_actual[0]:
+            return
 
         # Recuperar la plataforma seleccionada
         selected_text = plataforma_dropdown.value
@@ -544,53 +1254,54 @@ def main(page: Page):
             estado_text.update()
             return
 
-        curso_id = curso_id_field.value.strip()
-
-        if not curso_id:
-            estado_text.value = "Por favor, ingresa un ID de curso."
+        # Lote de cursos: lista y rangos de IDs, o todos los cursos de una categoría
+        try:
+            ids_cursos = interpretar_ids_cursos(curso_id_field.value or "")
+        except ValueError as ex:
+            estado_text.value = str(ex)
             estado_text.color = "red"
             estado_text.update()
             return
+        id_categoria = (categoria_field.value or "").strip()
 
-        # Iniciar sesión
-        ses = iniciar_sesion(base_url, estado_text)
-        page.update()
-        if not ses:
-            estado_text.value = "Fallo al iniciar sesión."
+        if not ids_cursos and not id_categoria.isdigit():
+            estado_text.value = "Por favor, ingresa uno o más IDs de curso o un ID de categoría."
             estado_text.color = "red"
             estado_text.update()
             return
 
-        # Obtener nombre del curso
-        nombre_curso = obtener_nombre_curso(ses, base_url, curso_id, estado_text)
-
-        # Determinar el sufijo de la carpeta basado en la plataforma
-        folder_suffix = selected_platform["folder_suffix"]
-
-        # Crear carpeta del curso con nombre dinámico basado en la plataforma
-        base_dir = f"Descargas_{folder_suffix}"
-        os.makedirs(base_dir, exist_ok=True)
-        carpeta_curso = os.path.join(base_dir, nombre_curso_corto := (curso_id if selected_platform["name"].lower() in ["posgrado", "educación continua"] else nombre_curso[:10]))
-        os.makedirs(carpeta_curso, exist_ok=True)
-
-        # Recorrer secciones
-        recorrer_secciones_curso(ses, base_url, curso_id, carpeta_curso, estado_text, nombre_curso)
+        cache = cache_compartido()
+        cache.omitir = cache_checkbox.value
+        cache.reiniciar_contadores()
+        metricas = metricas_compartidas()
+        metricas.reiniciar()
+        usar_ws = fuente_dropdown.value == "ws"
+        formato = formato_dropdown.value
+        incremental = incremental_checkbox.value
+        modo_enlace = enlaces_dropdown.value
+        configurar_transferencias_por_host(transferencias_dropdown.value)
+
+        def descargar(trabajo):
+            # Corre en un hilo aparte; los mensajes se escriben en trabajo.registro
+            # (mismo uso que estado_text) y se muestran en mostrar_progreso
+            log_area = trabajo.registro
+            log_area.value = "Iniciando proceso de descarga..."
+            log_area.color = "blue"
+            log_area.update()
 
-        # Generar Excel
-        df = pd.DataFrame(RECURSOS_ENCONTRADOS, columns=["ID_Curso", "Nombre_Curso", "Seccion", "Nombre", "Vinculo", "Estado"])
-        excel_path = os.path.join(carpeta_curso, "recursos.xlsx")
-        try:
-            df.to_excel(excel_path, index=False)
-            estado_text.value = f"Proceso completado.\nExcel generado en: {excel_path}"
-            estado_text.color = "green"
-        except Exception as e:
-            estado_text.value = f"Fallo al generar Excel: {e}"
-            estado_text.color = "red"
+            return descargar_cursos(selected_platform, ids_cursos, id_categoria, formato, usar_ws=usar_ws, trabajo=trabajo, incremental=incremental, modo_enlace=modo_enlace)
 
-        estado_text.update()
+        descargar_btn.disabled = True
+        cancelar_btn.disabled = False
+        barra_progreso.value = None
+        barra_progreso.visible = True
+        progreso_text.value = ""
+        page.update()
+        trabajo_actual[0] = TrabajoSegundoPlano(descargar, mostrar_progreso, descarga_terminada, unidad="secciones").iniciar()
 
     # Asignar la función al botón
     descargar_btn.on_click = on_descargar_click
+    cancelar_btn.on_click = on_cancelar_click
 
     # Añadir todos los elementos a la página con el diseño solicitado
     page.add(
@@ -610,10 +1321,27 @@ def main(page: Page):
                     titulo,
                     # Dropdown de plataformas
                     plataforma_dropdown,
+                    # Dropdown de fuente de datos
+                    fuente_dropdown,
+                    # Dropdown de formato del manifiesto
+                    formato_dropdown,
+                    # Dropdown de descargas simultáneas
+                    transferencias_dropdown,
                     # Campo para ID del curso
                     curso_id_field,
-                    # Botón para descargar
-                    descargar_btn,
+                    # Campo para ID de categoría
+                    categoria_field,
+                    # Casilla de caché
+                    cache_checkbox,
+                    # Casilla de descarga incremental
+                    incremental_checkbox,
+                    # Dropdown de archivos repetidos
+                    enlaces_dropdown,
+                    # Botones para descargar y cancelar
+                    Row([descargar_btn, cancelar_btn], alignment="center"),
+                    # Progreso de la descarga
+                    barra_progreso,
+                    progreso_text,
                     # Mensaje de estado
                     estado_text,
                     # Mensaje de advertencia del icono (si aplica)
@@ -625,5 +1353,6 @@ def main(page: Page):
 
 # Ejecutar flet
 if __name__ == "__main__":
+    import flet
     flet.app(target=main)
 
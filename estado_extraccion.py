@@ -0,0 +1,108 @@
+import json
+import os
+import sqlite3
+import threading
+
+# -----------------------------------------------------------------------------
+# PUNTO DE CONTROL DE LA EXTRACCIÓN DE INFORMES
+# -----------------------------------------------------------------------------
+def ruta_estado(id_categoria, carpeta=".", plataforma=None):
+    """
+    Archivo de estado que corresponde a la extracción de una categoría
+    (de una plataforma, si se indica su sufijo).
+    """
+    if plataforma:
+        return os.path.join(carpeta, f"estado_extraccion_{plataforma}_{id_categoria}.sqlite")
+    return os.path.join(carpeta, f"estado_extraccion_{id_categoria}.sqlite")
+
+class EstadoExtraccion:
+    """
+    Guarda en SQLite cada categoría descubierta, la ubicación de cada curso en
+    el árbol y el resultado de cada curso terminado, en el momento en que
+    ocurre. Si la ejecución se interrumpe, una nueva ejecución con el mismo
+    archivo continúa solo con lo que faltaba.
+    """
+    def __init__(self, ruta, reanudar=True):
+        self.ruta = ruta
+        self._candado = threading.Lock()
+        self._conexion = sqlite3.connect(ruta, check_same_thread=False)
+        self._conexion.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS categorias (
+                id_categoria TEXT PRIMARY KEY,
+                subcategorias TEXT,
+                orden TEXT,
+                hecha INTEGER DEFAULT 0
+            );
+            CREATE TABLE IF NOT EXISTS ubicaciones (
+                id_curso TEXT PRIMARY KEY,
+                datos TEXT
+            );
+            CREATE TABLE IF NOT EXISTS participantes (
+                id_curso TEXT PRIMARY KEY,
+                datos TEXT
+            );
+            """
+        )
+        if not reanudar:
+            self.reiniciar()
+
+    def reiniciar(self):
+        """
+        Borra todo el progreso guardado para empezar la extracción desde cero.
+        """
+        with self._candado:
+            self._conexion.executescript(
+                "DELETE FROM categorias; DELETE FROM ubicaciones; DELETE FROM participantes;"
+            )
+            self._conexion.commit()
+
+    def _escribir(self, sql, parametros):
+        with self._candado:
+            self._conexion.execute(sql, parametros)
+            self._conexion.commit()
+
+    def registrar_categoria(self, id_categoria, subcategorias, orden):
+        self._escribir(
+            "INSERT OR IGNORE INTO categorias (id_categoria, subcategorias, orden) VALUES (?, ?, ?)",
+            (str(id_categoria), json.dumps(subcategorias), json.dumps(list(orden)))
+        )
+
+    def completar_categoria(self, id_categoria):
+        self._escribir("UPDATE categorias SET hecha = 1 WHERE id_categoria = ?", (str(id_categoria),))
+
+    def guardar_ubicacion(self, id_curso, ubicacion):
+        datos = dict(ubicacion, orden=list(ubicacion["orden"]))
+        self._escribir("INSERT OR REPLACE INTO ubicaciones VALUES (?, ?)", (str(id_curso), json.dumps(datos)))
+
+    def guardar_participantes(self, id_curso, participantes):
+        self._escribir("INSERT OR REPLACE INTO participantes VALUES (?, ?)", (str(id_curso), json.dumps(participantes)))
+
+    def cargar(self):
+        """
+        Retorna el progreso guardado:
+          categorias: [(id, subcategorias, orden, hecha)]
+          ubicaciones: {id_curso: ubicacion}
+          participantes: {id_curso: resumen}
+        """
+        with self._candado:
+            categorias = [
+                (id_cat, json.loads(subs), tuple(json.loads(orden)), bool(hecha))
+                for id_cat, subs, orden, hecha in self._conexion.execute(
+                    "SELECT id_categoria, subcategorias, orden, hecha FROM categorias"
+                )
+            ]
+            ubicaciones = {}
+            for id_curso, datos in self._conexion.execute("SELECT id_curso, datos FROM ubicaciones"):
+                ubicacion = json.loads(datos)
+                ubicacion["orden"] = tuple(ubicacion["orden"])
+                ubicaciones[id_curso] = ubicacion
+            participantes = {
+                id_curso: json.loads(datos)
+                for id_curso, datos in self._conexion.execute("SELECT id_curso, datos FROM participantes")
+            }
+        return {"categorias": categorias, "ubicaciones": ubicaciones, "participantes": participantes}
+
+    def cerrar(self):
+        with self._candado:
+            self._conexion.close()
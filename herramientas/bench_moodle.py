@@ -0,0 +1,456 @@
+"""
+Mide de punta a punta la extracción de informes y la descarga de cursos contra
+un Moodle sintético local, sin tocar la plataforma real:
+
+    python herramientas/bench_moodle.py [--escalas 10,100,1000] [--latencia-ms 20]
+
+Para cada escala se levanta, en otro proceso, un servidor que genera páginas
+parecidas a las de Moodle: login con logintoken, árbol de categorías con
+tarjetas dashboard-card, participantes paginados, secciones de curso,
+páginas intermedias de recursos y archivos de pluginfile.php. Luego se
+ejecutan obtener_todos_los_cursos (informes_pregrado.py) y
+recorrer_secciones_curso (descargas.py) y se informan el tiempo total, las
+solicitudes por segundo y el pico de memoria de Python (tracemalloc).
+Al final se revisa que cada recurso descargado haya quedado con la extensión
+de su archivo real (PDF, CSV sin firma o docx); los que no cuentan como errores.
+
+El servidor también se puede dejar corriendo solo para probar a mano:
+
+    python herramientas/bench_moodle.py --solo-servidor --puerto 8766 --escalas 100
+"""
+import argparse
+import math
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+COOKIE_SESION = "MoodleSession=benchmark"
+LOGINTOKEN = "logintoken-benchmark"
+
+# Content-Type de los archivos de pluginfile.php según su extensión
+TIPOS_ARCHIVO = {
+    ".pdf": "application/pdf",
+    ".docx": "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+    ".csv": "text/csv",
+}
+
+# Último acceso de los participantes, en ciclo (el tercero cuenta como inactivo)
+ACCESOS = ["3 días 4 horas", "2 horas 5 minutos", "70 días 1 hora", "Nunca"]
+
+# -----------------------------------------------------------------------------
+# MOODLE SINTÉTICO
+# -----------------------------------------------------------------------------
+class MoodleSintetico:
+    """
+    Genera al vuelo las páginas de un Moodle con 'cursos' cursos repartidos en
+    categorías de 'cursos_por_categoria' cursos, cada una con 'ramas'
+    subcategorías (árbol completo desde la categoría 1). Los cursos tienen
+    ids desde 1000; nada se guarda en memoria, así que sirve para 10.000 cursos.
+    """
+    def __init__(self, cursos, cursos_por_categoria=25, ramas=4, participantes=40, max_por_pagina=5000,
+                 secciones=4, recursos_por_seccion=4, tamano_kb=32, una_seccion_por_pagina=False):
+        self.cursos = cursos
+        self.cursos_por_categoria = cursos_por_categoria
+        self.ramas = ramas
+        self.participantes = participantes
+        self.max_por_pagina = max_por_pagina
+        self.secciones = secciones
+        self.recursos_por_seccion = recursos_por_seccion
+        self.tamano = tamano_kb * 1024
+        self.una_seccion_por_pagina = una_seccion_por_pagina
+        self.categorias = max(1, math.ceil(cursos / cursos_por_categoria))
+
+    @staticmethod
+    def archivo_recurso(modulo):
+        """
+        Archivo al que redirige view.php?...&redirect=1: en las secciones impares
+        una hoja CSV (texto sin firma de archivo), en las demás un PDF.
+        """
+        return f"datos_{modulo}.csv" if int(modulo) // 100 % 2 else f"lectura_{modulo}.pdf"
+
+    @staticmethod
+    def _pagina(titulo, cuerpo, id_body="page"):
+        return (
+            f'<!DOCTYPE html>\n<html dir="ltr" lang="es"><head><title>{titulo}</title></head>\n'
+            f'<body id="{id_body}"><div id="page"><div id="region-main">\n{cuerpo}\n</div></div></body></html>'
+        )
+
+    def login(self):
+        return self._pagina("Acceso", (
+            '<form action="/login/index.php" method="post" id="login">'
+            f'<input type="hidden" name="logintoken" value="{LOGINTOKEN}">'
+            '<input name="username"><input name="password" type="password"></form>'
+        ), "page-login-index")
+
+    def categoria(self, url_base, id_categoria):
+        if not 1 <= id_categoria <= self.categorias:
+            return None
+        primera = self.ramas * (id_categoria - 1) + 2
+        hijas = [c for c in range(primera, primera + self.ramas) if c <= self.categorias]
+        partes = [f"<h1>Categoría {id_categoria}</h1>", '<div class="course_category_tree"><div class="subcategories">']
+        for hija in hijas:
+            partes.append(
+                f'<div class="category loaded" data-categoryid="{hija}"><div class="info"><h3 class="categoryname aabtn">'
+                f'<a href="{url_base}/course/index.php?categoryid={hija}">Subcategoría {hija}</a></h3></div></div>'
+            )
+        partes.append('</div></div><div class="courses" role="list">')
+        inicio = (id_categoria - 1) * self.cursos_por_categoria
+        for indice in range(inicio, min(inicio + self.cursos_por_categoria, self.cursos)):
+            id_curso = 1000 + indice
+            partes.append(
+                f'<div class="card dashboard-card" role="listitem" data-course-id="{id_curso}"><div class="card-body">'
+                f'<a href="{url_base}/course/view.php?id={id_curso}" class="aalink coursename">Curso sintético {id_curso}</a>'
+                '</div></div>'
+            )
+        partes.append("</div>")
+        return self._pagina(f"Categoría {id_categoria}", "\n".join(partes), "page-course-index-category")
+
+    def _existe_curso(self, id_curso):
+        return 1000 <= id_curso < 1000 + self.cursos
+
+    def participantes_pagina(self, url_base, id_curso, perpage, pagina):
+        if not self._existe_curso(id_curso):
+            return None
+        tamano = max(1, min(perpage, self.max_por_pagina))
+        paginas = max(1, math.ceil(self.participantes / tamano))
+        partes = [f'<h2>Participantes</h2><p data-region="participant-count">{self.participantes} participantes encontrados</p>']
+        if paginas > 1:
+            partes.append('<nav class="pagination"><ul class="pagination">')
+            for numero in range(paginas):
+                partes.append(
+                    f'<li class="page-item" data-page-number="{numero + 1}"><a class="page-link" '
+                    f'href="{url_base}/user/index.php?id={id_curso}&amp;perpage={tamano}&amp;page={numero}">{numero + 1}</a></li>'
+                )
+            partes.append("</ul></nav>")
+        partes.append('<table id="participants" class="generaltable"><tbody>')
+        for indice in range(pagina * tamano, min((pagina + 1) * tamano, self.participantes)):
+            rol = "Profesor" if indice < 2 else "Estudiante"
+            partes.append(
+                f'<tr><td class="cell c0"></td><th class="cell c1">Usuario {indice}</th><td class="cell c2">u{indice}@ejemplo.edu.co</td>'
+                f'<td class="cell c3"><span class="inplaceeditable"><a href="#" title="Tareas del rol Usuario {indice} Apellido{indice}">{rol}</a></span></td>'
+                f'<td class="cell c4">No hay grupos</td><td class="cell c5">{ACCESOS[indice % len(ACCESOS)]}</td></tr>'
+            )
+        partes.append("</tbody></table>")
+        return self._pagina(f"Participantes {id_curso}", "\n".join(partes), "page-user-index")
+
+    def _seccion(self, url_base, id_curso, numero):
+        partes = [f'<li id="section-{numero}" class="section main" data-number="{numero}"><h3 class="sectionname">Tema {numero}</h3><ul class="section img-text">']
+        for r in range(self.recursos_por_seccion):
+            modulo = (id_curso * 100 + numero) * 100 + r
+            tipo = r % 4
+            if tipo == 0:
+                # Recurso con ícono de tipo de archivo (PDF u hoja CSV): se descarga directo con redirect=1
+                icono, nombre = ("spreadsheet", "Datos") if numero % 2 else ("pdf", "Lectura")
+                partes.append(
+                    f'<li class="activity resource modtype_resource"><a class="aalink" href="{url_base}/mod/resource/view.php?id={modulo}">'
+                    f'<img src="{url_base}/theme/image.php/boost/core/1/f/{icono}-24" class="activityicon"><span class="instancename">{nombre} {modulo}'
+                    '<span class="accesshide"> Archivo</span></span></a></li>'
+                )
+            elif tipo == 1:
+                # Recurso sin pistas en el HTML: se revisa con HEAD y se lee su página intermedia
+                partes.append(
+                    f'<li class="activity resource modtype_resource"><a class="aalink" href="{url_base}/mod/resource/view.php?id={modulo}">'
+                    f'<img src="{url_base}/theme/image.php/boost/resource/1/monologo" class="activityicon"><span class="instancename">Guía {modulo}'
+                    '<span class="accesshide"> Archivo</span></span></a></li>'
+                )
+            elif tipo == 2:
+                partes.append(
+                    f'<li class="activity url modtype_url"><a class="aalink" href="{url_base}/mod/url/view.php?id={modulo}">'
+                    f'<span class="instancename">Enlace {modulo}<span class="accesshide"> URL</span></span></a></li>'
+                )
+            else:
+                partes.append(
+                    f'<li class="activity label modtype_label"><div class="no-overflow"><p>'
+                    f'<a href="{url_base}/pluginfile.php/{modulo}/mod_label/intro/Plantilla%20{modulo}.docx">Plantilla {modulo}</a></p></div></li>'
+                )
+        partes.append("</ul></li>")
+        return "".join(partes)
+
+    def curso(self, url_base, id_curso, seccion=None):
+        if not self._existe_curso(id_curso):
+            return None
+        partes = [f"<h1>Curso sintético {id_curso}</h1>", '<ul class="topics">']
+        if seccion is not None:
+            if 0 <= seccion < self.secciones:
+                partes.append(self._seccion(url_base, id_curso, seccion))
+        elif self.una_seccion_por_pagina:
+            # Tema de una sección por página: la página del curso solo trae el resumen de cada sección
+            for numero in range(self.secciones):
+                partes.append(
+                    f'<li id="section-{numero}" class="section main section-summary" data-number="{numero}">'
+                    f'<a href="{url_base}/course/view.php?id={id_curso}&amp;section={numero}">Tema {numero}</a></li>'
+                )
+        else:
+            partes.extend(self._seccion(url_base, id_curso, numero) for numero in range(self.secciones))
+        partes.append("</ul>")
+        return self._pagina(f"Curso: Curso sintético {id_curso}", "\n".join(partes), "page-course-view-topics")
+
+    def intermedia(self, url_base, modulo):
+        enlace = f"{url_base}/pluginfile.php/{modulo}/mod_resource/content/1/guia_{modulo}.pdf"
+        return self._pagina(f"Guía {modulo}", (
+            f"<h2>Guía {modulo}</h2>"
+            f'<div class="resourceworkaround">Haga clic en el enlace <a href="{enlace}">guia_{modulo}.pdf</a> para ver el archivo.</div>'
+        ), "page-mod-resource-view")
+
+    def archivo(self, ruta):
+        """
+        Contenido de un archivo de pluginfile.php: PDF, documento ZIP (docx) o CSV según la ruta.
+        """
+        cabecera = {".docx": b"PK\x03\x04", ".csv": b"columna,valor\n"}.get(os.path.splitext(ruta)[1], b"%PDF-1.4\n")
+        relleno = (ruta.encode("utf-8") + b"\n") * (self.tamano // (len(ruta) + 1) + 1)
+        return cabecera + relleno[:max(0, self.tamano - len(cabecera))]
+
+class ManejadorMoodle(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def _responder(self, estado, cuerpo=b"", tipo="text/html; charset=utf-8", encabezados=None):
+        self.send_response(estado)
+        self.send_header("Content-Type", tipo)
+        self.send_header("Content-Length", str(len(cuerpo)))
+        for clave, valor in (encabezados or {}).items():
+            self.send_header(clave, valor)
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(cuerpo)
+
+    def _redirigir(self, destino, encabezados=None):
+        self._responder(303, encabezados={"Location": destino, **(encabezados or {})})
+
+    def _atender(self):
+        moodle, latencia = self.server.moodle, self.server.latencia
+        if latencia:
+            time.sleep(latencia)
+        url = urlparse(self.path)
+        ruta = url.path
+        parametros = {k: v[0] for k, v in parse_qs(url.query).items()}
+        url_base = f"http://{self.headers.get('Host')}"
+
+        if ruta == "/login/index.php":
+            if self.command == "POST":
+                self.rfile.read(int(self.headers.get("Content-Length") or 0))
+                self._redirigir(f"{url_base}/my/", {"Set-Cookie": f"{COOKIE_SESION}; Path=/"})
+            else:
+                self._responder(200, moodle.login().encode("utf-8"))
+            return
+        if COOKIE_SESION not in (self.headers.get("Cookie") or ""):
+            self._redirigir(f"{url_base}/login/index.php")
+            return
+
+        html = None
+        if ruta in ("/my/", "/user/preferences.php"):
+            html = moodle._pagina("Área personal", "<h1>Área personal</h1>")
+        elif ruta == "/course/index.php":
+            html = moodle.categoria(url_base, int(parametros.get("categoryid", 0)))
+        elif ruta == "/user/index.php":
+            html = moodle.participantes_pagina(url_base, int(parametros.get("id", 0)), int(parametros.get("perpage", 20)), int(parametros.get("page", 0)))
+        elif ruta == "/course/view.php":
+            seccion = parametros.get("section")
+            html = moodle.curso(url_base, int(parametros.get("id", 0)), int(seccion) if seccion is not None else None)
+        elif ruta == "/mod/resource/view.php":
+            modulo = parametros.get("id", "0")
+            if parametros.get("redirect") == "1":
+                self._redirigir(f"{url_base}/pluginfile.php/{modulo}/mod_resource/content/1/{moodle.archivo_recurso(modulo)}")
+                return
+            html = moodle.intermedia(url_base, modulo)
+        elif ruta.startswith("/pluginfile.php/"):
+            tipo = TIPOS_ARCHIVO[os.path.splitext(ruta)[1]]
+            self._responder(200, moodle.archivo(ruta), tipo, {"ETag": f'"{abs(hash(ruta))}"', "Last-Modified": "Mon, 02 Feb 2026 10:00:00 GMT"})
+            return
+
+        if html is None:
+            self._responder(404, b"No encontrado")
+        else:
+            self._responder(200, html.encode("utf-8"))
+
+    do_GET = do_POST = do_HEAD = _atender
+
+    def log_message(self, formato, *args):
+        pass
+
+def servir(opciones_moodle, latencia, puerto, cola_puerto=None):
+    """
+    Corre el servidor sintético (en su propio proceso para no medir su CPU ni su memoria).
+    """
+    servidor = ThreadingHTTPServer(("127.0.0.1", puerto), ManejadorMoodle)
+    servidor.daemon_threads = True
+    servidor.moodle = MoodleSintetico(**opciones_moodle)
+    servidor.latencia = latencia
+    if cola_puerto is not None:
+        cola_puerto.put(servidor.server_address[1])
+    servidor.serve_forever()
+
+# -----------------------------------------------------------------------------
+# MEDICIÓN
+# -----------------------------------------------------------------------------
+class RegistroNulo:
+    """
+    Sustituto del control Text de la interfaz: descarta los mensajes.
+    """
+    value = ""
+    color = None
+
+    def update(self):
+        pass
+
+def extensiones_incorrectas(carpeta):
+    """
+    Archivos descargados cuya extensión no es la de un archivo servido por el
+    Moodle sintético (por ejemplo, "Datos 1234.php" si se tomó la de view.php).
+    """
+    return [
+        os.path.join(raiz, nombre)
+        for raiz, _, nombres in os.walk(carpeta)
+        for nombre in nombres
+        if os.path.splitext(nombre)[1] not in TIPOS_ARCHIVO and not nombre.startswith(("manifiesto", "resumen"))
+    ]
+
+def medir(nombre, funcion):
+    """
+    Ejecuta funcion() y retorna una fila con el tiempo, las solicitudes y el pico de memoria.
+    """
+    from metricas import metricas_compartidas
+
+    metricas = metricas_compartidas()
+    metricas.reiniciar()
+    tracemalloc.start()
+    inicio = time.perf_counter()
+    try:
+        resultado = funcion()
+    finally:
+        segundos = time.perf_counter() - inicio
+        _, pico = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    datos = metricas.resumen_json()
+    return {
+        "escenario": nombre,
+        "resultado": resultado,
+        "segundos": segundos,
+        "solicitudes": datos["solicitudes"],
+        "solicitudes_s": datos["solicitudes"] / segundos if segundos else 0.0,
+        "errores": datos["errores"],
+        "mb_recibidos": datos["bytes"] / (1024 * 1024),
+        "pico_mb": pico / (1024 * 1024),
+    }
+
+def ejecutar_escala(cursos, args):
+    import concurrencia
+    from informes_pregrado import obtener_todos_los_cursos, columnas_deseadas
+    from descargas import obtener_estructura_curso, recorrer_secciones_curso, CURSOS_SIMULTANEOS
+    from plataformas import MOODLE_USER, MOODLE_PASS
+    from salida import abrir_salida
+    from sesion_moodle import obtener_sesion
+
+    opciones = {
+        "cursos": cursos,
+        "cursos_por_categoria": args.cursos_por_categoria,
+        "ramas": args.ramas,
+        "participantes": args.participantes,
+        "max_por_pagina": args.max_por_pagina,
+        "secciones": args.secciones,
+        "recursos_por_seccion": args.recursos,
+        "tamano_kb": args.tamano_kb,
+        "una_seccion_por_pagina": args.una_seccion_por_pagina,
+    }
+    cola_puerto = multiprocessing.Queue()
+    proceso = multiprocessing.Process(target=servir, args=(opciones, args.latencia_ms / 1000, 0, cola_puerto), daemon=True)
+    proceso.start()
+    try:
+        url_base = f"http://127.0.0.1:{cola_puerto.get(timeout=30)}"
+        concurrencia.configurar_limite_por_host(args.simultaneas)
+        # Por defecto el limitador se ajusta solo, como en el programa; con --solicitudes-por-segundo queda fijo
+        if args.solicitudes_por_segundo:
+            concurrencia.limitador_host.configurar(args.solicitudes_por_segundo, args.solicitudes_por_segundo)
+        else:
+            concurrencia.limitador_host.configurar(concurrencia.SOLICITUDES_POR_SEGUNDO, concurrencia.TASA_MAXIMA)
+        registro = RegistroNulo()
+        filas = []
+
+        def informe():
+            session = obtener_sesion(url_base, MOODLE_USER, MOODLE_PASS)
+            with abrir_salida(f"informe_{cursos}.csv", columnas_deseadas) as salida:
+                return obtener_todos_los_cursos(session, 1, "Benchmark", numero_rango=args.rango, salida=salida, url_base=url_base)
+
+        filas.append(medir("informe", informe))
+
+        def descargas():
+            session = obtener_sesion(url_base, MOODLE_USER, MOODLE_PASS)
+            ids = [str(1000 + i) for i in range(min(cursos, args.max_cursos_descarga or cursos))]
+
+            def curso(id_curso):
+                estructura = obtener_estructura_curso(session, url_base, id_curso, registro)
+                carpeta = os.path.join(f"Descargas_{cursos}", id_curso)
+                os.makedirs(carpeta, exist_ok=True)
+                return recorrer_secciones_curso(session, url_base, id_curso, carpeta, registro, estructura["nombre"], estructura=estructura)["Descargados"]
+
+            with ThreadPoolExecutor(max_workers=CURSOS_SIMULTANEOS) as executor:
+                return sum(executor.map(curso, ids))
+
+        filas.append(medir("descargas", descargas))
+        # Clasificación de recursos: cada archivo con la extensión de su tipo real
+        incorrectas = extensiones_incorrectas(f"Descargas_{cursos}")
+        for ruta in incorrectas[:5]:
+            print(f"Extensión incorrecta: {ruta}")
+        filas[-1]["errores"] += len(incorrectas)
+        return filas
+    finally:
+        proceso.terminate()
+        proceso.join()
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de punta a punta contra un Moodle sintético local.")
+    parser.add_argument("--escalas", default="10,100,1000", help="Cantidades de cursos separadas por comas (10 a 10000)")
+    parser.add_argument("--latencia-ms", type=float, default=20.0, help="Latencia agregada por el servidor a cada respuesta")
+    parser.add_argument("--tamano-kb", type=int, default=32, help="Tamaño de cada archivo de pluginfile.php")
+    parser.add_argument("--participantes", type=int, default=40, help="Participantes por curso")
+    parser.add_argument("--max-por-pagina", type=int, default=5000, help="Filas máximas por página de participantes (menos = más páginas)")
+    parser.add_argument("--cursos-por-categoria", type=int, default=25)
+    parser.add_argument("--ramas", type=int, default=4, help="Subcategorías por categoría")
+    parser.add_argument("--secciones", type=int, default=4, help="Secciones por curso")
+    parser.add_argument("--recursos", type=int, default=4, help="Recursos por sección (PDF o CSV con ícono, página intermedia, URL y etiqueta, en ciclo)")
+    parser.add_argument("--una-seccion-por-pagina", action="store_true", help="La página del curso solo trae el resumen de cada sección")
+    parser.add_argument("--rango", type=int, default=50, help="Páginas de participantes máximas por curso (numero_rango)")
+    parser.add_argument("--max-cursos-descarga", type=int, default=0, help="Cursos que se descargan en cada escala (0 = todos)")
+    parser.add_argument("--simultaneas", type=int, default=None, help="Solicitudes simultáneas por servidor (por defecto LIMITE_POR_HOST)")
+    parser.add_argument("--solicitudes-por-segundo", type=float, default=0, help="Ritmo fijo de solicitudes por segundo (0 = adaptativo, como el programa)")
+    parser.add_argument("--solo-servidor", action="store_true", help="Solo levanta el servidor con la primera escala")
+    parser.add_argument("--puerto", type=int, default=8766)
+    args = parser.parse_args()
+
+    escalas = [int(e) for e in args.escalas.split(",") if e.strip()]
+    if args.solo_servidor:
+        opciones = {"cursos": escalas[0], "cursos_por_categoria": args.cursos_por_categoria, "ramas": args.ramas,
+                    "participantes": args.participantes, "max_por_pagina": args.max_por_pagina, "secciones": args.secciones,
+                    "recursos_por_seccion": args.recursos, "tamano_kb": args.tamano_kb, "una_seccion_por_pagina": args.una_seccion_por_pagina}
+        print(f"Moodle sintético con {escalas[0]} cursos en http://127.0.0.1:{args.puerto} (categoría raíz 1)")
+        servir(opciones, args.latencia_ms / 1000, args.puerto)
+        return 0
+
+    import concurrencia
+    if args.simultaneas is None:
+        args.simultaneas = concurrencia.LIMITE_POR_HOST
+
+    # Cookies, caché y archivos descargados quedan en una carpeta temporal
+    os.chdir(tempfile.mkdtemp(prefix="bench_moodle_"))
+    print(f"Carpeta de trabajo: {os.getcwd()}")
+    print(f"{'cursos':>7}  {'escenario':<10}{'resultado':>10}{'segundos':>10}{'solicitudes':>13}{'sol/s':>9}{'errores':>9}{'MB red':>9}{'pico MB':>9}")
+    errores = 0
+    for cursos in escalas:
+        for fila in ejecutar_escala(cursos, args):
+            errores += fila["errores"]
+            print(
+                f"{cursos:>7}  {fila['escenario']:<10}{fila['resultado']:>10}{fila['segundos']:>10.2f}{fila['solicitudes']:>13}"
+                f"{fila['solicitudes_s']:>9.1f}{fila['errores']:>9}{fila['mb_recibidos']:>9.1f}{fila['pico_mb']:>9.1f}"
+            )
+        print(f"{'':>9}limitador al terminar: {concurrencia.limitador_host.resumen()}")
+    return 1 if errores else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
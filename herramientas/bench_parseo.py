@@ -0,0 +1,73 @@
+"""
+Compara los backends de parseo.py sobre páginas guardadas de Moodle.
+
+    python herramientas/bench_parseo.py [--repeticiones 50] [--fixtures carpeta]
+
+Cada archivo de la carpeta de fixtures se asigna a un extractor según su
+nombre (participantes*, categoria*, seccion*, intermedia*). Antes de medir se
+verifica que todos los backends entreguen exactamente los mismos datos que
+html.parser.
+"""
+import argparse
+import glob
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import parseo
+
+CARPETA_FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+EXTRACTORES = {
+    "participantes": parseo.extraer_participantes,
+    "categoria": parseo.extraer_categoria,
+    "seccion": parseo.extraer_estructura_curso,
+    "intermedia": parseo.extraer_recursos_intermedios,
+}
+
+def extractor_para(ruta):
+    nombre = os.path.basename(ruta)
+    for prefijo, funcion in EXTRACTORES.items():
+        if nombre.startswith(prefijo):
+            return funcion
+    return None
+
+def medir(funcion, html, backend, repeticiones):
+    inicio = time.perf_counter()
+    for _ in range(repeticiones):
+        funcion(html, backend)
+    return (time.perf_counter() - inicio) / repeticiones * 1000
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de backends de parseo HTML.")
+    parser.add_argument("--repeticiones", type=int, default=50)
+    parser.add_argument("--fixtures", default=CARPETA_FIXTURES)
+    args = parser.parse_args()
+
+    backends = parseo.backends_disponibles()
+    print(f"Backends disponibles: {', '.join(backends)}")
+    print(f"{'página':<22}{'KB':>7}" + "".join(f"{b:>14}" for b in backends))
+
+    diferencias = 0
+    for ruta in sorted(glob.glob(os.path.join(args.fixtures, "*.html"))):
+        funcion = extractor_para(ruta)
+        if not funcion:
+            continue
+        with open(ruta, encoding="utf-8") as f:
+            html = f.read()
+
+        referencia = funcion(html, "html.parser")
+        for backend in backends:
+            if funcion(html, backend) != referencia:
+                diferencias += 1
+                print(f"[AVISO] {os.path.basename(ruta)}: {backend} no coincide con html.parser")
+
+        tiempos = [medir(funcion, html, backend, args.repeticiones) for backend in backends]
+        print(f"{os.path.basename(ruta):<22}{len(html) / 1024:>7.1f}" + "".join(f"{t:>11.2f} ms" for t in tiempos))
+
+    return 1 if diferencias else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
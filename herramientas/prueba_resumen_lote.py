@@ -0,0 +1,106 @@
+"""
+Prueba del resumen de una descarga por lotes cuando un curso se cancela o
+falla, contra el Moodle sintético de bench_moodle.py (sin tocar la plataforma
+real):
+
+    python herramientas/prueba_resumen_lote.py
+
+Descarga dos cursos uno tras otro y cancela el trabajo al terminar el
+primero, y luego dos cursos donde el segundo falla. En cada formato
+disponible (CSV, xlsx, Parquet) el resumen debe escribirse, con todas las
+columnas de COLUMNAS_RESUMEN en cada fila y conteos en 0 para los cursos sin
+terminar. Sale con 1 si algo falla.
+"""
+import multiprocessing
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_moodle import RegistroNulo, servir
+
+def leer_resumen(ruta):
+    """
+    Filas del resumen como diccionarios, según el formato del archivo.
+    """
+    if ruta.endswith(".parquet"):
+        import pyarrow.parquet as pq
+        return pq.read_table(ruta).to_pylist()
+    if ruta.endswith(".csv"):
+        import csv
+        with open(ruta, newline="", encoding="utf-8-sig") as f:
+            return list(csv.DictReader(f))
+    from openpyxl import load_workbook
+    filas = list(load_workbook(ruta, read_only=True).active.values)
+    return [dict(zip(filas[0], fila)) for fila in filas[1:]]
+
+def comprobar(nombre, condicion, errores):
+    print(f"{'ok   ' if condicion else 'FALLA'} {nombre}")
+    if not condicion:
+        errores.append(nombre)
+
+def main():
+    import descargas
+    from descargas import COLUMNAS_RESUMEN, CONTEOS_RESUMEN, descargar_lote
+    from plataformas import MOODLE_USER, MOODLE_PASS, PLATAFORMAS
+    from salida import formatos_disponibles
+    from sesion_moodle import obtener_sesion
+    from trabajos import TrabajoSegundoPlano
+
+    opciones = {"cursos": 3, "secciones": 2, "recursos_por_seccion": 4, "tamano_kb": 4}
+    cola_puerto = multiprocessing.Queue()
+    proceso = multiprocessing.Process(target=servir, args=(opciones, 0, 0, cola_puerto), daemon=True)
+    proceso.start()
+    os.chdir(tempfile.mkdtemp(prefix="prueba_resumen_lote_"))
+    errores = []
+    try:
+        url_base = f"http://127.0.0.1:{cola_puerto.get(timeout=30)}"
+        plataforma = dict(PLATAFORMAS[0], url=url_base)
+        session = obtener_sesion(url_base, MOODLE_USER, MOODLE_PASS)
+        recorrer_original = descargas.recorrer_secciones_curso
+
+        for formato in formatos_disponibles():
+            # Cancelado: el trabajo se cancela apenas termina el primer curso
+            trabajo = TrabajoSegundoPlano(lambda t: None, lambda p: None, lambda r, e: None)
+
+            def recorrer_y_cancelar(*args, **kwargs):
+                resumen = recorrer_original(*args, **kwargs)
+                trabajo.cancelar()
+                return resumen
+
+            descargas.recorrer_secciones_curso = recorrer_y_cancelar
+            try:
+                ruta, _ = descargar_lote(session, plataforma, ["1000", "1001"], RegistroNulo(), formato, trabajo=trabajo, cursos_simultaneos=1)
+            finally:
+                descargas.recorrer_secciones_curso = recorrer_original
+            filas = leer_resumen(ruta)
+            comprobar(f"{formato}: cancelado, dos filas", len(filas) == 2, errores)
+            comprobar(f"{formato}: cancelado, todas las columnas", all(list(f) == COLUMNAS_RESUMEN for f in filas), errores)
+            comprobar(f"{formato}: cancelado, estados", [f["Estado"] for f in filas] == ["completo", "cancelado"], errores)
+            comprobar(f"{formato}: cancelado, conteos en 0", all(int(filas[1][c]) == 0 for c in CONTEOS_RESUMEN), errores)
+
+            # Error: recorrer el segundo curso falla y su fila queda como error
+            def recorrer_y_fallar(session, url_base, id_curso, *args, **kwargs):
+                if id_curso == "1001":
+                    raise RuntimeError("falla simulada")
+                return recorrer_original(session, url_base, id_curso, *args, **kwargs)
+
+            descargas.recorrer_secciones_curso = recorrer_y_fallar
+            try:
+                ruta, _ = descargar_lote(session, plataforma, ["1002", "1001"], RegistroNulo(), formato, cursos_simultaneos=1)
+            finally:
+                descargas.recorrer_secciones_curso = recorrer_original
+            filas = leer_resumen(ruta)
+            comprobar(f"{formato}: error, dos filas", len(filas) == 2, errores)
+            comprobar(f"{formato}: error, todas las columnas", all(list(f) == COLUMNAS_RESUMEN for f in filas), errores)
+            comprobar(f"{formato}: error, estados", filas[0]["Estado"] == "completo" and str(filas[1]["Estado"]).startswith("error"), errores)
+            comprobar(f"{formato}: error, conteos en 0", all(int(filas[1][c]) == 0 for c in CONTEOS_RESUMEN), errores)
+    finally:
+        proceso.terminate()
+        proceso.join()
+    return 1 if errores else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
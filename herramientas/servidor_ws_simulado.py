@@ -0,0 +1,95 @@
+"""
+Servidor HTTP local que responde como la API REST de Web Services de Moodle
+con respuestas JSON fijas. Sirve para probar FuenteWebServices sin tocar la
+plataforma real:
+
+    python herramientas/servidor_ws_simulado.py --puerto 8765
+
+y luego usar "http://127.0.0.1:8765" como url_base.
+
+Las respuestas se leen de herramientas/ws_simulado/:
+  <wsfunction>_<valor>.json  si la llamada trae courseid / value / criteria[0][value]
+  <wsfunction>.json          en cualquier otro caso
+En las respuestas, {url_base} se reemplaza por la dirección con la que se
+llamó al servidor, así las URL de archivos sirven con cualquier --puerto.
+"""
+import argparse
+import json
+import os
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+CARPETA_RESPUESTAS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "ws_simulado")
+TOKEN_SIMULADO = "token-simulado"
+
+def leer_respuesta(funcion, parametros, url_base):
+    """
+    Busca el archivo JSON fijo que corresponde a la función y sus parámetros
+    y reemplaza {url_base} por la dirección del servidor.
+    """
+    valor = None
+    for clave in ("courseid", "value", "criteria[0][value]"):
+        if clave in parametros:
+            valor = parametros[clave][0]
+            break
+
+    candidatos = [f"{funcion}_{valor}.json"] if valor is not None else []
+    candidatos.append(f"{funcion}.json")
+    for nombre in candidatos:
+        ruta = os.path.join(CARPETA_RESPUESTAS, nombre)
+        if os.path.exists(ruta):
+            with open(ruta, encoding="utf-8") as f:
+                return json.loads(f.read().replace("{url_base}", url_base))
+    return {"exception": "dml_missing_record_exception", "message": f"Sin respuesta simulada para {funcion}"}
+
+class ManejadorWebServices(BaseHTTPRequestHandler):
+    def _parametros(self):
+        url = urlparse(self.path)
+        parametros = parse_qs(url.query)
+        largo = int(self.headers.get("Content-Length") or 0)
+        if largo:
+            parametros.update(parse_qs(self.rfile.read(largo).decode("utf-8")))
+        return url.path, parametros
+
+    def _json(self, datos, estado=200):
+        cuerpo = json.dumps(datos).encode("utf-8")
+        self.send_response(estado)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(cuerpo)))
+        self.end_headers()
+        self.wfile.write(cuerpo)
+
+    def do_GET(self):
+        self.do_POST()
+
+    def do_POST(self):
+        ruta, parametros = self._parametros()
+        if ruta.endswith("/login/token.php"):
+            self._json({"token": TOKEN_SIMULADO})
+        elif ruta.endswith("/webservice/rest/server.php"):
+            if parametros.get("wstoken", [""])[0] != TOKEN_SIMULADO:
+                self._json({"exception": "moodle_exception", "errorcode": "invalidtoken", "message": "Token inválido"})
+                return
+            host, puerto = self.server.server_address[:2]
+            url_base = "http://" + (self.headers.get("Host") or f"{host}:{puerto}")
+            self._json(leer_respuesta(parametros.get("wsfunction", [""])[0], parametros, url_base))
+        elif "/webservice/pluginfile.php" in ruta:
+            cuerpo = b"%PDF-1.4\n% archivo simulado\n" + ruta.encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/pdf")
+            self.send_header("Content-Length", str(len(cuerpo)))
+            self.end_headers()
+            self.wfile.write(cuerpo)
+        else:
+            self._json({"error": "ruta no simulada"}, estado=404)
+
+    def log_message(self, formato, *args):
+        pass
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Servidor local de Web Services de Moodle con respuestas fijas.")
+    parser.add_argument("--puerto", type=int, default=8765)
+    args = parser.parse_args()
+    servidor = ThreadingHTTPServer(("127.0.0.1", args.puerto), ManejadorWebServices)
+    print(f"Web Services simulados en http://127.0.0.1:{args.puerto}")
+    servidor.serve_forever()
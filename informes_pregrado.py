@@ -1,11 +1,22 @@
-import time #Para intriducir pausas controladas entre solicitudes HTTP y evitar saturar el servidor durante el scraping
-import random #Generar invertavlos aleatorios entre solicitudes  para simular un comportamiento mas humano
-import flet #Framework para interfaz grafica
-from flet import Page, Column, Text, Dropdown, dropdown, TextField, ElevatedButton, Image, Container #se importan componentes especificos de flet
 import requests #Para hacer solicitudes HTTP
-from bs4 import BeautifulSoup #para parsear el HTML del sitio y extraer datos
-import pandas as pd #Para crear datos estructurados 
 import os #para interactuar con el sistema operativo
+import re #Para leer numeros dentro de textos como "45 participantes encontrados"
+import math #Para calcular el numero de paginas
+from urllib.parse import urlparse, parse_qs #Para leer el parametro page de la barra de paginas
+import queue #Cola de trabajos de categorias y cursos
+import argparse #Para leer la plataforma con que main.py abre el generador
+import threading #Trabajadores que recorren el arbol de categorias
+from concurrent.futures import ThreadPoolExecutor #Para descargar varias paginas de participantes a la vez
+from moodle_ws import FuenteWebServices, ErrorWebServices #Fuente de datos alternativa por la API REST de Moodle
+from estado_extraccion import EstadoExtraccion, ruta_estado #Punto de control para reanudar extracciones largas
+from parseo import extraer_participantes, extraer_categoria #Extraccion de datos con el parser mas rapido disponible
+from cache_http import cache_compartido #Cache en disco de paginas ya descargadas
+from metricas import metricas_compartidas #Latencia, estado y bytes de cada solicitud, exportados al terminar
+from concurrencia import semaforo_host #Limite de solicitudes simultaneas por servidor (el ritmo lo ajusta la sesion, ver concurrencia.py)
+from salida import abrir_salida, formatos_disponibles, FORMATOS_SALIDA, SalidaCompartida #Escritura del informe por filas (Excel, CSV o Parquet)
+from plataformas import PLATAFORMAS, MOODLE_USER, MOODLE_PASS, buscar_plataforma #Plataformas Moodle compartidas con descargas.py
+from sesion_moodle import obtener_sesion, ErrorSesion #Sesion con cookies en disco y nuevo login automatico
+from trabajos import TrabajoSegundoPlano, TrabajoParcial, TrabajoCancelado, describir_progreso #Extraccion fuera del hilo de la interfaz
 
 def calcular_inactividad(texto_tiempo): #definimos una funcion con un parametro (texto_tiempo)
     if "años" in texto_tiempo or "año" in texto_tiempo or "Nunca" in texto_tiempo:
@@ -17,200 +28,541 @@ def calcular_inactividad(texto_tiempo): #definimos una funcion con un parametro
         return dias > 56 #si es mayor es inactivo  si es igual o menor es activo (2 meses limite de actvidad)
     return False
 
-def verificar_actividad_curso(session, id_curso):
-    url_participantes = f"https://pregrado.ustabuca.edu.co/user/index.php?id={id_curso}"
-    response = session.get(url_participantes)
-
-    if response.status_code == 200:
-        soup = BeautifulSoup(response.text, 'html.parser')
-        participantes_count = soup.find('p', {'data-region': 'participant-count'})
-        numero_participantes = participantes_count.get_text(strip=True) if participantes_count else "Desconocido"
-
-        participantes = soup.find_all('tr')
-        total_estudiantes = 0
-        estudiantes_inactivos = 0
-
-        for participante in participantes:
-            rol = participante.find('td', class_='cell c3')
-            if rol and "Estudiante" in rol.get_text(strip=True):
-                total_estudiantes += 1
-                actividad = participante.find('td', class_='cell c5')
-                if actividad:
-                    tiempo_inactividad = actividad.get_text(strip=True)
-                    if calcular_inactividad(tiempo_inactividad):
-                        estudiantes_inactivos += 1
-
-        if total_estudiantes == 0:
-            return numero_participantes, "Inactivo"
-        elif estudiantes_inactivos / total_estudiantes > 0.5:
-            return numero_participantes, "Inactivo"
-        else:
-            return numero_participantes, "Activo"
+def contar_inactividad_pagina(filas):
+    total_estudiantes = 0
+    estudiantes_inactivos = 0
+
+    for rol, tiempo_inactividad in filas: #filas = [(texto celda c3, texto celda c5)]
+        if rol and "Estudiante" in rol:
+            total_estudiantes += 1
+            if tiempo_inactividad is not None:
+                if calcular_inactividad(tiempo_inactividad):
+                    estudiantes_inactivos += 1
+
+    return total_estudiantes, estudiantes_inactivos
+
+def estado_actividad(total_estudiantes, estudiantes_inactivos):
+    if total_estudiantes == 0:
+        return "Inactivo"
+    elif estudiantes_inactivos / total_estudiantes > 0.5:
+        return "Inactivo"
     else:
-        return "Desconocido", "Desconocido"
+        return "Activo"
 
-def iniciar_sesion_moodle():
-    login_url = "https://pregrado.ustabuca.edu.co/login/index.php"
-    username = "extraccion_ustacv"
-    password = "000"
+URL_PREGRADO = buscar_plataforma("Pregrado")["url"] #Plataforma por defecto de este generador
 
-    try:
-        session = requests.session()
-        response = session.get(login_url)
-        soup = BeautifulSoup(response.text, 'html.parser')
-        token = soup.find("input", {"name": "logintoken"})["value"]
-
-        login_data = {
-            "username": username,
-            "password": password,
-            "logintoken": token
-        }
+FUENTES_DATOS = {
+    "html": "Páginas HTML",
+    "ws": "Web Services (REST)",
+}
 
-        login_response = session.post(login_url, data=login_data)
-        if login_response.status_code == 200 and "loginerrormessage" not in login_response.text:
-            return session
-        else:
-            return None
-    except:
+def iniciar_sesion_moodle(url_base=URL_PREGRADO):
+    #Sesion compartida (sesion_moodle.py): reutiliza las cookies guardadas y vuelve a iniciar sesion si vence
+    try:
+        return obtener_sesion(url_base, MOODLE_USER, MOODLE_PASS)
+    except ErrorSesion:
         return None
 
-def obtener_pagina_soup(session, url):
-    response = session.get(url)
-    if response.status_code == 200:
-        return BeautifulSoup(response.text, 'html.parser')
+def obtener_pagina_html(session, url):
+    def solicitar(url, **kwargs):
+        with semaforo_host(url):
+            return session.get(url, **kwargs)
+
+    #Las paginas de categorias se leen del cache en disco cuando no han cambiado
+    status_code, texto = cache_compartido().obtener(session, url, solicitar=solicitar)
+    if status_code == 200:
+        return texto
     else:
         return None
 
-def contar_usuarios_curso(session, course_id, numero_rango):
+PAGINAS_SIMULTANEAS = 4 #Paginas de participantes que se piden a la vez por curso (1 = una por una)
+PARTICIPANTES_POR_PAGINA = 5000 #Se pide una pagina grande; si el servidor no lo permite se usa la barra de paginas
+
+def contar_roles_pagina(roles):
     contador_estudiantes = 0
     contador_profesores = 0
     nombres_docentes = []
 
-    for page in range(numero_rango):
-        url = f"https://pregrado.ustabuca.edu.co/user/index.php?id={course_id}&page={page}"
-        response = session.get(url)
-        if response.status_code != 200:
-            break
+    for text, title in roles: #roles = [(texto, title)] del enlace de cada span.inplaceeditable
+        if "Profesor" in text or "Teacher" in text or "Non-editing teacher" in text:
+            nombre_usuario = title.replace("Tareas del rol", "").replace("Tareas De Rol", "").strip()
+            nombre_usuario = ' '.join(nombre_usuario.split())  # Elimina espacios extra
+            if nombre_usuario:
+                nombres_docentes.append(nombre_usuario)
+            contador_profesores += 1
+        elif "Estudiante" in text or "Student" in text:
+            contador_estudiantes += 1
 
-        soup = BeautifulSoup(response.text, 'html.parser')
-        span_elementos = soup.find_all('span', class_='inplaceeditable')
+    return contador_estudiantes, contador_profesores, nombres_docentes
 
-        if not span_elementos:
-            break
+def contar_paginas_participantes(datos):
+    paginas = 1
+    #Barra de paginas de Moodle: los enlaces traen page=N (desde 0) y los items data-page-number (desde 1)
+    for href in datos["enlaces_paginas"]:
+        pagina = parse_qs(urlparse(href).query).get('page', [''])[0]
+        if pagina.isdigit():
+            paginas = max(paginas, int(pagina) + 1)
+    for numero_pagina in datos["numeros_pagina"]:
+        if numero_pagina.isdigit():
+            paginas = max(paginas, int(numero_pagina))
+
+    #Respaldo: el total de "N participantes encontrados" dividido por las filas que trajo la pagina
+    filas = datos["filas"]
+    numero = re.search(r'\d[\d.,]*', datos["numero_participantes"] or "")
+    if numero and filas:
+        total = int(re.sub(r'\D', '', numero.group(0)))
+        paginas = max(paginas, math.ceil(total / len(filas)))
+    return paginas
+
+def descargar_pagina_participantes(session, course_id, page, url_base=URL_PREGRADO):
+    url = f"{url_base}/user/index.php?id={course_id}&perpage={PARTICIPANTES_POR_PAGINA}&page={page}"
+    #No se supera el limite de solicitudes simultaneas; la sesion espera su turno en el limitador adaptativo del servidor
+    with semaforo_host(url):
+        response = session.get(url)
+    if response.status_code != 200:
+        return None
+
+    #Una sola lectura de la pagina sirve para los roles, la actividad y el total de participantes
+    datos = extraer_participantes(response.text)
+    total_estudiantes, estudiantes_inactivos = contar_inactividad_pagina(datos["filas"])
+
+    return {
+        "vacia": not datos["editables"],
+        "roles": contar_roles_pagina(datos["roles"]),
+        "total_estudiantes": total_estudiantes,
+        "estudiantes_inactivos": estudiantes_inactivos,
+        "numero_participantes": datos["numero_participantes"],
+        "paginas": contar_paginas_participantes(datos) if page == 0 else None,
+    }
 
-        for span_elemento in span_elementos:
-            a_element = span_elemento.find('a')
-            if a_element:
-                text = a_element.text.strip()
-                title = a_element.get('title', '').strip()
+def analizar_participantes_curso(session, course_id, numero_rango, paginas_simultaneas=PAGINAS_SIMULTANEAS, url_base=URL_PREGRADO):
+    contador_estudiantes = 0
+    contador_profesores = 0
+    nombres_docentes = []
+    total_estudiantes = 0
+    estudiantes_inactivos = 0
+
+    #La primera pagina dice cuantas paginas existen; numero_rango queda solo como limite de seguridad
+    primera = descargar_pagina_participantes(session, course_id, 0, url_base) if numero_rango > 0 else None
+    if primera is None:
+        return {
+            "contador_estudiantes": 0,
+            "contador_profesores": 0,
+            "nombres_docentes": [],
+            "numero_participantes": "Desconocido",
+            "estado_curso": "Desconocido",
+        }
 
-                if "Profesor" in text or "Teacher" in text or "Non-editing teacher" in text:
-                    nombre_usuario = title.replace("Tareas del rol", "").replace("Tareas De Rol", "").strip()
-                    nombre_usuario = ' '.join(nombre_usuario.split())  # Elimina espacios extra
-                    if nombre_usuario:
-                        nombres_docentes.append(nombre_usuario)
-                    contador_profesores += 1
-                elif "Estudiante" in text or "Student" in text:
-                    contador_estudiantes += 1
+    resultados = [primera]
+    total_paginas = min(primera["paginas"], numero_rango)
+    if not primera["vacia"] and total_paginas > 1:
+        with ThreadPoolExecutor(max_workers=max(1, paginas_simultaneas)) as executor:
+            resultados += list(executor.map(lambda page: descargar_pagina_participantes(session, course_id, page, url_base), range(1, total_paginas)))
 
-        time.sleep(random.uniform(0.5, 1.5))
+    #Se combinan en orden de pagina y se corta en la primera pagina vacia o fallida
+    for resultado in resultados:
+        if resultado is None:
+            break
+        total_estudiantes += resultado["total_estudiantes"]
+        estudiantes_inactivos += resultado["estudiantes_inactivos"]
+        if resultado["vacia"]:
+            break
+        contador_estudiantes += resultado["roles"][0]
+        contador_profesores += resultado["roles"][1]
+        nombres_docentes.extend(resultado["roles"][2])
+
+    return {
+        "contador_estudiantes": contador_estudiantes,
+        "contador_profesores": contador_profesores,
+        "nombres_docentes": nombres_docentes,
+        "numero_participantes": primera["numero_participantes"] or "Desconocido",
+        #La regla de mas del 50% de estudiantes inactivos se aplica sobre todas las paginas
+        "estado_curso": estado_actividad(total_estudiantes, estudiantes_inactivos),
+    }
 
-    return contador_estudiantes, contador_profesores, nombres_docentes
+class FuenteHTML:
+    #Fuente de datos que lee las paginas HTML de Moodle; FuenteWebServices (moodle_ws.py) ofrece los mismos metodos
+    def __init__(self, session, numero_rango, url_base=URL_PREGRADO):
+        self.session = session
+        self.numero_rango = numero_rango
+        self.url_base = url_base
+
+    def listar_categoria(self, id_categoria):
+        url = f"{self.url_base}/course/index.php?categoryid={id_categoria}"
+        html = obtener_pagina_html(self.session, url)
+        if not html:
+            return None
 
-def obtener_cursos_pagina(session, soup, division_nombre, subcategorias, numero_rango):
-    cursos = []
-    cursos_principales = soup.find_all('div', class_='card dashboard-card')
-    for curso in cursos_principales:
-        nombre_curso = curso.find('a', class_='aalink').get_text(strip=True)
-        url_curso = curso.find('a', class_='aalink')['href']
-        id_curso = url_curso.split('id=')[1]
-
-        contador_estudiantes, contador_profesores, nombres_docentes = contar_usuarios_curso(session, id_curso, numero_rango)
-        total_usuarios = contador_estudiantes + contador_profesores
-        numero_participantes, estado_curso = verificar_actividad_curso(session, id_curso)
-
-        subcategorias_dict = {
-            f"Subcategoría {i+1}": subcategorias[i] if i < len(subcategorias) else ""
-            for i in range(4)  # Máximo de 4 niveles de subcategorías, ajustable si es necesario
-        }
+        tarjetas, bloques_subcategorias = extraer_categoria(html)
+        cursos = []
+        for nombre_curso, url_curso in tarjetas:
+            id_curso = url_curso.split('id=')[1]
+            cursos.append((id_curso, nombre_curso, url_curso))
+
+        subcategorias = []
+        for nombre_sub, enlace_sub in bloques_subcategorias:
+            sub_id = enlace_sub.split('categoryid=')[1] if enlace_sub else None
+            if sub_id:
+                subcategorias.append((sub_id, nombre_sub))
+        return cursos, subcategorias
+
+    def analizar_participantes(self, id_curso):
+        return analizar_participantes_curso(self.session, id_curso, self.numero_rango, url_base=self.url_base)
+
+TRABAJADORES_CURSOS = 4 #Trabajadores que atienden la cola de categorias y cursos
+
+def construir_registro_curso(division_nombre, nombre_curso, url_curso, subcategorias, participantes):
+    contador_estudiantes = participantes["contador_estudiantes"]
+    contador_profesores = participantes["contador_profesores"]
+    nombres_docentes = participantes["nombres_docentes"]
+    total_usuarios = contador_estudiantes + contador_profesores
+    estado_curso = participantes["estado_curso"]
+
+    subcategorias_dict = {
+        f"Subcategoría {i+1}": subcategorias[i] if i < len(subcategorias) else ""
+        for i in range(4)  # Máximo de 4 niveles de subcategorías, ajustable si es necesario
+    }
 
-        curso_data = {
-            "División": division_nombre,
-            "Nombre del curso": nombre_curso,
-            "URL": url_curso,
-            "Nombres de Docentes": ', '.join(nombres_docentes).title(),
-            "Cantidad de Estudiantes": contador_estudiantes,
-            "Cantidad de Profesores": contador_profesores,
-            "Cantidad Total de Usuarios": total_usuarios,
-            "Estado del Curso": estado_curso,
-        }
-        
-        # Combinar con las subcategorías dinámicas
-        curso_data.update(subcategorias_dict)
-        cursos.append(curso_data)
-    return cursos
+    curso_data = {
+        "División": division_nombre,
+        "Nombre del curso": nombre_curso,
+        "URL": url_curso,
+        "Nombres de Docentes": ', '.join(nombres_docentes).title(),
+        "Cantidad de Estudiantes": contador_estudiantes,
+        "Cantidad de Profesores": contador_profesores,
+        "Cantidad Total de Usuarios": total_usuarios,
+        "Estado del Curso": estado_curso,
+    }
 
-def obtener_todos_los_cursos(session, id_categoria, division_nombre, nivel=0, subcategorias=[], numero_rango=50):
+    # Combinar con las subcategorías dinámicas
+    curso_data.update(subcategorias_dict)
+    return curso_data
+
+def obtener_todos_los_cursos(session, id_categoria, division_nombre, numero_rango=50, trabajadores=TRABAJADORES_CURSOS, fuente=None, estado=None, salida=None, trabajo=None, url_base=URL_PREGRADO):
+    #Sin salida retorna la lista de registros; con una salida (salida.py) escribe cada registro
+    #en cuanto se puede y retorna la cantidad de cursos escritos.
+    #Con un trabajo (trabajos.py) informa los cursos terminados y se detiene si se cancela.
+    #La fuente de datos decide de donde salen las categorias y los participantes (paginas HTML o Web Services)
+    if fuente is None:
+        fuente = FuenteHTML(session, numero_rango, url_base)
+
+    #Cola en anchura de trabajos ("categoria", ...) y ("curso", ...) atendida por varios trabajadores.
+    #Cada elemento lleva una clave de orden (posiciones en el arbol) para que el informe salga
+    #en el mismo orden que el recorrido en profundidad original, sin importar que trabajador termine primero.
+    cola = queue.Queue()
+    candado = threading.Lock()
+    categorias_vistas = {str(id_categoria)}
+    cursos = {} #id_curso -> ubicacion (orden, nombre, url, subcategorias) de su primera aparicion en el arbol
+    participantes_por_curso = {}
+    errores = []
     data = []
-    url = f"https://pregrado.ustabuca.edu.co/course/index.php?categoryid={id_categoria}"
-    soup = obtener_pagina_soup(session, url)
-    if not soup:
-        return data
-
-    cursos = obtener_cursos_pagina(session, soup, division_nombre, subcategorias, numero_rango)
-    data.extend(cursos)
-
-    subcategorias_html = soup.find_all('div', class_='category')
-    for sub in subcategorias_html:
-        nombre_sub = sub.find('h3').get_text(strip=True)
-        enlace_sub = sub.find('a')
-        sub_id = enlace_sub['href'].split('categoryid=')[1] if enlace_sub else None
-        if sub_id:
-            time.sleep(random.uniform(0.5, 1.5))
-            sub_data = obtener_todos_los_cursos(
-                session,
-                sub_id,
+    escribir = salida.escribir if salida is not None else data.append
+
+    #Los registros se escriben en el orden del arbol: cuando ya no quedan categorias por listar
+    #se conoce el orden final y se escribe cada curso apenas terminan todos los anteriores
+    categorias_pendientes = [0]
+    orden_final = []
+    escritos = [0]
+
+    def escribir_terminados():
+        #Se llama con el candado tomado
+        if categorias_pendientes[0] or not orden_final:
+            return
+        while escritos[0] < len(orden_final) and orden_final[escritos[0]] in participantes_por_curso:
+            id_curso = orden_final[escritos[0]]
+            ubicacion = cursos[id_curso]
+            escribir(construir_registro_curso(
                 division_nombre,
-                nivel + 1,
-                subcategorias=subcategorias + [nombre_sub],
-                numero_rango=numero_rango
+                ubicacion["nombre"],
+                ubicacion["url"],
+                ubicacion["subcategorias"],
+                participantes_por_curso[id_curso]
+            ))
+            escritos[0] += 1
+
+    def categoria_terminada():
+        #Se llama con el candado tomado
+        categorias_pendientes[0] -= 1
+        if categorias_pendientes[0] == 0:
+            orden_final.extend(sorted(cursos, key=lambda id_curso: cursos[id_curso]["orden"]))
+            escribir_terminados()
+
+    #Con un estado guardado (EstadoExtraccion) cada avance queda en disco y se puede reanudar
+    guardado = estado.cargar() if estado else None
+    pendientes = []
+    if guardado and guardado["categorias"]:
+        cursos.update(guardado["ubicaciones"])
+        participantes_por_curso.update(guardado["participantes"])
+        for id_cat, subcategorias, orden, hecha in guardado["categorias"]:
+            categorias_vistas.add(id_cat)
+            if not hecha:
+                pendientes.append(("categoria", id_cat, subcategorias, orden))
+        pendientes += [("curso", id_curso) for id_curso in cursos if id_curso not in participantes_por_curso]
+    else:
+        pendientes.append(("categoria", str(id_categoria), [], ()))
+        if estado:
+            estado.registrar_categoria(str(id_categoria), [], ())
+
+    def procesar_categoria(id_cat, subcategorias, orden):
+        try:
+            listar_categoria(id_cat, subcategorias, orden)
+        finally:
+            with candado:
+                categoria_terminada()
+
+    def listar_categoria(id_cat, subcategorias, orden):
+        listado = fuente.listar_categoria(id_cat)
+        if not listado:
+            return #Sin marcarla como hecha: al reanudar se vuelve a intentar
+        cursos_categoria, subcategorias_categoria = listado
+
+        for posicion, (id_curso, nombre_curso, url_curso) in enumerate(cursos_categoria):
+            ubicacion = {"orden": orden + (0, posicion), "nombre": nombre_curso, "url": url_curso, "subcategorias": subcategorias}
+            with candado:
+                anterior = cursos.get(id_curso)
+                if anterior is None or ubicacion["orden"] < anterior["orden"]:
+                    cursos[id_curso] = ubicacion
+                    if estado:
+                        estado.guardar_ubicacion(id_curso, ubicacion)
+            if anterior is None: #Un curso listado en varias categorias se visita una sola vez
+                if trabajo:
+                    trabajo.avanzar(total=len(cursos))
+                cola.put(("curso", id_curso))
+
+        for posicion, (sub_id, nombre_sub) in enumerate(subcategorias_categoria):
+            with candado:
+                if sub_id in categorias_vistas:
+                    continue
+                categorias_vistas.add(sub_id)
+                categorias_pendientes[0] += 1
+            if estado:
+                estado.registrar_categoria(sub_id, subcategorias + [nombre_sub], orden + (1, posicion))
+            cola.put(("categoria", sub_id, subcategorias + [nombre_sub], orden + (1, posicion)))
+
+        if estado:
+            estado.completar_categoria(id_cat)
+
+    def trabajador():
+        while True:
+            elemento = cola.get()
+            try:
+                if elemento is None:
+                    return
+                if trabajo and trabajo.cancelado():
+                    continue #Se vacia la cola sin procesar; lo pendiente queda para reanudar
+                if elemento[0] == "categoria":
+                    procesar_categoria(*elemento[1:])
+                else:
+                    id_curso = elemento[1]
+                    participantes = fuente.analizar_participantes(id_curso)
+                    with candado:
+                        participantes_por_curso[id_curso] = participantes
+                        escribir_terminados()
+                    if trabajo:
+                        trabajo.avanzar(hechos=1)
+                    #Un curso que no se pudo leer no se guarda, asi se reintenta al reanudar
+                    if estado and participantes["estado_curso"] != "Desconocido":
+                        estado.guardar_participantes(id_curso, participantes)
+            except Exception as e:
+                with candado:
+                    errores.append(e)
+            finally:
+                cola.task_done()
+
+    categorias_pendientes[0] = sum(1 for elemento in pendientes if elemento[0] == "categoria")
+    if not categorias_pendientes[0]:
+        #Reanudacion con todas las categorias listadas: el orden ya se conoce
+        categorias_pendientes[0] = 1
+        categoria_terminada()
+    if trabajo:
+        trabajo.avanzar(hechos=len(participantes_por_curso), total=len(cursos))
+    for elemento in pendientes:
+        cola.put(elemento)
+    hilos = [threading.Thread(target=trabajador, daemon=True) for _ in range(max(1, trabajadores))]
+    for hilo in hilos:
+        hilo.start()
+    cola.join()
+    for _ in hilos:
+        cola.put(None)
+    for hilo in hilos:
+        hilo.join()
+
+    if errores:
+        raise errores[0]
+    if trabajo:
+        trabajo.verificar_cancelacion()
+
+    return escritos[0] if salida is not None else data
+
+#Orden de las columnas del informe (Excel, CSV o Parquet)
+columnas_deseadas = [
+    "División",
+    "Nombre del curso",
+    "Subcategoría 1",
+    "Subcategoría 2",
+    "Subcategoría 3",
+    "Subcategoría 4",
+    "URL",
+    "Nombres de Docentes",
+    "Cantidad de Estudiantes",
+    "Cantidad de Profesores",
+    "Cantidad Total de Usuarios",
+    "Estado del Curso"
+]
+
+def guardar_a_excel(data, nombre_archivo="informe_moodle.xlsx"):
+    with abrir_salida(nombre_archivo, columnas_deseadas) as salida:
+        for registro in data:
+            salida.escribir(registro)
+
+#Un informe combinado de varias plataformas lleva primero la columna de la plataforma
+columnas_combinadas = ["Plataforma"] + columnas_deseadas
+
+def nombre_informe(division_nombre, formato, plataforma=None):
+    #Nombre del archivo del informe (el de Pregrado conserva el nombre de siempre)
+    if plataforma and plataforma["name"] != "Pregrado":
+        division_nombre = f"{plataforma['folder_suffix']}_{division_nombre}"
+    return f"informe_{division_nombre.replace(' ', '_')}.{formato}"
+
+def conectar_plataforma(url_base, usar_ws):
+    #Retorna (session, fuente) de la plataforma; lanza ErrorSesion o ErrorWebServices si no se puede entrar
+    if usar_ws:
+        return None, FuenteWebServices.conectar(url_base, MOODLE_USER, MOODLE_PASS)
+    return obtener_sesion(url_base, MOODLE_USER, MOODLE_PASS), None
+
+def informe_plataforma(plataforma, categorias_plataforma, numero_rango, salida, usar_ws=False, reanudar=False, trabajo=None, trabajadores=TRABAJADORES_CURSOS):
+    #Extrae las categorias indicadas de una plataforma y escribe sus cursos en la salida; retorna cuantos escribio
+    session, fuente = conectar_plataforma(plataforma["url"], usar_ws)
+    if trabajo:
+        trabajo.contar_respuestas(fuente.session if fuente else session)
+    total_cursos = 0
+    for id_categoria, division_nombre in categorias_plataforma.items():
+        estado = EstadoExtraccion(ruta_estado(id_categoria, plataforma=plataforma["folder_suffix"]), reanudar=reanudar)
+        try:
+            total_cursos += obtener_todos_los_cursos(
+                session, id_categoria, division_nombre, numero_rango=numero_rango, fuente=fuente, estado=estado,
+                salida=salida, trabajo=TrabajoParcial(trabajo) if trabajo else None, url_base=plataforma["url"],
+                trabajadores=trabajadores
             )
-            data.extend(sub_data)
+        finally:
+            estado.cerrar()
+    return total_cursos
+
+def informes_plataformas(plataformas, numero_rango, formato, combinado=False, usar_ws=False, reanudar=False, trabajo=None, trabajadores=TRABAJADORES_CURSOS):
+    #Extrae varias plataformas a la vez, una por hilo. Cada servidor conserva su propio limite de
+    #solicitudes (concurrencia.py separa los limites por host), asi que una no frena a las otras.
+    #Retorna [(nombre_archivo, cursos)] con un archivo por plataforma o uno solo combinado.
+    candado = threading.Lock()
+    archivos = {}
+    if combinado:
+        nombre_combinado = f"informe_plataformas.{formato}"
+        salida_combinada = abrir_salida(nombre_combinado, columnas_combinadas)
+
+    def extraer(plataforma):
+        if combinado:
+            salida = SalidaCompartida(salida_combinada, candado, Plataforma=plataforma["name"])
+            return informe_plataforma(plataforma, plataforma["categorias"], numero_rango, salida, usar_ws, reanudar, trabajo, trabajadores)
+        nombre_archivo = f"informe_{plataforma['folder_suffix']}.{formato}"
+        with abrir_salida(nombre_archivo, columnas_deseadas) as salida:
+            archivos[plataforma["name"]] = nombre_archivo
+            return informe_plataforma(plataforma, plataforma["categorias"], numero_rango, salida, usar_ws, reanudar, trabajo, trabajadores)
 
-    return data
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, len(plataformas))) as executor:
+            totales = list(executor.map(extraer, plataformas))
+    finally:
+        if combinado:
+            salida_combinada.cerrar()
+
+    if combinado:
+        return [(nombre_combinado, sum(totales))]
+    return [(archivos[p["name"]], total) for p, total in zip(plataformas, totales)]
+
+def informe_todas(numero_rango, formato, trabajo, combinado=False, usar_ws=False, reanudar=False, trabajadores=TRABAJADORES_CURSOS):
+    #Las tres plataformas a la vez, cada una con su propia sesion y su propio limite de solicitudes.
+    #La usan la ventana y cli.py; trabajo (trabajos.py) es obligatorio. Retorna (mensaje final, si termino bien)
+    trabajo.registro.value = "Extrayendo todas las plataformas a la vez..."
+    trabajo.registro.update()
+    metricas = metricas_compartidas()
+    try:
+        archivos = informes_plataformas(PLATAFORMAS, numero_rango, formato, combinado=combinado, usar_ws=usar_ws, reanudar=reanudar, trabajo=trabajo, trabajadores=trabajadores)
+    except (requests.RequestException, ValueError, ErrorWebServices) as e:
+        return f"No se pudo entrar a una de las plataformas: {e}", False
+    finally:
+        metricas.exportar("informe_plataformas")
+    detalle = ", ".join(f"'{nombre}' ({cursos} cursos)" for nombre, cursos in archivos)
+    return f"Proceso completo. Se han guardado los datos en {detalle}. {cache_compartido().resumen()} {metricas.resumen()}", True
+
+def informe_categoria(plataforma, id_categoria, division_nombre, numero_rango, formato, trabajo, usar_ws=False, reanudar=False, trabajadores=TRABAJADORES_CURSOS):
+    #Informe de una categoria de una plataforma. La usan la ventana y cli.py; trabajo (trabajos.py) es obligatorio:
+    #los mensajes van por trabajo.registro. Retorna (mensaje final, si termino bien)
+    metricas = metricas_compartidas()
+    # El informe (con el nombre de la categoría) se va escribiendo a medida que terminan los cursos
+    nombre_archivo = nombre_informe(division_nombre, formato, plataforma)
+    trabajo.registro.value = f"Iniciando sesión en {plataforma['name']}..."
+    trabajo.registro.update()
+    session = None
+    fuente = None
+    if usar_ws:
+        try:
+            fuente = FuenteWebServices.conectar(plataforma["url"], MOODLE_USER, MOODLE_PASS)
+        except (requests.RequestException, ValueError, ErrorWebServices):
+            fuente = None
+        if not fuente:
+            return "No se pudo obtener el token de Web Services. Revisa que el servicio esté habilitado.", False
+        trabajo.contar_respuestas(fuente.session)
+    else:
+        session = iniciar_sesion_moodle(plataforma["url"])
+        if not session:
+            return "No se pudo iniciar sesión. Revisa las credenciales.", False
+        trabajo.contar_respuestas(session)
 
-def guardar_a_excel(data, nombre_archivo="informe_moodle.xlsx"):
-    columnas_deseadas = [
-        "División",
-        "Nombre del curso",
-        "Subcategoría 1",
-        "Subcategoría 2",
-        "Subcategoría 3",
-        "Subcategoría 4",
-        "URL",
-        "Nombres de Docentes",
-        "Cantidad de Estudiantes",
-        "Cantidad de Profesores",
-        "Cantidad Total de Usuarios",
-        "Estado del Curso"
-    ]
-
-    df = pd.DataFrame(data, columns=columnas_deseadas)
-    df.to_excel(nombre_archivo, index=False)
-
-def main(page: Page):
-    
+    trabajo.registro.value = f"Extrayendo información de: {division_nombre}..."
+    trabajo.registro.update()
+
+    #Cada curso terminado se guarda en disco; si se cierra la ventana o se cancela se puede reanudar despues
+    estado = EstadoExtraccion(ruta_estado(id_categoria, plataforma=plataforma["folder_suffix"]), reanudar=reanudar)
+    try:
+        with abrir_salida(nombre_archivo, columnas_deseadas) as salida:
+            total_cursos = obtener_todos_los_cursos(session, id_categoria, division_nombre, numero_rango=numero_rango, trabajadores=trabajadores, fuente=fuente, estado=estado, salida=salida, trabajo=trabajo, url_base=plataforma["url"])
+    finally:
+        estado.cerrar()
+        #Metricas de red junto al informe: <informe>.metricas.json y <informe>.prom
+        metricas.exportar(os.path.splitext(nombre_archivo)[0])
+
+    if total_cursos:
+        return f"Proceso completo. Se han guardado {total_cursos} cursos en '{nombre_archivo}'. {cache_compartido().resumen()} {metricas.resumen()}", True
+    return "No se encontraron cursos o no se pudo completar la extracción.", False
+
+TODAS_LAS_PLATAFORMAS = "Todas" #Opcion que extrae todas las plataformas a la vez
+
+def plataforma_inicial():
+    #main.py abre este generador con --plataforma <nombre>; sin el argumento se usa Pregrado
+    parser = argparse.ArgumentParser(add_help=False)
+    parser.add_argument("--plataforma", default="Pregrado")
+    args, _ = parser.parse_known_args()
+    if args.plataforma == TODAS_LAS_PLATAFORMAS:
+        return TODAS_LAS_PLATAFORMAS
+    return (buscar_plataforma(args.plataforma) or PLATAFORMAS[0])["name"]
+
+def main(page, plataforma=None, al_volver=None):
+    #main.py llama a main en su misma ventana con la plataforma elegida y al_volver para regresar al inicio;
+    #ejecutado como archivo, la plataforma sale de --plataforma
+    import flet #Framework para interfaz grafica; se importa aqui para que cli.py no lo necesite
+    from flet import Column, Row, Text, Dropdown, dropdown, TextField, ElevatedButton, Image, Container, Checkbox, ProgressBar #se importan componentes especificos de flet
     page.fonts = { "Palette":"Palette_Bold.ttf"
         
     }
 
-    page.title = "PREGRADO"
+    nombre_inicial = plataforma or plataforma_inicial()
+    plataforma_actual = buscar_plataforma(nombre_inicial) or PLATAFORMAS[0]
+    page.title = nombre_inicial.upper()
     page.horizontal_alignment = "center"
     page.vertical_alignment = "center"
     
     
     page.window.width = 500
-    page.window.height = 400
+    page.window.height = 700
     
     icon_path = "icono.ico"
     if not os.path.exists(icon_path):
@@ -218,28 +570,96 @@ def main(page: Page):
     else:
         page.window.icon = os.path.abspath(icon_path)
 
-    categorias = {
-        4: "CILCE",
-        3: "Humanidades",
-        15: "División Ciencias Económicas, Administrativas y Contables",
-        20: "Ciencias Básicas",
-        27: "Campus Virtual",
-        29: "División de Ingenierías y Arquitectura",
-        31: "División Ciencias de la Salud",
-        34: "División de Ciencias Jurídicas y Políticas"
-    }
-
     status_text = Text(value="", size=14)
+    linea_superior = Container(height=10, bgcolor=plataforma_actual["color"], width=600)
+    titulo = Text(f"GENERADOR DE INFORMES {nombre_inicial.upper()}", size=20, weight="bold", font_family="Palette")
+    drop_plataforma = Dropdown(
+        label="Plataforma",
+        options=[dropdown.Option(p["name"], text=p["name"]) for p in PLATAFORMAS]
+            + [dropdown.Option(TODAS_LAS_PLATAFORMAS, text="Todas las plataformas (a la vez)")],
+        value=nombre_inicial,
+        width=300,
+        on_change=lambda e: cambiar_plataforma(e)
+    )
     drop_categoria = Dropdown(
         label="Selecciona la Categoría",
-        options=[dropdown.Option(str(k), text=v) for k, v in categorias.items()],
         width=300
     )
-    input_rango = TextField(label="Número de páginas a escanear por curso (ej: 50)", width=300)
+    check_combinado = Checkbox(label="Un solo archivo con todas las plataformas", value=False)
+
+    def opciones_plataforma():
+        #Ajusta categorias, colores y titulo a la plataforma elegida
+        todas = drop_plataforma.value == TODAS_LAS_PLATAFORMAS
+        plataforma = buscar_plataforma(drop_plataforma.value) or PLATAFORMAS[0]
+        drop_categoria.options = [dropdown.Option(str(k), text=v) for k, v in plataforma["categorias"].items()]
+        drop_categoria.value = str(next(iter(plataforma["categorias"]))) if len(plataforma["categorias"]) == 1 else None
+        drop_categoria.visible = not todas
+        check_combinado.visible = todas
+        linea_superior.bgcolor = "#00dba7" if todas else plataforma["color"]
+        titulo.value = f"GENERADOR DE INFORMES {drop_plataforma.value.upper()}"
+
+    def cambiar_plataforma(e):
+        opciones_plataforma()
+        page.update()
+
+    opciones_plataforma()
+    input_rango = TextField(label="Máximo de páginas por curso (límite de seguridad, ej: 50)", width=300)
+    drop_fuente = Dropdown(
+        label="Fuente de datos",
+        options=[dropdown.Option(k, text=v) for k, v in FUENTES_DATOS.items()],
+        value="html",
+        width=300
+    )
+    drop_formato = Dropdown(
+        label="Formato del informe",
+        options=[dropdown.Option(k, text=FORMATOS_SALIDA[k]) for k in formatos_disponibles()],
+        value=formatos_disponibles()[0],
+        width=300
+    )
+    check_reanudar = Checkbox(label="Reanudar la extracción anterior de esta categoría", value=False)
+    check_cache = Checkbox(label="Ignorar caché (volver a descargar todas las páginas)", value=False)
     btn_iniciar = ElevatedButton(text="Iniciar Extracción",  bgcolor="#00dba7", color="#FFFFFF", on_click=lambda e: iniciar_extraccion(e))
+    btn_cancelar = ElevatedButton(text="Cancelar", bgcolor="#d9534f", color="#FFFFFF", disabled=True, on_click=lambda e: cancelar_extraccion(e))
+    #La extraccion sigue en segundo plano al volver al inicio; al abrir de nuevo la plataforma se ve su avance
+    btn_volver = ElevatedButton(text="Volver", bgcolor="#555555", color="#FFFFFF", visible=al_volver is not None, on_click=lambda e: al_volver())
+    barra_progreso = ProgressBar(width=300, value=0, visible=False)
+    progreso_text = Text(value="", size=12)
+    trabajo_actual = [None]
+
+    def mostrar_progreso(progreso):
+        #Se llama desde el hilo del trabajo a un ritmo fijo (trabajos.REFRESCOS_POR_SEGUNDO)
+        barra_progreso.value = progreso["fraccion"]
+        progreso_text.value = describir_progreso(progreso)
+        if progreso["mensaje"]:
+            status_text.value = progreso["mensaje"]
+        page.update()
+
+    def extraccion_terminada(mensaje, error):
+        if isinstance(error, TrabajoCancelado):
+            status_text.value = "Extracción cancelada. Marca 'Reanudar' para continuar desde donde quedó."
+        elif error is not None:
+            status_text.value = f"La extracción se detuvo por un error: {error}"
+        else:
+            status_text.value = mensaje
+        barra_progreso.visible = False
+        btn_iniciar.disabled = False
+        btn_cancelar.disabled = True
+        trabajo_actual[0] = None
+        page.update()
+
+    def cancelar_extraccion(e):
+        if trabajo_actual[0]:
+            trabajo_actual[0].cancelar()
+            btn_cancelar.disabled = True
+            page.update()
 
     def iniciar_extraccion(e):
-        if not drop_categoria.value:
+        if trabajo_actual[0]:
+            return
+        todas = drop_plataforma.value == TODAS_LAS_PLATAFORMAS
+        plataforma = buscar_plataforma(drop_plataforma.value) or PLATAFORMAS[0]
+        categorias = plataforma["categorias"]
+        if not todas and not drop_categoria.value:
             status_text.value = "Por favor selecciona una categoría."
             page.update()
             return
@@ -248,36 +668,40 @@ def main(page: Page):
             page.update()
             return
 
-        status_text.value = "Iniciando sesión en Pregrado..."
-        page.update()
-        session = iniciar_sesion_moodle()
-        if not session:
-            status_text.value = "No se pudo iniciar sesión. Revisa las credenciales."
-            page.update()
-            return
-
-        id_categoria_usuario = int(drop_categoria.value)
         numero_rango = int(input_rango.value)
+        id_categoria_usuario = None if todas else int(drop_categoria.value)
 
-        if id_categoria_usuario not in categorias:
+        if not todas and id_categoria_usuario not in categorias:
             status_text.value = "Categoría no válida."
             page.update()
             return
 
-        division_nombre = categorias[id_categoria_usuario]
-        status_text.value = f"Extrayendo información de: {division_nombre}..."
-        page.update()
-
-        data = obtener_todos_los_cursos(session, id_categoria_usuario, division_nombre, numero_rango=numero_rango)
-
-        if data:
-            # Guardar con el nombre de la categoría
-            nombre_archivo = f"informe_{division_nombre.replace(' ', '_')}.xlsx"
-            guardar_a_excel(data, nombre_archivo=nombre_archivo)
-            status_text.value = f"Proceso completo. Se han guardado los datos en '{nombre_archivo}'."
-        else:
-          status_text.value = "No se encontraron cursos o no se pudo completar la extracción."
+        usar_ws = drop_fuente.value == "ws"
+        reanudar = check_reanudar.value
+        combinado = check_combinado.value
+        formato = drop_formato.value
+        cache = cache_compartido()
+        cache.omitir = check_cache.value
+        cache.reiniciar_contadores()
+        metricas = metricas_compartidas()
+        metricas.reiniciar()
+
+        def extraer_todas(trabajo):
+            #Corre en un hilo aparte; los mensajes van por trabajo.registro y se muestran en mostrar_progreso
+            mensaje, _ = informe_todas(numero_rango, formato, combinado=combinado, usar_ws=usar_ws, reanudar=reanudar, trabajo=trabajo)
+            return mensaje
+
+        def extraer(trabajo):
+            mensaje, _ = informe_categoria(plataforma, id_categoria_usuario, categorias[id_categoria_usuario], numero_rango, formato, usar_ws=usar_ws, reanudar=reanudar, trabajo=trabajo)
+            return mensaje
+
+        btn_iniciar.disabled = True
+        btn_cancelar.disabled = False
+        barra_progreso.value = None
+        barra_progreso.visible = True
+        progreso_text.value = ""
         page.update()
+        trabajo_actual[0] = TrabajoSegundoPlano(extraer_todas if todas else extraer, mostrar_progreso, extraccion_terminada, unidad="cursos").iniciar()
 
     page.add(
         Container(
@@ -290,19 +714,30 @@ def main(page: Page):
                 alignment= "center",
                 spacing=2.5, # Ajusta el espacio entre los controles, 0 = sin espacio
                 controls=[
-                    Container(height=10, bgcolor="#00dba7", width=600),
+                    linea_superior,
                     Image(src="logo.png", width=400, height=100),
-                    Text("GENERADOR DE INFORMES PREGRADO", size=20, weight="bold", font_family="Palette"),
+                    titulo,
+                    drop_plataforma,
                     drop_categoria,
+                    check_combinado,
                     input_rango,
-                    btn_iniciar,
+                    drop_fuente,
+                    drop_formato,
+                    check_reanudar,
+                    check_cache,
+                    Row([btn_iniciar, btn_cancelar, btn_volver], alignment="center"),
+                    barra_progreso,
+                    progreso_text,
                     status_text
                 ]
             )
         )
     )
 
-flet.app(target=main)
+#Solo se abre la ventana al ejecutar el archivo; importarlo (por ejemplo desde herramientas/) no la abre
+if __name__ == "__main__":
+    import flet
+    flet.app(target=main)
 
 
 
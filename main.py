@@ -1,6 +1,9 @@
 import flet
 from flet import Page, Column, ElevatedButton, Image, Text, alignment, Row, IconButton, Icons, Container
+import importlib
 import subprocess
+import threading
+import time
 import webbrowser
 import os
 
@@ -16,14 +19,48 @@ def main(page: Page):
     else:
         page.window.icon = os.path.abspath(icon_path)
 
+    # Un solo generador de informes para todas las plataformas (definidas en plataformas.py).
+    # Se abre en esta misma ventana y en este mismo proceso: el módulo se importa una
+    # sola vez (de fondo apenas abre el inicio) y cada plataforma conserva su vista,
+    # así una extracción sigue corriendo mientras se vuelve al inicio o se abre otra.
+    vistas = {}  # plataforma -> (título, controles) de los generadores ya abiertos
+    tiempo_apertura = Text("", size=12, color="#555555")
+
+    def cargar_informes():
+        return importlib.import_module("informes_pregrado")
+
+    def mostrar_inicio():
+        page.clean()
+        page.title = "Generador de Informes"
+        page.window.height = 500
+        page.add(inicio)
+        page.update()
+
+    def ejecutar_informes(plataforma):
+        comienzo = time.perf_counter()
+        informes = cargar_informes()
+        page.clean()
+        if plataforma in vistas:
+            page.title, controles = vistas[plataforma]
+            page.window.height = 700
+            page.add(*controles)
+        else:
+            informes.main(page, plataforma, al_volver=mostrar_inicio)
+            vistas[plataforma] = (page.title, list(page.controls))
+        tiempo_apertura.value = f"Último generador abierto en {(time.perf_counter() - comienzo) * 1000:.0f} ms"
+        page.update()
+
     def ejecutar_pregrado(e):
-        subprocess.Popen(["python", "informes_pregrado.py"], creationflags=subprocess.CREATE_NO_WINDOW)
+        ejecutar_informes("Pregrado")
 
     def ejecutar_posgrado(e):
-        subprocess.Popen(["python", "informes_posgrado.py"], creationflags=subprocess.CREATE_NO_WINDOW)
+        ejecutar_informes("Posgrado")
 
     def ejecutar_educontinua(e):
-        subprocess.Popen(["python", "informes_educontinua.py"], creationflags=subprocess.CREATE_NO_WINDOW)
+        ejecutar_informes("Educación Continua")
+
+    def ejecutar_todas(e):
+        ejecutar_informes("Todas")
 
     def abrir_documento(e):
         if os.path.exists("manual.pdf"):
@@ -40,61 +77,69 @@ def main(page: Page):
         else:
             print("Archivo 'campus.pdf' no encontrado.")
 
-    page.add(
-        Column(
-            alignment="center",
-            horizontal_alignment="center",
-            spacing=20,
-            controls=[
-                Column(
-                    spacing=0,
-                    controls=[
-                        Container(height=5, bgcolor="#00dba7", width=600),
-                        Container(height=5, bgcolor="#7700ca", width=600),
-                        Container(height=5, bgcolor="#06ff3b", width=600),
-                    ],
-                ),
-                Image(src="logo.png", width=300, height=100),
-                Text("Generador de Informes Campus Virtual", size=20, weight="bold"),
-                Column(
-                    alignment="center",
-                    horizontal_alignment="center",
-                    spacing=10,
-                    controls=[
-                        Row(
-                            alignment="center",
-                            controls=[
-                                ElevatedButton("Pregrado", on_click=ejecutar_pregrado, bgcolor="#00dba7", color="#FFFFFF"),
-                                
-                            ],
-                        ),
-                        Row(
-                            alignment="center",
-                            controls=[
-                                ElevatedButton("Posgrado", on_click=ejecutar_posgrado, bgcolor="#7700ca", color="#FFFFFF"),
-                                
-                            ],
-                        ),
-                        Row(
-                            alignment="center",
-                            controls=[
-                                ElevatedButton("Educación Continua", on_click=ejecutar_educontinua, bgcolor="#06ff3b", color="#FFFFFF"),
-                                
-                            ],
-                        ),
-                    ],
-                ),
-                Row(
-                    alignment="center",
-                    spacing=20,
-                    controls=[
-                        IconButton(content=Image(src="info.png", width=20, height=20), on_click=abrir_documento),
-                        IconButton(content=Image(src="web.png", width=20, height=20), on_click=abrir_vinculo),
-                        IconButton(content=Image(src="autor.png", width=20, height=20), on_click=abrir_archivo),
-                    ],
-                )
-            ],
-        )
+    inicio = Column(
+        alignment="center",
+        horizontal_alignment="center",
+        spacing=20,
+        controls=[
+            Column(
+                spacing=0,
+                controls=[
+                    Container(height=5, bgcolor="#00dba7", width=600),
+                    Container(height=5, bgcolor="#7700ca", width=600),
+                    Container(height=5, bgcolor="#06ff3b", width=600),
+                ],
+            ),
+            Image(src="logo.png", width=300, height=100),
+            Text("Generador de Informes Campus Virtual", size=20, weight="bold"),
+            Column(
+                alignment="center",
+                horizontal_alignment="center",
+                spacing=10,
+                controls=[
+                    Row(
+                        alignment="center",
+                        controls=[
+                            ElevatedButton("Pregrado", on_click=ejecutar_pregrado, bgcolor="#00dba7", color="#FFFFFF"),
+                            
+                        ],
+                    ),
+                    Row(
+                        alignment="center",
+                        controls=[
+                            ElevatedButton("Posgrado", on_click=ejecutar_posgrado, bgcolor="#7700ca", color="#FFFFFF"),
+                            
+                        ],
+                    ),
+                    Row(
+                        alignment="center",
+                        controls=[
+                            ElevatedButton("Educación Continua", on_click=ejecutar_educontinua, bgcolor="#06ff3b", color="#FFFFFF"),
+                            
+                        ],
+                    ),
+                    Row(
+                        alignment="center",
+                        controls=[
+                            ElevatedButton("Todas las plataformas", on_click=ejecutar_todas, bgcolor="#555555", color="#FFFFFF"),
+                        ],
+                    ),
+                ],
+            ),
+            Row(
+                alignment="center",
+                spacing=20,
+                controls=[
+                    IconButton(content=Image(src="info.png", width=20, height=20), on_click=abrir_documento),
+                    IconButton(content=Image(src="web.png", width=20, height=20), on_click=abrir_vinculo),
+                    IconButton(content=Image(src="autor.png", width=20, height=20), on_click=abrir_archivo),
+                ],
+            ),
+            tiempo_apertura,
+        ],
     )
+    page.add(inicio)
+    # Se adelanta la importación del generador mientras se elige la plataforma
+    threading.Thread(target=cargar_informes, daemon=True).start()
 
 flet.app(target=main)
@@ -0,0 +1,339 @@
+import json
+import threading
+import time
+from collections import Counter, defaultdict
+
+import requests
+
+# Límites (segundos) de los intervalos del histograma de latencias
+LIMITES_LATENCIA = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Límites (KB/s) del histograma de velocidad de las descargas de archivos
+LIMITES_VELOCIDAD_KB_S = (50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+# Clase de cada URL según su ruta, en orden de prueba
+CLASES_URL = [
+    ("login", ("/login/",)),
+    ("webservice", ("/webservice/rest/",)),
+    ("pluginfile", ("/pluginfile.php", "/webservice/pluginfile.php")),
+    ("categoria", ("/course/index.php",)),
+    ("participantes", ("/user/index.php",)),
+    ("seccion", ("/course/view.php",)),
+    ("recurso", ("/mod/",)),
+]
+
+_metricas_compartidas = None
+_candado_metricas_compartidas = threading.Lock()
+
+def clase_url(url):
+    """
+    Clase de la URL para agrupar las métricas: categoria, participantes,
+    seccion, recurso, pluginfile, login, webservice u otra.
+    """
+    for clase, marcas in CLASES_URL:
+        if any(marca in url for marca in marcas):
+            return clase
+    return "otra"
+
+def _percentil(ordenadas, fraccion):
+    if not ordenadas:
+        return None
+    return ordenadas[min(len(ordenadas) - 1, int(fraccion * len(ordenadas)))]
+
+def _kb_s(cantidad_bytes, segundos):
+    return cantidad_bytes / 1024 / segundos if segundos > 0 else 0.0
+
+def _resumen_transferencias(transferencias):
+    # Archivos descargados, bytes y velocidades (KB/s): la global, la mediana y la del más lento
+    velocidades = sorted(_kb_s(b, s) for b, s, _ in transferencias)
+    cantidad_bytes = sum(b for b, _, _ in transferencias)
+    segundos = sum(s for _, s, _ in transferencias)
+    return {
+        "archivos": len(transferencias),
+        "bytes": cantidad_bytes,
+        "segundos": segundos,
+        "kb_s": _kb_s(cantidad_bytes, segundos),
+        "kb_s_p50": _percentil(velocidades, 0.5),
+        "kb_s_minima": velocidades[0] if velocidades else None,
+        "lentas": sum(1 for _, _, lenta in transferencias if lenta),
+    }
+
+def _etiquetas(**valores):
+    return "{" + ",".join(f'{k}="{v}"' for k, v in valores.items()) + "}"
+
+# -----------------------------------------------------------------------------
+# MÉTRICAS DE SOLICITUDES HTTP
+# -----------------------------------------------------------------------------
+class MetricasSolicitudes:
+    """
+    Registra cada solicitud de las sesiones instrumentadas (latencia, estado,
+    bytes y clase de URL) y la velocidad de cada archivo descargado y, al final
+    de una ejecución, escribe un resumen JSON y un archivo en formato de texto
+    de Prometheus con histogramas de latencia y rendimiento.
+    La latencia es la del intercambio HTTP: la espera en el limitador de
+    concurrencia y las pausas entre reintentos se cuentan aparte, y cada
+    intento descartado por un 429/503 se registra como una solicitud más.
+    """
+    def __init__(self):
+        self._candado = threading.Lock()
+        self._hilo = threading.local()
+        self.reiniciar()
+
+    def reiniciar(self):
+        with self._candado:
+            self._inicio = time.monotonic()
+            self._latencias = defaultdict(list)   # (metodo, clase) -> [segundos]
+            self._estados = Counter()             # (metodo, clase, estado) -> cantidad
+            self._errores = Counter()             # (metodo, clase, tipo de error) -> cantidad
+            self._bytes = Counter()               # (metodo, clase) -> bytes recibidos
+            self._transferencias = []             # (bytes, segundos, lenta) por archivo descargado
+            self._espera = Counter()              # (metodo, clase) -> segundos esperando al limitador
+            self._reintentos = Counter()          # (metodo, clase, estado) -> intentos descartados
+
+    def registrar(self, metodo, url, estado, segundos, cantidad_bytes=0, error=None):
+        clave = (metodo, clase_url(url))
+        with self._candado:
+            self._latencias[clave].append(segundos)
+            self._bytes[clave] += cantidad_bytes
+            if error is not None:
+                self._errores[clave + (error,)] += 1
+            else:
+                self._estados[clave + (str(estado),)] += 1
+
+    def registrar_espera(self, metodo, url, segundos):
+        """
+        Segundos que el limitador retuvo una solicitud (esperando lugar o ficha,
+        o la pausa antes de un reintento). Se descuentan de su latencia.
+        """
+        if getattr(self._hilo, "profundidad", 0):
+            self._hilo.descuento += segundos
+        with self._candado:
+            self._espera[(metodo, clase_url(url))] += segundos
+
+    def registrar_reintento(self, metodo, url, estado, segundos):
+        """
+        Intento que el limitador descartó (429/503) para repetirlo: cuenta como
+        una solicitud con su estado y su latencia, y no se suma a la siguiente.
+        """
+        if getattr(self._hilo, "profundidad", 0):
+            self._hilo.descuento += segundos
+        self.registrar(metodo, url, estado, segundos)
+        with self._candado:
+            self._reintentos[(metodo, clase_url(url), str(estado))] += 1
+
+    def registrar_transferencia(self, cantidad_bytes, segundos, lenta=False):
+        """
+        Registra la descarga completa de un archivo (descargas.py): bytes, segundos
+        y si quedó por debajo de la velocidad considerada lenta.
+        """
+        with self._candado:
+            self._transferencias.append((cantidad_bytes, segundos, lenta))
+
+    def instrumentar(self, session):
+        """
+        Envuelve session.send para medir cada intercambio HTTP real: también
+        cuenta las redirecciones, el login y las solicitudes repetidas tras
+        un nuevo login. Una sesión se instrumenta una sola vez. Lo que el
+        limitador informa para el salto (registrar_espera, registrar_reintento)
+        se descuenta de su latencia.
+        """
+        if getattr(session, "_metricas", None) is not None:
+            return session
+        original = session.send
+
+        def send(solicitud, **kwargs):
+            # Con redirecciones, requests llama de nuevo a send por cada salto: cada
+            # llamada anidada registra su salto y esta solo el primero
+            profundidad = getattr(self._hilo, "profundidad", 0)
+            if profundidad == 0:
+                self._hilo.error_registrado = False
+            # Cada salto descuenta solo lo que el limitador retuvo a su propio envío
+            descuento_anterior = getattr(self._hilo, "descuento", 0.0)
+            self._hilo.profundidad = profundidad + 1
+            self._hilo.descuento = 0.0
+            inicio = time.monotonic()
+            try:
+                respuesta = original(solicitud, **kwargs)
+            except requests.RequestException as e:
+                if not self._hilo.error_registrado:
+                    self._hilo.error_registrado = True
+                    self.registrar(solicitud.method, solicitud.url, None, max(0.0, time.monotonic() - inicio - self._hilo.descuento), error=type(e).__name__)
+                raise
+            finally:
+                descuento = self._hilo.descuento
+                self._hilo.profundidad = profundidad
+                self._hilo.descuento = descuento_anterior
+            if respuesta.history:
+                # elapsed del primer salto incluye lo que lo retuvo el limitador
+                primera = respuesta.history[0]
+                self.registrar(solicitud.method, solicitud.url, primera.status_code, max(0.0, primera.elapsed.total_seconds() - descuento), len(primera.content or b""))
+                return respuesta
+            # Sin stream el cuerpo ya se leyó; con stream se usa el tamaño anunciado
+            if kwargs.get("stream"):
+                cantidad_bytes = int(respuesta.headers.get("Content-Length") or 0)
+            else:
+                cantidad_bytes = len(respuesta.content or b"")
+            self.registrar(solicitud.method, solicitud.url, respuesta.status_code, max(0.0, time.monotonic() - inicio - descuento), cantidad_bytes)
+            return respuesta
+
+        session.send = send
+        session._metricas = self
+        return session
+
+    def resumen_json(self):
+        """
+        Diccionario con la duración, las solicitudes por segundo, los bytes y,
+        por método y clase de URL: cantidad, estados, errores, bytes y latencias
+        (media, p50, p95 y máxima, en segundos), reintentos por estado y
+        segundos de espera en el limitador.
+        """
+        with self._candado:
+            duracion = time.monotonic() - self._inicio
+            latencias = {clave: sorted(valores) for clave, valores in self._latencias.items()}
+            estados, errores, cantidad_bytes = Counter(self._estados), Counter(self._errores), Counter(self._bytes)
+            transferencias = list(self._transferencias)
+            espera, reintentos = Counter(self._espera), Counter(self._reintentos)
+        total = sum(len(v) for v in latencias.values())
+        total_bytes = sum(cantidad_bytes.values())
+        clases = {}
+        for (metodo, clase), valores in sorted(latencias.items()):
+            clases[f"{metodo} {clase}"] = {
+                "solicitudes": len(valores),
+                "estados": {e: n for (m, c, e), n in estados.items() if (m, c) == (metodo, clase)},
+                "errores": {e: n for (m, c, e), n in errores.items() if (m, c) == (metodo, clase)},
+                "bytes": cantidad_bytes[(metodo, clase)],
+                "latencia_media": sum(valores) / len(valores),
+                "latencia_p50": _percentil(valores, 0.5),
+                "latencia_p95": _percentil(valores, 0.95),
+                "latencia_maxima": valores[-1],
+                "reintentos": {e: n for (m, c, e), n in reintentos.items() if (m, c) == (metodo, clase)},
+                "espera_limitador_segundos": espera[(metodo, clase)],
+            }
+        return {
+            "duracion_segundos": duracion,
+            "solicitudes": total,
+            "solicitudes_por_segundo": total / duracion if duracion > 0 else 0.0,
+            "bytes": total_bytes,
+            "bytes_por_segundo": total_bytes / duracion if duracion > 0 else 0.0,
+            "errores": sum(errores.values()),
+            "reintentos": sum(reintentos.values()),
+            "espera_limitador_segundos": sum(espera.values()),
+            "por_clase": clases,
+            "transferencias": _resumen_transferencias(transferencias),
+        }
+
+    def texto_prometheus(self):
+        """
+        Métricas en el formato de texto de Prometheus (para node_exporter textfile o pushgateway).
+        """
+        with self._candado:
+            duracion = time.monotonic() - self._inicio
+            latencias = {clave: list(valores) for clave, valores in self._latencias.items()}
+            estados, errores, cantidad_bytes = Counter(self._estados), Counter(self._errores), Counter(self._bytes)
+            transferencias = list(self._transferencias)
+            espera, reintentos = Counter(self._espera), Counter(self._reintentos)
+        lineas = [
+            "# HELP moodle_solicitudes_total Solicitudes HTTP por método, clase de URL y estado.",
+            "# TYPE moodle_solicitudes_total counter",
+        ]
+        for (metodo, clase, estado), n in sorted(estados.items()):
+            lineas.append(f"moodle_solicitudes_total{_etiquetas(metodo=metodo, clase=clase, estado=estado)} {n}")
+        lineas += [
+            "# HELP moodle_errores_total Solicitudes HTTP que fallaron sin respuesta (tiempo agotado, conexión).",
+            "# TYPE moodle_errores_total counter",
+        ]
+        for (metodo, clase, error), n in sorted(errores.items()):
+            lineas.append(f"moodle_errores_total{_etiquetas(metodo=metodo, clase=clase, error=error)} {n}")
+        lineas += [
+            "# HELP moodle_reintentos_total Intentos descartados por 429/503 y repetidos (ya incluidos en moodle_solicitudes_total).",
+            "# TYPE moodle_reintentos_total counter",
+        ]
+        for (metodo, clase, estado), n in sorted(reintentos.items()):
+            lineas.append(f"moodle_reintentos_total{_etiquetas(metodo=metodo, clase=clase, estado=estado)} {n}")
+        lineas += [
+            "# HELP moodle_espera_limitador_segundos_total Segundos que el limitador retuvo las solicitudes (lugar, ritmo, pausas de reintento).",
+            "# TYPE moodle_espera_limitador_segundos_total counter",
+        ]
+        for (metodo, clase), segundos in sorted(espera.items()):
+            lineas.append(f"moodle_espera_limitador_segundos_total{_etiquetas(metodo=metodo, clase=clase)} {segundos:.6f}")
+        lineas += [
+            "# HELP moodle_solicitud_segundos Latencia de las solicitudes HTTP (sin la espera en el limitador).",
+            "# TYPE moodle_solicitud_segundos histogram",
+        ]
+        for (metodo, clase), valores in sorted(latencias.items()):
+            for limite in LIMITES_LATENCIA:
+                acumuladas = sum(1 for v in valores if v <= limite)
+                lineas.append(f"moodle_solicitud_segundos_bucket{_etiquetas(metodo=metodo, clase=clase, le=limite)} {acumuladas}")
+            lineas.append(f"moodle_solicitud_segundos_bucket{_etiquetas(metodo=metodo, clase=clase, le='+Inf')} {len(valores)}")
+            lineas.append(f"moodle_solicitud_segundos_sum{_etiquetas(metodo=metodo, clase=clase)} {sum(valores):.6f}")
+            lineas.append(f"moodle_solicitud_segundos_count{_etiquetas(metodo=metodo, clase=clase)} {len(valores)}")
+        lineas += [
+            "# HELP moodle_bytes_recibidos_total Bytes recibidos por método y clase de URL.",
+            "# TYPE moodle_bytes_recibidos_total counter",
+        ]
+        for (metodo, clase), n in sorted(cantidad_bytes.items()):
+            lineas.append(f"moodle_bytes_recibidos_total{_etiquetas(metodo=metodo, clase=clase)} {n}")
+        if transferencias:
+            velocidades = [_kb_s(b, s) for b, s, _ in transferencias]
+            lineas += [
+                "# HELP moodle_transferencia_kb_s Velocidad de cada archivo descargado (KB/s).",
+                "# TYPE moodle_transferencia_kb_s histogram",
+            ]
+            for limite in LIMITES_VELOCIDAD_KB_S:
+                lineas.append(f"moodle_transferencia_kb_s_bucket{_etiquetas(le=limite)} {sum(1 for v in velocidades if v <= limite)}")
+            lineas.append(f"moodle_transferencia_kb_s_bucket{_etiquetas(le='+Inf')} {len(velocidades)}")
+            lineas.append(f"moodle_transferencia_kb_s_sum {sum(velocidades):.1f}")
+            lineas.append(f"moodle_transferencia_kb_s_count {len(velocidades)}")
+            lineas += [
+                "# HELP moodle_transferencias_lentas_total Archivos descargados por debajo de la velocidad lenta.",
+                "# TYPE moodle_transferencias_lentas_total counter",
+                f"moodle_transferencias_lentas_total {sum(1 for _, _, lenta in transferencias if lenta)}",
+            ]
+        total = sum(len(v) for v in latencias.values())
+        lineas += [
+            "# HELP moodle_ejecucion_segundos Duración de la ejecución.",
+            "# TYPE moodle_ejecucion_segundos gauge",
+            f"moodle_ejecucion_segundos {duracion:.3f}",
+            "# HELP moodle_solicitudes_por_segundo Solicitudes por segundo en la ejecución.",
+            "# TYPE moodle_solicitudes_por_segundo gauge",
+            f"moodle_solicitudes_por_segundo {total / duracion if duracion > 0 else 0.0:.3f}",
+            "# HELP moodle_bytes_por_segundo Bytes recibidos por segundo en la ejecución.",
+            "# TYPE moodle_bytes_por_segundo gauge",
+            f"moodle_bytes_por_segundo {sum(cantidad_bytes.values()) / duracion if duracion > 0 else 0.0:.1f}",
+        ]
+        return "\n".join(lineas) + "\n"
+
+    def exportar(self, ruta_base):
+        """
+        Escribe <ruta_base>.metricas.json y <ruta_base>.prom. Retorna las dos rutas.
+        """
+        ruta_json, ruta_prom = f"{ruta_base}.metricas.json", f"{ruta_base}.prom"
+        with open(ruta_json, "w", encoding="utf-8") as f:
+            json.dump(self.resumen_json(), f, ensure_ascii=False, indent=2)
+        with open(ruta_prom, "w", encoding="utf-8", newline="\n") as f:
+            f.write(self.texto_prometheus())
+        return ruta_json, ruta_prom
+
+    def resumen(self):
+        """
+        Texto corto con las solicitudes, su ritmo, la latencia media, los
+        reintentos y la espera en el limitador de la ejecución.
+        """
+        datos = self.resumen_json()
+        latencia = sum(c["latencia_media"] * c["solicitudes"] for c in datos["por_clase"].values())
+        latencia = latencia / datos["solicitudes"] if datos["solicitudes"] else 0.0
+        return (
+            f"Red: {datos['solicitudes']} solicitudes ({datos['solicitudes_por_segundo']:.1f}/s), "
+            f"{datos['bytes'] / (1024 * 1024):.1f} MB, latencia media {latencia * 1000:.0f} ms, {datos['errores']} errores, "
+            f"{datos['reintentos']} reintentos, {datos['espera_limitador_segundos']:.1f} s de espera en el limitador."
+        )
+
+def metricas_compartidas():
+    """
+    Retorna las métricas que comparten todos los módulos del proceso.
+    """
+    global _metricas_compartidas
+    with _candado_metricas_compartidas:
+        if _metricas_compartidas is None:
+            _metricas_compartidas = MetricasSolicitudes()
+        return _metricas_compartidas
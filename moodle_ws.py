@@ -0,0 +1,235 @@
+import re
+import time
+from urllib.parse import urlparse
+import requests
+from concurrencia import semaforo_host, limitador_host
+from metricas import metricas_compartidas
+
+# Servicio externo de Moodle que entrega el token (el de la app móvil viene activo por defecto)
+SERVICIO_WS = "moodle_mobile_app"
+
+# Mismo límite de actividad que calcular_inactividad: más de 56 días sin entrar es inactivo
+DIAS_LIMITE_ACTIVIDAD = 56
+
+ROLES_PROFESOR = ("editingteacher", "teacher")
+ROLES_ESTUDIANTE = ("student",)
+
+class ErrorWebServices(Exception):
+    """
+    Error devuelto por la API REST de Moodle (token inválido, función no habilitada, etc.).
+    """
+
+# -----------------------------------------------------------------------------
+# FUNCIONES DE AYUDA
+# -----------------------------------------------------------------------------
+def aplanar_parametros(valor, prefijo=""):
+    """
+    Convierte listas y diccionarios al formato de parámetros que espera Moodle,
+    por ejemplo {"criteria": [{"key": "id"}]} -> {"criteria[0][key]": "id"}.
+    """
+    if isinstance(valor, dict):
+        items = valor.items()
+    elif isinstance(valor, (list, tuple)):
+        items = enumerate(valor)
+    else:
+        return {prefijo: valor}
+
+    planos = {}
+    for clave, sub in items:
+        nombre = f"{prefijo}[{clave}]" if prefijo else str(clave)
+        planos.update(aplanar_parametros(sub, nombre))
+    return planos
+
+def url_webservice(url):
+    """
+    Pasa una URL de pluginfile.php a webservice/pluginfile.php, la que se puede
+    descargar con el token en lugar de la sesión. No agrega el token.
+    """
+    if not url or "/webservice/pluginfile.php" in url:
+        return url
+    return url.replace("/pluginfile.php", "/webservice/pluginfile.php", 1)
+
+def agregar_token(url, token):
+    """
+    Agrega el token a una URL de webservice/pluginfile.php para poder descargarla sin sesión.
+    """
+    if not url or "token=" in url:
+        return url
+    url = url_webservice(url)
+    return url + ("&" if "?" in url else "?") + "token=" + token
+
+class AutenticacionToken(requests.auth.AuthBase):
+    """
+    Agrega el token a las solicitudes a webservice/pluginfile.php del servidor
+    solo al enviarlas: las URL de los recursos quedan sin token y así no llega
+    a manifiestos, índices de sincronización y almacén, ni al registro.
+    """
+    def __init__(self, url_base, token):
+        self.host = urlparse(url_base).netloc
+        self.token = token
+
+    def __call__(self, solicitud):
+        if urlparse(solicitud.url).netloc == self.host and "/webservice/pluginfile.php" in solicitud.url:
+            solicitud.prepare_url(agregar_token(solicitud.url, self.token), None)
+        return solicitud
+
+def enlaces_pluginfile(html):
+    """
+    Retorna los enlaces a pluginfile.php que aparecen dentro de un fragmento HTML
+    (resúmenes de sección, etiquetas, descripciones).
+    """
+    return re.findall(r'href="([^"]*pluginfile\.php[^"]*)"', html or "")
+
+# -----------------------------------------------------------------------------
+# FUENTE DE DATOS REST
+# -----------------------------------------------------------------------------
+class FuenteWebServices:
+    """
+    Fuente de datos que consulta la API REST de Web Services de Moodle en lugar
+    de leer las páginas HTML. Expone los mismos datos que usan los informes y
+    las descargas para que ambos puedan cambiar de fuente sin cambiar su lógica.
+    """
+    def __init__(self, url_base, token, session=None):
+        self.url_base = url_base.rstrip("/")
+        self.token = token
+        self.session = limitador_host.gobernar(metricas_compartidas().instrumentar(session or requests.Session()))
+        self.session.auth = AutenticacionToken(self.url_base, token)
+
+    @classmethod
+    def conectar(cls, url_base, usuario, clave, servicio=SERVICIO_WS, session=None):
+        """
+        Obtiene un token con login/token.php y retorna la fuente lista para usar.
+        """
+        session = limitador_host.gobernar(metricas_compartidas().instrumentar(session or requests.Session()))
+        r = session.post(
+            f"{url_base.rstrip('/')}/login/token.php",
+            data={"username": usuario, "password": clave, "service": servicio},
+            timeout=10
+        )
+        r.raise_for_status()
+        datos = r.json()
+        if "token" not in datos:
+            raise ErrorWebServices(datos.get("error") or "No se obtuvo token de Web Services.")
+        return cls(url_base, datos["token"], session=session)
+
+    def llamar(self, funcion, **parametros):
+        """
+        Ejecuta una función de Web Services y retorna la respuesta JSON.
+        """
+        datos = {"wstoken": self.token, "wsfunction": funcion, "moodlewsrestformat": "json"}
+        datos.update(aplanar_parametros(parametros))
+        url = f"{self.url_base}/webservice/rest/server.php"
+        with semaforo_host(url):
+            r = self.session.post(url, data=datos, timeout=30)
+        r.raise_for_status()
+        respuesta = r.json()
+        if isinstance(respuesta, dict) and "exception" in respuesta:
+            raise ErrorWebServices(respuesta.get("message") or respuesta["exception"])
+        return respuesta
+
+    # -- Informes -------------------------------------------------------------
+    def listar_categoria(self, id_categoria):
+        """
+        Retorna los cursos [(id, nombre, url)] y las subcategorías directas
+        [(id, nombre)] de una categoría.
+        """
+        categorias = self.llamar(
+            "core_course_get_categories",
+            criteria=[{"key": "parent", "value": id_categoria}],
+            addsubcategories=0
+        )
+        subcategorias = [
+            (str(c["id"]), c["name"])
+            for c in sorted(categorias, key=lambda c: c.get("sortorder", 0))
+            if str(c.get("parent")) == str(id_categoria)
+        ]
+
+        respuesta = self.llamar("core_course_get_courses_by_field", field="category", value=id_categoria)
+        cursos = [
+            (str(c["id"]), c["fullname"], f"{self.url_base}/course/view.php?id={c['id']}")
+            for c in sorted(respuesta.get("courses", []), key=lambda c: c.get("sortorder", 0))
+        ]
+        return cursos, subcategorias
+
+    def analizar_participantes(self, id_curso):
+        """
+        Retorna el mismo resumen que analizar_participantes_curso a partir de
+        core_enrol_get_enrolled_users (una sola llamada por curso).
+        """
+        try:
+            usuarios = self.llamar("core_enrol_get_enrolled_users", courseid=id_curso)
+        except (requests.RequestException, ValueError, ErrorWebServices):
+            return {
+                "contador_estudiantes": 0,
+                "contador_profesores": 0,
+                "nombres_docentes": [],
+                "numero_participantes": "Desconocido",
+                "estado_curso": "Desconocido",
+            }
+
+        contador_estudiantes = 0
+        contador_profesores = 0
+        nombres_docentes = []
+        estudiantes_inactivos = 0
+        ahora = time.time()
+
+        for usuario in usuarios:
+            roles = {rol.get("shortname") for rol in usuario.get("roles", [])}
+            if roles & set(ROLES_PROFESOR):
+                contador_profesores += 1
+                nombre = ' '.join(usuario.get("fullname", "").split())
+                if nombre:
+                    nombres_docentes.append(nombre)
+            elif roles & set(ROLES_ESTUDIANTE):
+                contador_estudiantes += 1
+                ultimo_acceso = usuario.get("lastcourseaccess", usuario.get("lastaccess", 0)) or 0
+                if not ultimo_acceso or int((ahora - ultimo_acceso) // 86400) > DIAS_LIMITE_ACTIVIDAD:
+                    estudiantes_inactivos += 1
+
+        if contador_estudiantes == 0 or estudiantes_inactivos / contador_estudiantes > 0.5:
+            estado_curso = "Inactivo"
+        else:
+            estado_curso = "Activo"
+
+        return {
+            "contador_estudiantes": contador_estudiantes,
+            "contador_profesores": contador_profesores,
+            "nombres_docentes": nombres_docentes,
+            "numero_participantes": f"{len(usuarios)} participantes encontrados",
+            "estado_curso": estado_curso,
+        }
+
+    # -- Descargas ------------------------------------------------------------
+    def obtener_nombre_curso(self, id_curso):
+        """
+        Retorna el nombre completo del curso o None si no existe.
+        """
+        respuesta = self.llamar("core_course_get_courses_by_field", field="id", value=id_curso)
+        cursos = respuesta.get("courses", [])
+        return cursos[0]["fullname"] if cursos else None
+
+    def obtener_secciones_recursos(self, id_curso):
+        """
+        Retorna [(numero_seccion, [(url, nombre, tipo)])] con core_course_get_contents.
+        Los archivos vienen como webservice/pluginfile.php sin el token: la sesión
+        de la fuente lo agrega al pedirlos (AutenticacionToken).
+        """
+        secciones = []
+        for seccion in self.llamar("core_course_get_contents", courseid=id_curso):
+            recursos = []
+            for enlace in enlaces_pluginfile(seccion.get("summary")):
+                recursos.append((url_webservice(enlace), None, "file"))
+
+            for modulo in seccion.get("modules", []):
+                tipo_modulo = modulo.get("modname")
+                if tipo_modulo == "resource":
+                    for contenido in modulo.get("contents", []):
+                        if contenido.get("type") == "file":
+                            recursos.append((url_webservice(contenido["fileurl"]), modulo.get("name"), "file"))
+                elif tipo_modulo == "url":
+                    recursos.append((modulo.get("url"), modulo.get("name"), "url"))
+                for enlace in enlaces_pluginfile(modulo.get("description")):
+                    recursos.append((url_webservice(enlace), None, "file"))
+
+            secciones.append((seccion.get("section", len(secciones)), recursos))
+        return secciones
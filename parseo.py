@@ -0,0 +1,315 @@
+"""
+Extracción de datos de las páginas HTML de Moodle con backends intercambiables.
+
+Cada función recibe el HTML en texto y retorna datos simples (listas, tuplas,
+diccionarios), de modo que la lógica de los informes y de las descargas no
+depende de qué parser se use:
+
+  - "selectolax": el más rápido (pip install selectolax)
+  - "lxml":       BeautifulSoup con el parser lxml (pip install lxml)
+  - "html.parser": BeautifulSoup con el parser estándar de Python (siempre disponible)
+
+Con BeautifulSoup solo se construyen las regiones que se leen (SoupStrainer).
+"""
+import re
+
+from bs4 import BeautifulSoup, SoupStrainer
+
+try:
+    from selectolax.lexbor import LexborHTMLParser as HTMLParser  # pip install selectolax
+    HAVE_SELECTOLAX = True
+except ImportError:
+    try:
+        from selectolax.parser import HTMLParser  # versiones de selectolax anteriores a 1.0
+        HAVE_SELECTOLAX = True
+    except ImportError:
+        HAVE_SELECTOLAX = False
+
+try:
+    import lxml  # pip install lxml
+    HAVE_LXML = True
+except ImportError:
+    HAVE_LXML = False
+
+BACKENDS = ["selectolax", "lxml", "html.parser"]
+
+# Regiones que se construyen con BeautifulSoup en cada tipo de página
+REGIONES = {
+    "participantes": SoupStrainer(["tr", "p", "nav", "ul"]),
+    # El atributo class se compara completo al construir, por eso se usa una expresión regular
+    "categoria": SoupStrainer("div", class_=re.compile(r"(^|\s)(dashboard-card|category)(\s|$)")),
+    "curso": SoupStrainer(["h1", "h2", "title", "a"]),
+    "enlaces": SoupStrainer("a"),
+}
+
+def backends_disponibles():
+    """
+    Retorna los backends que se pueden usar en esta instalación, del más rápido al más lento.
+    """
+    disponibles = []
+    if HAVE_SELECTOLAX:
+        disponibles.append("selectolax")
+    if HAVE_LXML:
+        disponibles.append("lxml")
+    disponibles.append("html.parser")
+    return disponibles
+
+BACKEND = backends_disponibles()[0]
+
+def configurar_backend(nombre):
+    """
+    Elige el backend por nombre; si no está instalado se usa html.parser.
+    """
+    global BACKEND
+    BACKEND = nombre if nombre in backends_disponibles() else "html.parser"
+    return BACKEND
+
+def _sopa(html, region, backend):
+    parser = "lxml" if backend == "lxml" else "html.parser"
+    return BeautifulSoup(html, parser, parse_only=REGIONES.get(region))
+
+def _texto_bs4(nodo):
+    return nodo.get_text(strip=True) if nodo else None
+
+def _texto_slx(nodo):
+    return nodo.text(deep=True, separator="", strip=True) if nodo else None
+
+# -----------------------------------------------------------------------------
+# PÁGINA DE PARTICIPANTES (user/index.php)
+# -----------------------------------------------------------------------------
+def extraer_participantes(html, backend=None):
+    """
+    Retorna un diccionario con:
+      editables: cantidad de span.inplaceeditable de la página
+      roles: [(texto, title)] del primer enlace de cada span.inplaceeditable
+      filas: [(rol, ultimo_acceso)] de las celdas c3 / c5 de cada fila
+      numero_participantes: texto de p[data-region=participant-count] o None
+      enlaces_paginas: href de los enlaces de la barra de páginas
+      numeros_pagina: valores data-page-number de la barra de páginas
+    """
+    backend = backend or BACKEND
+    if backend == "selectolax":
+        arbol = HTMLParser(html)
+        editables = arbol.css("span.inplaceeditable")
+        roles = []
+        for span in editables:
+            a = span.css_first("a")
+            if a:
+                roles.append((a.text(deep=True).strip(), (a.attributes.get("title") or "").strip()))
+        filas = []
+        for tr in arbol.css("tr"):
+            rol = tr.css_first("td.cell.c3")
+            if rol:
+                filas.append((_texto_slx(rol), _texto_slx(tr.css_first("td.cell.c5"))))
+        conteo = arbol.css_first('p[data-region="participant-count"]')
+        return {
+            "editables": len(editables),
+            "roles": roles,
+            "filas": filas,
+            "numero_participantes": _texto_slx(conteo),
+            "enlaces_paginas": [a.attributes.get("href") or "" for a in arbol.css(".pagination a[href]")],
+            "numeros_pagina": [n.attributes.get("data-page-number") or "" for n in arbol.css(".pagination [data-page-number]")],
+        }
+
+    sopa = _sopa(html, "participantes", backend)
+    editables = sopa.select("span.inplaceeditable")
+    roles = []
+    for span in editables:
+        a = span.find("a")
+        if a:
+            roles.append((a.text.strip(), a.get("title", "").strip()))
+    filas = []
+    for tr in sopa.find_all("tr"):
+        rol = tr.select_one("td.cell.c3")
+        if rol:
+            filas.append((_texto_bs4(rol), _texto_bs4(tr.select_one("td.cell.c5"))))
+    conteo = sopa.find("p", {"data-region": "participant-count"})
+    return {
+        "editables": len(editables),
+        "roles": roles,
+        "filas": filas,
+        "numero_participantes": _texto_bs4(conteo),
+        "enlaces_paginas": [a["href"] for a in sopa.select(".pagination a[href]")],
+        "numeros_pagina": [n["data-page-number"] for n in sopa.select(".pagination [data-page-number]")],
+    }
+
+# -----------------------------------------------------------------------------
+# PÁGINA DE CATEGORÍA (course/index.php?categoryid=)
+# -----------------------------------------------------------------------------
+def extraer_categoria(html, backend=None):
+    """
+    Retorna (cursos, subcategorias):
+      cursos: [(nombre, href)] del enlace a.aalink de cada div.card.dashboard-card
+      subcategorias: [(nombre, href o None)] del h3 y el primer enlace de cada div.category
+    """
+    backend = backend or BACKEND
+    if backend == "selectolax":
+        arbol = HTMLParser(html)
+        cursos = []
+        for card in arbol.css("div.card.dashboard-card"):
+            a = card.css_first("a.aalink")
+            cursos.append((_texto_slx(a), a.attributes.get("href") if a else None))
+        subcategorias = []
+        for div in arbol.css("div.category"):
+            a = div.css_first("a")
+            subcategorias.append((_texto_slx(div.css_first("h3")), a.attributes.get("href") if a else None))
+        return cursos, subcategorias
+
+    sopa = _sopa(html, "categoria", backend)
+    cursos = []
+    for card in sopa.select("div.card.dashboard-card"):
+        a = card.find("a", class_="aalink")
+        cursos.append((_texto_bs4(a), a.get("href") if a else None))
+    subcategorias = []
+    for div in sopa.select("div.category"):
+        a = div.find("a")
+        subcategorias.append((_texto_bs4(div.find("h3")), a.get("href") if a else None))
+    return cursos, subcategorias
+
+# -----------------------------------------------------------------------------
+# PÁGINAS DE CURSO Y SECCIÓN (course/view.php)
+# -----------------------------------------------------------------------------
+def extraer_titulo(html, backend=None):
+    """
+    Retorna el texto del primer h1 (o title, o h2) de la página, o None.
+    """
+    backend = backend or BACKEND
+    if backend == "selectolax":
+        arbol = HTMLParser(html)
+        for selector in ("h1", "title", "h2"):
+            nodo = arbol.css_first(selector)
+            if nodo:
+                return _texto_slx(nodo)
+        return None
+
+    sopa = _sopa(html, "curso", backend)
+    return _texto_bs4(sopa.find("h1") or sopa.find("title") or sopa.find("h2"))
+
+def extraer_enlaces(html, backend=None):
+    """
+    Retorna [(href, onclick, nombre_visible, icono)] de cada enlace con href. El
+    nombre visible es el texto de span.instancename sin su span.accesshide
+    ("Archivo") o, si no hay instancename, el texto del enlace. El icono es el
+    src del ícono de la actividad (dentro del enlace o en su li.activity), o "".
+    """
+    backend = backend or BACKEND
+    if backend == "selectolax":
+        return _enlaces_slx(HTMLParser(html))
+    return _enlaces_bs4(_sopa(html, "enlaces", backend))
+
+def _icono_slx(a):
+    img = a.css_first("img.activityicon") or a.css_first("img")
+    nodo = a.parent
+    # En Moodle 4 el ícono está junto al enlace, dentro del mismo li.activity
+    while img is None and nodo is not None and nodo.tag != "html":
+        if nodo.tag == "li" and "activity" in (nodo.attributes.get("class") or "").split():
+            img = nodo.css_first("img.activityicon")
+            break
+        nodo = nodo.parent
+    return (img.attributes.get("src") or "") if img else ""
+
+def _enlaces_slx(nodo):
+    enlaces = []
+    for a in nodo.css("a[href]"):
+        instancename = a.css_first("span.instancename")
+        if instancename:
+            oculto = instancename.css_first("span.accesshide")
+            if oculto:
+                oculto.decompose()
+            nombre = _texto_slx(instancename)
+        else:
+            nombre = _texto_slx(a)
+        enlaces.append((a.attributes.get("href") or "", a.attributes.get("onclick") or "", nombre, _icono_slx(a)))
+    return enlaces
+
+def _icono_bs4(a):
+    img = a.find("img", class_="activityicon") or a.find("img")
+    if img is None:
+        # En Moodle 4 el ícono está junto al enlace, dentro del mismo li.activity
+        li = a.find_parent("li", class_="activity")
+        img = li.find("img", class_="activityicon") if li else None
+    return img.get("src", "") if img else ""
+
+def _enlaces_bs4(nodo):
+    enlaces = []
+    for a in nodo.find_all("a", href=True):
+        instancename = a.find("span", class_="instancename")
+        if instancename:
+            oculto = instancename.find("span", class_="accesshide")
+            if oculto:
+                oculto.decompose()
+            nombre = _texto_bs4(instancename)
+        else:
+            nombre = _texto_bs4(a)
+        enlaces.append((a["href"], a.get("onclick", ""), nombre, _icono_bs4(a)))
+    return enlaces
+
+def _numero_seccion(id_li, numero):
+    if numero and numero.isdigit():
+        return int(numero)
+    coincidencia = re.fullmatch(r"section-(\d+)", id_li or "")
+    return int(coincidencia.group(1)) if coincidencia else None
+
+def extraer_estructura_curso(html, backend=None):
+    """
+    Lee de una sola vez la página del curso. Retorna un diccionario con:
+      titulo: como extraer_titulo
+      enlaces: como extraer_enlaces, de toda la página
+      secciones: [(numero, completa, enlaces)] de cada li.section (id="section-N"
+        o data-number), con los enlaces de esa sección; completa es False cuando
+        el tema solo muestra el resumen (section-summary), como en los cursos
+        con una sección por página
+    """
+    backend = backend or BACKEND
+    secciones = []
+    if backend == "selectolax":
+        arbol = HTMLParser(html)
+        titulo = next((_texto_slx(arbol.css_first(s)) for s in ("h1", "title", "h2") if arbol.css_first(s)), None)
+        for li in arbol.css("li.section"):
+            numero = _numero_seccion(li.attributes.get("id"), li.attributes.get("data-number"))
+            if numero is not None:
+                completa = "section-summary" not in (li.attributes.get("class") or "").split()
+                secciones.append((numero, completa, _enlaces_slx(li)))
+        return {"titulo": titulo, "enlaces": _enlaces_slx(arbol), "secciones": secciones}
+
+    sopa = _sopa(html, None, backend)
+    titulo = _texto_bs4(sopa.find("h1") or sopa.find("title") or sopa.find("h2"))
+    for li in sopa.select("li.section"):
+        numero = _numero_seccion(li.get("id"), li.get("data-number"))
+        if numero is not None:
+            completa = "section-summary" not in li.get("class", [])
+            secciones.append((numero, completa, _enlaces_bs4(li)))
+    return {"titulo": titulo, "enlaces": _enlaces_bs4(sopa), "secciones": secciones}
+
+def extraer_recursos_intermedios(html, backend=None):
+    """
+    Retorna [(url, texto o None)] de una página intermedia de recurso: el enlace
+    de div.resourceworkaround, los enlaces a pluginfile.php y los iframe / embed /
+    object que apuntan a pluginfile.php, en ese orden.
+    """
+    backend = backend or BACKEND
+    resultados = []
+    if backend == "selectolax":
+        arbol = HTMLParser(html)
+        enlace = arbol.css_first("div.resourceworkaround a[href]")
+        if enlace:
+            resultados.append((enlace.attributes.get("href"), _texto_slx(enlace)))
+        for a in arbol.css('a[href*="pluginfile.php"]'):
+            resultados.append((a.attributes.get("href"), _texto_slx(a)))
+        for selector, atributo in (("iframe", "src"), ("embed", "src"), ("object", "data")):
+            for nodo in arbol.css(f'{selector}[{atributo}*="pluginfile.php"]'):
+                resultados.append((nodo.attributes.get(atributo), None))
+        return resultados
+
+    sopa = _sopa(html, None, backend)
+    div_res = sopa.find("div", class_="resourceworkaround")
+    if div_res:
+        enlace = div_res.find("a", href=True)
+        if enlace:
+            resultados.append((enlace["href"], _texto_bs4(enlace)))
+    for a in sopa.find_all("a", href=lambda h: h and "pluginfile.php" in h):
+        resultados.append((a["href"], _texto_bs4(a)))
+    for selector, atributo in (("iframe", "src"), ("embed", "src"), ("object", "data")):
+        for nodo in sopa.find_all(selector, **{atributo: lambda x: x and "pluginfile.php" in x}):
+            resultados.append((nodo.get(atributo), None))
+    return resultados
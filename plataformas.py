@@ -0,0 +1,35 @@
+# -----------------------------------------------------------------------------
+# PLATAFORMAS MOODLE Y CREDENCIALES COMPARTIDAS POR INFORMES Y DESCARGAS
+# -----------------------------------------------------------------------------
+
+# Credenciales únicas (mismas para las 3 plataformas)
+MOODLE_USER = "extraccion_ustacv"
+MOODLE_PASS = "000"
+
+# Categorías de Pregrado que se ofrecen en el generador de informes
+CATEGORIAS_PREGRADO = {
+    4: "CILCE",
+    3: "Humanidades",
+    15: "División Ciencias Económicas, Administrativas y Contables",
+    20: "Ciencias Básicas",
+    27: "Campus Virtual",
+    29: "División de Ingenierías y Arquitectura",
+    31: "División Ciencias de la Salud",
+    34: "División de Ciencias Jurídicas y Políticas"
+}
+
+# Categoría raíz de Moodle: recorre todas las categorías de la plataforma
+CATEGORIA_RAIZ = {0: "Todas las categorías"}
+
+# Opciones de plataformas con nombre, URL, color, sufijo de carpeta y categorías para informes
+PLATAFORMAS = [
+    {"name": "Pregrado", "url": "https://pregrado.ustabuca.edu.co", "color": "#00dba7", "folder_suffix": "Pregrado", "categorias": CATEGORIAS_PREGRADO},
+    {"name": "Posgrado", "url": "https://posgrado.ustabuca.edu.co", "color": "#7700ca", "folder_suffix": "Posgrado", "categorias": CATEGORIA_RAIZ},
+    {"name": "Educación Continua", "url": "https://educacioncontinua.ustabuca.edu.co", "color": "#06ff3b", "folder_suffix": "Educontinua", "categorias": CATEGORIA_RAIZ},
+]
+
+def buscar_plataforma(nombre):
+    """
+    Retorna la plataforma con ese nombre (o sufijo de carpeta), o None.
+    """
+    return next((p for p in PLATAFORMAS if nombre in (p["name"], p["folder_suffix"])), None)
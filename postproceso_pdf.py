@@ -0,0 +1,192 @@
+import hashlib
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from importlib.util import find_spec
+
+# pypdf (opcional) lee los metadatos de los PDF. Solo lo importan los procesos
+# del posproceso, así la ventana no paga su carga al abrir.
+HAVE_PYPDF = find_spec("pypdf") is not None  # pip install pypdf
+
+# Procesos que leen los títulos de los PDF mientras siguen las descargas
+PROCESOS_POSTPROCESO = 2
+
+def leer_titulo_pdf(ruta):
+    """
+    Título (/Title) del diccionario de información del PDF, o "" si no tiene.
+    Solo se leen la tabla de referencias y el diccionario /Info, no las páginas.
+    Corre en otro proceso: no debe tocar la interfaz ni el registro.
+    """
+    try:
+        from pypdf import PdfReader
+        with open(ruta, "rb") as f:
+            trailer = PdfReader(f, strict=False).trailer
+            info = trailer.get("/Info")
+            if info is None:
+                return ""
+            titulo = info.get_object().get("/Title")
+            return str(titulo).strip() if titulo else ""
+    except Exception:
+        return ""
+
+def mismo_contenido(ruta_a, ruta_b):
+    """
+    True si los dos archivos son el mismo (mismo inodo, p. ej. enlaces del
+    almacén) o tienen el mismo tamaño y el mismo hash.
+    """
+    try:
+        if os.path.samefile(ruta_a, ruta_b):
+            return True
+        if os.path.getsize(ruta_a) != os.path.getsize(ruta_b):
+            return False
+        return _hash_archivo(ruta_a) == _hash_archivo(ruta_b)
+    except OSError:
+        return False
+
+def _hash_archivo(ruta):
+    h = hashlib.sha256()
+    with open(ruta, "rb") as f:
+        for bloque in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(bloque)
+    return h.digest()
+
+class GrupoPosproceso:
+    """
+    Grupo de procesos del posproceso, compartido por los cursos de un lote.
+    Si los procesos no arrancan o mueren (por ejemplo, en un ejecutable
+    empaquetado), el ProcessPoolExecutor queda roto y solo lo avisa con
+    BrokenProcessPool al enviar o al pedir un resultado: en ese caso
+    a_hilos() lo reemplaza por un grupo de hilos para todo lo que sigue.
+    """
+    def __init__(self, procesos=PROCESOS_POSTPROCESO):
+        self.procesos = procesos
+        self._candado = threading.Lock()
+        self._rotos = []
+        try:
+            self._ejecutor = ProcessPoolExecutor(max_workers=procesos)
+        except (OSError, NotImplementedError):
+            self._ejecutor = ThreadPoolExecutor(max_workers=procesos)
+
+    def con_hilos(self):
+        return isinstance(self._ejecutor, ThreadPoolExecutor)
+
+    def a_hilos(self):
+        """
+        Cambia a hilos (una sola vez, aunque lo pidan varios cursos a la vez).
+        """
+        with self._candado:
+            if not self.con_hilos():
+                self._rotos.append(self._ejecutor)
+                self._ejecutor = ThreadPoolExecutor(max_workers=self.procesos)
+
+    def submit(self, funcion, *args):
+        try:
+            return self._ejecutor.submit(funcion, *args)
+        except BrokenProcessPool:
+            self.a_hilos()
+            return self._ejecutor.submit(funcion, *args)
+
+    def shutdown(self, wait=True):
+        for ejecutor in self._rotos + [self._ejecutor]:
+            ejecutor.shutdown(wait=wait)
+
+def crear_grupo_procesos(procesos=PROCESOS_POSTPROCESO):
+    """
+    Grupo para el posproceso: procesos, o hilos si la plataforma no permite
+    crearlos o los procesos se caen (ver GrupoPosproceso).
+    """
+    return GrupoPosproceso(procesos)
+
+# -----------------------------------------------------------------------------
+# RENOMBRADO DE PDF POR TÍTULO, FUERA DE LA DESCARGA
+# -----------------------------------------------------------------------------
+class RenombradoPDF:
+    """
+    Recoge los PDF descargados de un curso y lee sus títulos en el grupo de
+    procesos sin que la descarga espere. aplicar() renombra al final, en orden
+    de ruta, para que los choques de nombre se resuelvan igual en cada
+    ejecución: el primero queda "Título.pdf", los siguientes "Título (2).pdf", ...
+    Si ya existe un archivo con ese nombre y el mismo contenido (por ejemplo,
+    el de una descarga completa anterior), la copia nueva se descarta y se
+    conserva el existente: solo se numeran archivos distintos.
+    """
+    def __init__(self, grupo, limpiar_nombre):
+        self.grupo = grupo
+        self.limpiar_nombre = limpiar_nombre
+        self._pendientes = []
+        self._candado = threading.Lock()
+
+    def encolar(self, ruta, al_renombrar=None):
+        """
+        al_renombrar(ruta_nueva) se llama (desde aplicar) si el archivo cambia de nombre.
+        """
+        futuro = self.grupo.submit(leer_titulo_pdf, ruta)
+        with self._candado:
+            self._pendientes.append((ruta, futuro, al_renombrar))
+
+    def aplicar(self, log_area):
+        """
+        Espera los títulos pendientes y renombra. Retorna cuántos PDF se renombraron
+        (incluidos los que ya estaban con ese nombre y se descartó la copia nueva).
+        """
+        with self._candado:
+            pendientes, self._pendientes = sorted(self._pendientes, key=lambda p: p[0]), []
+        titulos = self._leer_titulos(pendientes, log_area)
+        renombrados = 0
+        for ruta, _, al_renombrar in pendientes:
+            titulo = titulos[ruta]
+            nombre = self.limpiar_nombre(titulo)[:70] if titulo else ""
+            if not nombre or not os.path.exists(ruta):
+                continue
+            carpeta = os.path.dirname(ruta)
+            nueva = os.path.join(carpeta, nombre + ".pdf")
+            numero = 2
+            repetido = False
+            while nueva != ruta and os.path.lexists(nueva):
+                if mismo_contenido(ruta, nueva):
+                    repetido = True
+                    break
+                nueva = os.path.join(carpeta, f"{nombre} ({numero}).pdf")
+                numero += 1
+            if nueva == ruta:
+                continue
+            if repetido:
+                # Mismo archivo que ya estaba con su título: se queda ese y se borra la copia
+                os.remove(ruta)
+            else:
+                os.rename(ruta, nueva)
+            renombrados += 1
+            if al_renombrar:
+                al_renombrar(nueva)
+            log_area.value = ("[INFO] PDF ya guardado como: " if repetido else "[INFO] Renombrado PDF: ") + nueva
+            log_area.color = "green"
+            log_area.update()
+        return renombrados
+
+    def _leer_titulos(self, pendientes, log_area):
+        """
+        Título de cada ruta pendiente. Las lecturas que se perdieron porque el
+        grupo de procesos se rompió se repiten en hilos.
+        """
+        titulos = {}
+        perdidas = []
+        for ruta, futuro, _ in pendientes:
+            try:
+                titulos[ruta] = futuro.result()
+            except BrokenProcessPool:
+                perdidas.append(ruta)
+            except Exception:
+                titulos[ruta] = ""
+        if perdidas:
+            log_area.value = f"[AVISO] Los procesos que leen los títulos de los PDF se detuvieron; se leen {len(perdidas)} en hilos"
+            log_area.color = "orange"
+            log_area.update()
+            self.grupo.a_hilos()
+            futuros = [(ruta, self.grupo.submit(leer_titulo_pdf, ruta)) for ruta in perdidas]
+            for ruta, futuro in futuros:
+                try:
+                    titulos[ruta] = futuro.result()
+                except Exception:
+                    titulos[ruta] = ""
+        return titulos
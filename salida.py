@@ -0,0 +1,192 @@
+import csv
+import os
+from importlib.util import find_spec
+
+# Los paquetes de Excel y Parquet solo se buscan al iniciar; se importan al
+# abrir el primer archivo de ese formato (pyarrow tarda en cargar)
+HAVE_XLSXWRITER = find_spec("xlsxwriter") is not None  # pip install xlsxwriter
+HAVE_OPENPYXL = find_spec("openpyxl") is not None  # pip install openpyxl
+HAVE_PYARROW = find_spec("pyarrow") is not None  # pip install pyarrow
+
+# Formatos de salida con su descripción para la interfaz
+FORMATOS_SALIDA = {
+    "xlsx": "Excel (.xlsx)",
+    "csv": "CSV (.csv)",
+    "parquet": "Parquet (.parquet)",
+}
+
+# Filas que se acumulan antes de escribir un bloque en Parquet
+FILAS_POR_BLOQUE_PARQUET = 1000
+
+def formatos_disponibles():
+    """
+    Retorna los formatos que se pueden escribir con los paquetes instalados.
+    """
+    disponibles = []
+    if HAVE_XLSXWRITER or HAVE_OPENPYXL:
+        disponibles.append("xlsx")
+    disponibles.append("csv")
+    if HAVE_PYARROW:
+        disponibles.append("parquet")
+    return disponibles
+
+def cambiar_extension(ruta, formato):
+    """
+    Cambia la extensión del archivo por la del formato (informe.xlsx -> informe.csv).
+    """
+    return f"{os.path.splitext(ruta)[0]}.{formato}"
+
+# -----------------------------------------------------------------------------
+# ESCRITORES POR FORMATO
+# -----------------------------------------------------------------------------
+class SalidaTabular:
+    """
+    Escribe filas (diccionarios) en un archivo a medida que se producen, siempre
+    con las columnas en el orden indicado. Las claves que no están en 'columnas'
+    se ignoran y las que faltan quedan vacías (None: celda vacía en CSV y
+    Excel, nulo en Parquet).
+    """
+    def __init__(self, ruta, columnas):
+        self.ruta = ruta
+        self.columnas = list(columnas)
+        self.filas = 0
+
+    def _valores(self, fila):
+        return [fila.get(columna) for columna in self.columnas]
+
+    def escribir(self, fila):
+        self._escribir_valores(self._valores(fila))
+        self.filas += 1
+
+    def _escribir_valores(self, valores):
+        raise NotImplementedError
+
+    def cerrar(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.cerrar()
+
+class SalidaCSV(SalidaTabular):
+    def __init__(self, ruta, columnas):
+        super().__init__(ruta, columnas)
+        # utf-8-sig para que Excel reconozca las tildes al abrir el archivo
+        self._archivo = open(ruta, "w", newline="", encoding="utf-8-sig")
+        self._escritor = csv.writer(self._archivo)
+        self._escritor.writerow(self.columnas)
+
+    def _escribir_valores(self, valores):
+        self._escritor.writerow(valores)
+
+    def cerrar(self):
+        self._archivo.close()
+
+class SalidaExcel(SalidaTabular):
+    """
+    Excel en modo de memoria constante: cada fila se pasa a disco al escribir la
+    siguiente (xlsxwriter constant_memory, o openpyxl write_only si no está xlsxwriter).
+    """
+    def __init__(self, ruta, columnas):
+        super().__init__(ruta, columnas)
+        if HAVE_XLSXWRITER:
+            import xlsxwriter
+            self._libro = xlsxwriter.Workbook(ruta, {"constant_memory": True})
+            self._hoja = self._libro.add_worksheet("Sheet1")
+            self._hoja.write_row(0, 0, self.columnas, self._libro.add_format({"bold": True}))
+        else:
+            from openpyxl import Workbook
+            self._libro = Workbook(write_only=True)
+            self._hoja = self._libro.create_sheet("Sheet1")
+            self._hoja.append(self.columnas)
+
+    def _escribir_valores(self, valores):
+        if HAVE_XLSXWRITER:
+            self._hoja.write_row(self.filas + 1, 0, valores)
+        else:
+            self._hoja.append(valores)
+
+    def cerrar(self):
+        if HAVE_XLSXWRITER:
+            self._libro.close()
+        else:
+            self._libro.save(self.ruta)
+
+class SalidaParquet(SalidaTabular):
+    """
+    Parquet escrito por bloques; los tipos de las columnas se toman del primer
+    bloque (una columna sin valores o con tipos mezclados en ese bloque se
+    guarda como texto). Los valores que faltan se guardan como nulos.
+    """
+    def __init__(self, ruta, columnas):
+        super().__init__(ruta, columnas)
+        self._bloque = []
+        self._escritor = None
+
+    def _escribir_valores(self, valores):
+        self._bloque.append(valores)
+        if len(self._bloque) >= FILAS_POR_BLOQUE_PARQUET:
+            self._vaciar()
+
+    def _vaciar(self):
+        if not self._bloque and self._escritor is not None:
+            return
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        datos = {columna: [fila[i] for fila in self._bloque] for i, columna in enumerate(self.columnas)}
+        if self._escritor is None:
+            campos = []
+            for columna, valores in datos.items():
+                try:
+                    tipo = pa.array(valores).type
+                except (pa.ArrowInvalid, pa.ArrowTypeError):
+                    tipo = pa.string()
+                campos.append(pa.field(columna, pa.string() if pa.types.is_null(tipo) else tipo))
+            self._escritor = pq.ParquetWriter(self.ruta, pa.schema(campos))
+        esquema = self._escritor.schema
+        for campo in esquema:
+            if pa.types.is_string(campo.type):
+                # Una columna de texto acepta cualquier valor de los bloques siguientes
+                datos[campo.name] = [None if v is None else str(v) for v in datos[campo.name]]
+        self._escritor.write_table(pa.table(datos, schema=esquema))
+        self._bloque = []
+
+    def cerrar(self):
+        try:
+            self._vaciar()
+        finally:
+            # Si el primer bloque falló no hay escritor: se deja ver ese error
+            if self._escritor is not None:
+                self._escritor.close()
+
+class SalidaCompartida:
+    """
+    Permite que varios hilos escriban en una misma salida: serializa las
+    escrituras y agrega a cada fila los valores fijos de quien escribe
+    (por ejemplo, la plataforma en un informe combinado).
+    """
+    def __init__(self, salida, candado, **valores):
+        self.salida = salida
+        self.candado = candado
+        self.valores = valores
+
+    def escribir(self, fila):
+        with self.candado:
+            self.salida.escribir(dict(fila, **self.valores))
+
+ESCRITORES = {
+    "xlsx": SalidaExcel,
+    "csv": SalidaCSV,
+    "parquet": SalidaParquet,
+}
+
+def abrir_salida(ruta, columnas, formato=None):
+    """
+    Abre el escritor que corresponde al formato (por defecto, la extensión de la ruta).
+    """
+    formato = formato or os.path.splitext(ruta)[1].lstrip(".").lower()
+    if formato not in formatos_disponibles():
+        raise ValueError(f"Formato de salida no disponible: {formato}")
+    return ESCRITORES[formato](ruta, columnas)
@@ -0,0 +1,175 @@
+import json
+import os
+import re
+import threading
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+from bs4 import BeautifulSoup
+
+from concurrencia import limitador_host
+from metricas import metricas_compartidas
+
+# Carpeta donde se guardan las cookies de cada plataforma entre ejecuciones
+CARPETA_SESIONES = "."
+
+# Página liviana que solo se ve con la sesión iniciada (sin sesión, Moodle redirige al login)
+RUTA_COMPROBACION = "/user/preferences.php"
+
+RUTA_LOGIN = "/login/index.php"
+
+# Conexiones abiertas que se reutilizan por servidor (varios cursos y archivos a la vez)
+TAMANO_POOL = 16
+
+_sesiones = {}
+_candado_sesiones = threading.Lock()
+
+class ErrorSesion(requests.RequestException):
+    """
+    No se pudo iniciar sesión en la plataforma (credenciales, logintoken o red).
+    Hereda de RequestException para que los manejadores de errores de red existentes la atrapen.
+    """
+
+def ruta_cookies(url_base, carpeta=None):
+    """
+    Archivo de cookies que corresponde a una plataforma. Del host solo quedan
+    letras, números, '.', '_' y '-' (el ':' del puerto no vale en Windows).
+    """
+    host = re.sub(r"[^A-Za-z0-9._-]", "_", urlparse(url_base).netloc)
+    return os.path.join(carpeta or CARPETA_SESIONES, f"sesion_{host}.json")
+
+def es_pagina_login(respuesta):
+    """
+    True si la respuesta es (o redirige a) la página de login de Moodle.
+    """
+    if RUTA_LOGIN in respuesta.url:
+        return True
+    if respuesta.is_redirect and RUTA_LOGIN in respuesta.headers.get("Location", ""):
+        return True
+    return any(RUTA_LOGIN in r.headers.get("Location", "") for r in respuesta.history)
+
+# -----------------------------------------------------------------------------
+# SESIÓN AUTENTICADA COMPARTIDA
+# -----------------------------------------------------------------------------
+class SesionMoodle(requests.Session):
+    """
+    requests.Session que guarda sus cookies en disco por plataforma, las
+    reutiliza entre procesos y, si una respuesta redirige al login porque la
+    sesión venció, vuelve a iniciar sesión y repite la solicitud una vez.
+    Varios hilos pueden usarla a la vez: solo uno hace el nuevo login.
+    """
+    def __init__(self, url_base, usuario, clave, archivo_cookies=None):
+        super().__init__()
+        self.url_base = url_base.rstrip("/")
+        self.usuario = usuario
+        self.clave = clave
+        self.archivo_cookies = archivo_cookies or ruta_cookies(url_base)
+        # El caché distingue las páginas por usuario y plataforma
+        self.identidad_cache = f"{usuario}@{urlparse(url_base).netloc}"
+        self._candado_login = threading.Lock()
+        self._generacion = 0  # Aumenta con cada login; evita que varios hilos repitan el mismo login
+        self.logins = 0
+        for prefijo in ("https://", "http://"):
+            self.mount(prefijo, HTTPAdapter(pool_connections=TAMANO_POOL, pool_maxsize=TAMANO_POOL))
+        metricas_compartidas().instrumentar(self)
+        # Cada solicitud (también login, redirecciones y archivos) espera su turno según la carga del servidor
+        limitador_host.gobernar(self)
+
+    def iniciar(self):
+        """
+        Usa las cookies guardadas si siguen siendo válidas; si no, inicia sesión.
+        Lanza ErrorSesion si no se puede iniciar sesión.
+        """
+        if self.cargar_cookies() and self.sesion_activa():
+            return self
+        with self._candado_login:
+            self._login()
+        return self
+
+    def sesion_activa(self):
+        """
+        Comprueba la sesión con una sola solicitud liviana, sin seguir redirecciones.
+        """
+        try:
+            respuesta = super().request("GET", self.url_base + RUTA_COMPROBACION, allow_redirects=False, timeout=10)
+        except requests.RequestException:
+            return False
+        return respuesta.status_code == 200 and not es_pagina_login(respuesta)
+
+    def _login(self):
+        login_url = self.url_base + RUTA_LOGIN
+        self.cookies.clear()
+        try:
+            respuesta = super().request("GET", login_url, timeout=10)
+            respuesta.raise_for_status()
+        except requests.RequestException as e:
+            raise ErrorSesion(f"Error al acceder a la página de login: {e}") from e
+
+        token = BeautifulSoup(respuesta.text, "html.parser").find("input", {"name": "logintoken"})
+        if not token:
+            raise ErrorSesion("No se encontró logintoken en la página de login.")
+
+        datos = {"username": self.usuario, "password": self.clave, "logintoken": token["value"]}
+        try:
+            respuesta = super().request("POST", login_url, data=datos, timeout=10)
+            respuesta.raise_for_status()
+        except requests.RequestException as e:
+            raise ErrorSesion(f"Error al enviar credenciales: {e}") from e
+        if "loginerrormessage" in respuesta.text.lower():
+            raise ErrorSesion("No se pudo iniciar sesión. Revisa las credenciales.")
+        self._generacion += 1
+        self.logins += 1
+        self.guardar_cookies()
+
+    def request(self, method, url, *args, **kwargs):
+        generacion = self._generacion
+        respuesta = super().request(method, url, *args, **kwargs)
+        if RUTA_LOGIN in url or not es_pagina_login(respuesta):
+            return respuesta
+
+        # La sesión venció durante la ejecución: un solo hilo inicia sesión y todos repiten su solicitud
+        with self._candado_login:
+            if self._generacion == generacion:
+                self._login()
+        return super().request(method, url, *args, **kwargs)
+
+    def cargar_cookies(self):
+        try:
+            with open(self.archivo_cookies, encoding="utf-8") as f:
+                cookies = json.load(f)
+        except (OSError, ValueError):
+            return False
+        for cookie in cookies:
+            self.cookies.set(
+                cookie["name"], cookie["value"],
+                domain=cookie.get("domain", ""), path=cookie.get("path", "/"),
+                secure=cookie.get("secure", False), expires=cookie.get("expires"),
+            )
+        return bool(cookies)
+
+    def guardar_cookies(self):
+        cookies = [
+            {"name": c.name, "value": c.value, "domain": c.domain, "path": c.path, "secure": c.secure, "expires": c.expires}
+            for c in self.cookies
+        ]
+        # Se escribe en un archivo temporal y se reemplaza, para que otro proceso nunca lea un archivo a medias
+        temporal = f"{self.archivo_cookies}.{os.getpid()}.tmp"
+        descriptor = os.open(temporal, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(descriptor, "w", encoding="utf-8") as f:
+            json.dump(cookies, f)
+        os.replace(temporal, self.archivo_cookies)
+
+def obtener_sesion(url_base, usuario, clave):
+    """
+    Retorna la sesión compartida del proceso para la plataforma, iniciándola
+    (con las cookies guardadas o con un login nuevo) la primera vez.
+    Lanza ErrorSesion si no se puede iniciar sesión.
+    """
+    clave_sesion = (url_base.rstrip("/"), usuario)
+    with _candado_sesiones:
+        sesion = _sesiones.get(clave_sesion)
+        if sesion is None:
+            sesion = SesionMoodle(url_base, usuario, clave).iniciar()
+            _sesiones[clave_sesion] = sesion
+        return sesion
@@ -0,0 +1,124 @@
+import os
+import sqlite3
+import threading
+
+# Archivo del manifiesto de sincronización dentro de la carpeta de cada curso
+ARCHIVO_SINCRONIZACION = "sincronizacion.sqlite"
+
+# -----------------------------------------------------------------------------
+# MANIFIESTO LOCAL PARA DESCARGAS INCREMENTALES
+# -----------------------------------------------------------------------------
+class SincronizacionCurso:
+    """
+    Recuerda, por URL, qué archivo quedó en disco (ruta, tamaño, ETag,
+    Last-Modified y hash) para que la siguiente descarga del curso solo pida
+    lo nuevo o lo que cambió, y guarda los validadores de las descargas a
+    medio terminar para continuarlas con solicitudes Range.
+    Lleva la cuenta de omitidos, actualizados y agregados de la ejecución.
+    """
+    def __init__(self, carpeta_curso):
+        self.ruta = os.path.join(carpeta_curso, ARCHIVO_SINCRONIZACION)
+        self._candado = threading.Lock()
+        self._conexion = sqlite3.connect(self.ruta, check_same_thread=False)
+        self._conexion.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS archivos (
+                url TEXT PRIMARY KEY,
+                ruta TEXT,
+                tamano INTEGER,
+                etag TEXT,
+                last_modified TEXT,
+                hash TEXT
+            );
+            CREATE TABLE IF NOT EXISTS parciales (
+                url TEXT PRIMARY KEY,
+                ruta_parcial TEXT,
+                etag TEXT,
+                last_modified TEXT
+            );
+            """
+        )
+        self.omitidos = 0
+        self.actualizados = 0
+        self.agregados = 0
+        self.reanudados = 0
+        self.bytes_omitidos = 0
+        self.bytes_descargados = 0
+
+    def _leer(self, sql, parametros):
+        with self._candado:
+            cursor = self._conexion.execute(sql, parametros)
+            fila = cursor.fetchone()
+            if fila is None:
+                return None
+            return dict(zip([c[0] for c in cursor.description], fila))
+
+    def _escribir(self, sql, parametros):
+        with self._candado:
+            self._conexion.execute(sql, parametros)
+            self._conexion.commit()
+
+    def obtener(self, url):
+        """
+        Retorna lo que se sabe del archivo de la URL (ruta, tamano, etag, last_modified, hash) o None.
+        """
+        return self._leer("SELECT ruta, tamano, etag, last_modified, hash FROM archivos WHERE url = ?", (url,))
+
+    def guardar(self, url, ruta, tamano, etag, last_modified, hash_archivo):
+        self._escribir(
+            "INSERT OR REPLACE INTO archivos VALUES (?, ?, ?, ?, ?, ?)",
+            (url, ruta, tamano, etag, last_modified, hash_archivo)
+        )
+
+    def mover(self, url, ruta):
+        """
+        Actualiza la ruta del archivo de la URL (por ejemplo, al renombrar un PDF por su título).
+        """
+        self._escribir("UPDATE archivos SET ruta = ? WHERE url = ?", (ruta, url))
+
+    def obtener_parcial(self, url):
+        return self._leer("SELECT ruta_parcial, etag, last_modified FROM parciales WHERE url = ?", (url,))
+
+    def registrar_parcial(self, url, ruta_parcial, etag, last_modified):
+        self._escribir("INSERT OR REPLACE INTO parciales VALUES (?, ?, ?, ?)", (url, ruta_parcial, etag, last_modified))
+
+    def borrar_parcial(self, url):
+        self._escribir("DELETE FROM parciales WHERE url = ?", (url,))
+
+    def contar(self, tipo, cantidad_bytes=0):
+        """
+        Suma un archivo 'omitidos', 'actualizados' o 'agregados' con sus bytes.
+        """
+        with self._candado:
+            setattr(self, tipo, getattr(self, tipo) + 1)
+            if tipo == "omitidos":
+                self.bytes_omitidos += cantidad_bytes
+            else:
+                self.bytes_descargados += cantidad_bytes
+
+    def contar_reanudado(self):
+        with self._candado:
+            self.reanudados += 1
+
+    def totales(self):
+        return {
+            "Omitidos": self.omitidos,
+            "Actualizados": self.actualizados,
+            "Agregados": self.agregados,
+            "MB_Omitidos": round(self.bytes_omitidos / (1024 * 1024), 2),
+            "MB_Descargados": round(self.bytes_descargados / (1024 * 1024), 2),
+        }
+
+    def cerrar(self):
+        with self._candado:
+            self._conexion.close()
+
+def resumen_sincronizacion(totales):
+    """
+    Texto corto con los totales de una o varias sincronizaciones.
+    """
+    texto = (
+        f"Sincronización: {totales['Omitidos']} sin cambios ({totales['MB_Omitidos']} MB evitados), "
+        f"{totales['Actualizados']} actualizados, {totales['Agregados']} nuevos ({totales['MB_Descargados']} MB descargados)."
+    )
+    return texto
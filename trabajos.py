@@ -0,0 +1,196 @@
+import threading
+import time
+
+# Veces por segundo que se refresca la interfaz mientras corre un trabajo
+REFRESCOS_POR_SEGUNDO = 4
+
+class TrabajoCancelado(Exception):
+    """
+    Se lanza dentro del trabajo cuando el usuario pidió cancelarlo.
+    """
+
+# -----------------------------------------------------------------------------
+# REGISTRO DE MENSAJES SIN ACTUALIZAR LA INTERFAZ EN CADA EVENTO
+# -----------------------------------------------------------------------------
+class AreaRegistro:
+    """
+    Sustituto de un control Text de Flet para usar desde los hilos del trabajo:
+    tiene value, color y update(), pero update() solo marca que hay cambios.
+    El trabajo copia value y color al control real al ritmo de refresco.
+    """
+    def __init__(self, trabajo, value="", color=None):
+        self._trabajo = trabajo
+        self.value = value
+        self.color = color
+
+    def update(self):
+        self._trabajo.marcar_cambio()
+
+# -----------------------------------------------------------------------------
+# TRABAJO EN SEGUNDO PLANO CON PROGRESO
+# -----------------------------------------------------------------------------
+class TrabajoSegundoPlano:
+    """
+    Ejecuta funcion(trabajo) en un hilo aparte para que la ventana siga
+    respondiendo. La función informa su avance con trabajo.avanzar(...) y
+    revisa trabajo.cancelado() (o llama trabajo.verificar_cancelacion()) entre
+    unidades de trabajo.
+
+    al_actualizar(progreso) se llama a lo sumo REFRESCOS_POR_SEGUNDO veces por
+    segundo y solo si hubo cambios; al_terminar(resultado, error) se llama una
+    vez al final (error es None si terminó bien, TrabajoCancelado si se canceló).
+    """
+    def __init__(self, funcion, al_actualizar, al_terminar, unidad="cursos", refrescos_por_segundo=REFRESCOS_POR_SEGUNDO):
+        self.funcion = funcion
+        self.al_actualizar = al_actualizar
+        self.al_terminar = al_terminar
+        self.unidad = unidad
+        self.intervalo = 1.0 / refrescos_por_segundo
+        self.registro = AreaRegistro(self)
+        self._cancelar = threading.Event()
+        self._terminado = threading.Event()
+        self._candado = threading.Lock()
+        self._cambios = threading.Event()
+        self._inicio = None
+        self._resultado = (None, None)
+        self._hooks = []
+        self.hechos = 0
+        self.total = 0
+        self.paginas = 0
+        self.bytes = 0
+
+    def iniciar(self):
+        self._inicio = time.monotonic()
+        threading.Thread(target=self._ejecutar, daemon=True).start()
+        threading.Thread(target=self._refrescar, daemon=True).start()
+        return self
+
+    def cancelar(self):
+        self._cancelar.set()
+        self.marcar_cambio()
+
+    def cancelado(self):
+        return self._cancelar.is_set()
+
+    def verificar_cancelacion(self):
+        if self._cancelar.is_set():
+            raise TrabajoCancelado()
+
+    def en_curso(self):
+        return self._inicio is not None and not self._terminado.is_set()
+
+    def marcar_cambio(self):
+        self._cambios.set()
+
+    def avanzar(self, hechos=0, paginas=0, cantidad_bytes=0, total=None, sumar_total=0):
+        """
+        Suma al progreso; 'total' reemplaza la cantidad de unidades esperadas
+        y 'sumar_total' la aumenta (o disminuye).
+        """
+        with self._candado:
+            self.hechos += hechos
+            self.paginas += paginas
+            self.bytes += cantidad_bytes
+            if total is not None:
+                self.total = total
+            self.total += sumar_total
+        self._cambios.set()
+
+    def contar_respuestas(self, session):
+        """
+        Agrega un hook a la sesión de requests para contar cada página recibida.
+        El hook se quita al terminar el trabajo (las sesiones se comparten entre trabajos).
+        """
+        hook = lambda respuesta, *args, **kwargs: self.avanzar(paginas=1)
+        session.hooks.setdefault("response", []).append(hook)
+        self._hooks.append((session, hook))
+        return session
+
+    def progreso(self):
+        """
+        Foto del avance: hechos, total, fraccion (0 a 1 o None si no se conoce
+        el total), paginas, bytes, transcurrido y eta (segundos o None), mensaje.
+        """
+        with self._candado:
+            hechos, total, paginas, cantidad_bytes = self.hechos, self.total, self.paginas, self.bytes
+        transcurrido = time.monotonic() - self._inicio if self._inicio else 0.0
+        fraccion = min(1.0, hechos / total) if total else None
+        eta = transcurrido / hechos * (total - hechos) if hechos and total and hechos <= total else None
+        return {
+            "hechos": hechos,
+            "total": total,
+            "fraccion": fraccion,
+            "paginas": paginas,
+            "bytes": cantidad_bytes,
+            "transcurrido": transcurrido,
+            "eta": eta,
+            "unidad": self.unidad,
+            "mensaje": self.registro.value,
+            "color": self.registro.color,
+            "cancelando": self.cancelado(),
+        }
+
+    def _ejecutar(self):
+        try:
+            resultado = self.funcion(self)
+            self._resultado = (resultado, TrabajoCancelado() if self.cancelado() else None)
+        except Exception as e:
+            self._resultado = (None, e)
+        finally:
+            for session, hook in self._hooks:
+                session.hooks["response"].remove(hook)
+            self._terminado.set()
+            self._cambios.set()
+
+    def _refrescar(self):
+        # Un solo hilo toca la interfaz: los refrescos y el aviso final no se cruzan
+        while not self._terminado.is_set():
+            self._cambios.wait()
+            if self._terminado.is_set():
+                break
+            self._cambios.clear()
+            self.al_actualizar(self.progreso())
+            time.sleep(self.intervalo)
+        self.al_actualizar(self.progreso())
+        self.al_terminar(*self._resultado)
+
+class TrabajoParcial:
+    """
+    Parte de un trabajo que corre junto a otras (por ejemplo, una plataforma de
+    varias): lleva su propio total y lo suma al del trabajo completo, y comparte
+    con él la cancelación.
+    """
+    def __init__(self, trabajo):
+        self.trabajo = trabajo
+        self.total = 0
+        self._candado = threading.Lock()
+
+    def avanzar(self, hechos=0, paginas=0, cantidad_bytes=0, total=None):
+        diferencia = 0
+        if total is not None:
+            with self._candado:
+                diferencia = total - self.total
+                self.total = total
+        self.trabajo.avanzar(hechos, paginas, cantidad_bytes, sumar_total=diferencia)
+
+    def cancelado(self):
+        return self.trabajo.cancelado()
+
+    def verificar_cancelacion(self):
+        self.trabajo.verificar_cancelacion()
+
+def describir_progreso(progreso):
+    """
+    Texto corto con el avance para mostrar bajo la barra de progreso.
+    """
+    partes = [f"{progreso['hechos']}/{progreso['total'] or '?'} {progreso['unidad']}"]
+    if progreso["paginas"]:
+        partes.append(f"{progreso['paginas']} páginas")
+    if progreso["bytes"]:
+        partes.append(f"{progreso['bytes'] / (1024 * 1024):.1f} MB")
+    if progreso["eta"] is not None:
+        minutos, segundos = divmod(int(progreso["eta"]), 60)
+        partes.append(f"faltan ~{minutos}:{segundos:02d}")
+    if progreso["cancelando"]:
+        partes.append("cancelando...")
+    return " | ".join(partes)